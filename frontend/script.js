@@ -3,6 +3,11 @@ const API_BASE_URL = '/api';
 let currentPage = 1;
 let currentQuery = '';
 let totalResults = 0;
+// Cursor that starts each page of the current query, from next_cursor
+let pageCursors = {};
+// Category filter, and the facet counts of the query before it was filtered
+let currentCategory = null;
+let categoryFacets = [];
 const resultsPerPage = 10;
 
 // DOM Elements
@@ -13,9 +18,12 @@ const mainSearch = document.getElementById('mainSearch');
 const header = document.getElementById('header');
 const resultsPage = document.getElementById('resultsPage');
 const resultsList = document.getElementById('resultsList');
+const facets = document.getElementById('facets');
 const resultsStats = document.getElementById('resultsStats');
 const loading = document.getElementById('loading');
 const pagination = document.getElementById('pagination');
+const suggestions = document.getElementById('suggestions');
+let suggestTimer = null;
 
 // Event Listeners
 searchInput.addEventListener('input', handleInputChange);
@@ -25,11 +33,40 @@ headerSearchInput.addEventListener('keypress', handleKeyPress);
 
 function handleInputChange(e) {
     clearBtn.classList.toggle('visible', e.target.value.length > 0);
+    scheduleSuggest(e.target.value);
 }
 
 function handleHeaderInputChange(e) {
     // Sync with main input
     searchInput.value = e.target.value;
+    scheduleSuggest(e.target.value);
+}
+
+function scheduleSuggest(text) {
+    // Wait for a pause in typing before asking for suggestions
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(() => fetchSuggestions(text), 100);
+}
+
+async function fetchSuggestions(text) {
+    if (!text.trim()) {
+        suggestions.replaceChildren();
+        return;
+    }
+    try {
+        const response = await fetch(`${API_BASE_URL}/suggest?q=${encodeURIComponent(text)}&limit=8&fuzzy=true`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        suggestions.replaceChildren(...data.suggestions.map(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            return option;
+        }));
+    } catch (error) {
+        // Suggestions are best effort; searching still works without them
+    }
 }
 
 function handleKeyPress(e) {
@@ -54,6 +91,9 @@ function goHome() {
     headerSearchInput.value = '';
     currentQuery = '';
     currentPage = 1;
+    pageCursors = {};
+    currentCategory = null;
+    categoryFacets = [];
 }
 
 async function performSearch(page = 1) {
@@ -64,6 +104,10 @@ async function performSearch(page = 1) {
         return;
     }
 
+    if (query !== currentQuery) {
+        pageCursors = {};
+        currentCategory = null;
+    }
     currentQuery = query;
     currentPage = page;
 
@@ -76,10 +120,15 @@ async function performSearch(page = 1) {
             headers: {
                 'Content-Type': 'application/json',
             },
+            // Pages reached through a cursor are read from the server's
+            // snapshot of the ranking instead of ranking it again
             body: JSON.stringify({
                 query: query,
                 page: page,
-                limit: resultsPerPage
+                limit: resultsPerPage,
+                cursor: pageCursors[page],
+                category: currentCategory || undefined,
+                facets: true
             })
         });
 
@@ -88,6 +137,9 @@ async function performSearch(page = 1) {
         }
 
         const data = await response.json();
+        if (data.next_cursor) {
+            pageCursors[page + 1] = data.next_cursor;
+        }
         displayResults(data);
     } catch (error) {
         console.error('Search error:', error);
@@ -113,6 +165,11 @@ function displayResults(data) {
     // Display stats
     resultsStats.innerHTML = `About ${totalResults.toLocaleString()} results (${searchTime.toFixed(2)} seconds)`;
 
+    if (!currentCategory && data.facets) {
+        categoryFacets = data.facets;
+    }
+    displayFacets();
+
     // Display results
     if (results.length === 0) {
         resultsList.innerHTML = `
@@ -131,10 +188,10 @@ function displayResults(data) {
                 <cite>${escapeHtml(result.url || result.source || 'Document')}</cite>
             </div>
             <a href="${escapeHtml(result.url || '#')}" class="result-title" target="_blank">
-                ${highlightQuery(escapeHtml(result.title), currentQuery)}
+                ${result.title_highlights ? highlightRanges(result.title, result.title_highlights) : highlightQuery(escapeHtml(result.title), currentQuery)}
             </a>
             <div class="result-snippet">
-                ${highlightQuery(escapeHtml(result.snippet || result.content || ''), currentQuery)}
+                ${result.highlights ? highlightRanges(result.snippet, result.highlights) : highlightQuery(escapeHtml(result.snippet || result.content || ''), currentQuery)}
             </div>
         </div>
     `).join('');
@@ -143,6 +200,29 @@ function displayResults(data) {
     displayPagination();
 }
 
+function displayFacets() {
+    // A filtered search only counts its own category, so the chips keep
+    // the counts of the unfiltered search
+    if (categoryFacets.length < 2) {
+        facets.innerHTML = '';
+        return;
+    }
+    const chips = [{category: null, count: null}, ...categoryFacets].map(facet => {
+        const chip = document.createElement('button');
+        chip.className = 'facet-chip' + (facet.category === currentCategory ? ' active' : '');
+        chip.textContent = facet.category === null ? 'All' : `${facet.category} (${facet.count.toLocaleString()})`;
+        chip.onclick = () => filterByCategory(facet.category);
+        return chip;
+    });
+    facets.replaceChildren(...chips);
+}
+
+function filterByCategory(category) {
+    currentCategory = category;
+    pageCursors = {};
+    performSearch(1);
+}
+
 function displayPagination() {
     const totalPages = Math.ceil(totalResults / resultsPerPage);
     
@@ -228,6 +308,20 @@ function highlightQuery(text, query) {
     return result;
 }
 
+// Wrap the server's [start, end) word offsets in <em>, escaping the rest
+function highlightRanges(text, ranges) {
+    if (!text) return '';
+    
+    let result = '';
+    let last = 0;
+    ranges.forEach(([start, end]) => {
+        result += escapeHtml(text.slice(last, start)) + '<em>' + escapeHtml(text.slice(start, end)) + '</em>';
+        last = end;
+    });
+    
+    return result + escapeHtml(text.slice(last));
+}
+
 function escapeRegex(string) {
     return string.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
 }
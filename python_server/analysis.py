@@ -0,0 +1,216 @@
+"""
+Text analysis for the search engine
+An Analyzer turns text into the lowercase index terms used for documents
+and queries alike: word matching with one precompiled pattern, stop-word
+and length filtering, then optional Unicode folding and stemming. Words are
+Unicode letters, digits and underscores, so numbers and non-English text
+are indexed too.
+"""
+
+import multiprocessing
+import re
+import unicodedata
+from functools import lru_cache
+
+# Runs of Unicode word characters, the same characters \b treats as word
+# characters, so a term found by this pattern is also a \bterm\b match
+WORD_PATTERN = re.compile(r'\w+')
+
+# Common stop words
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been',
+    'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
+    'those', 'it', 'its', 'as', 'if', 'then', 'than', 'so', 'such'
+})
+
+VOWELS = 'aeiou'
+
+
+@lru_cache(maxsize=262144)
+def fold(word):
+    """Strip accents and compatibility forms: 'café' -> 'cafe'"""
+    if word.isascii():
+        return word
+    decomposed = unicodedata.normalize('NFKD', word)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _is_consonant(word, i):
+    if word[i] in VOWELS:
+        return False
+    if word[i] == 'y':
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem):
+    """Number of vowel-consonant sequences in stem (Porter's m)"""
+    measure = 0
+    previous_vowel = False
+    for i in range(len(stem)):
+        vowel = not _is_consonant(stem, i)
+        if previous_vowel and not vowel:
+            measure += 1
+        previous_vowel = vowel
+    return measure
+
+
+def _has_vowel(stem):
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _ends_cvc(stem):
+    return (
+        len(stem) >= 3 and stem[-1] not in 'wxy'
+        and _is_consonant(stem, len(stem) - 3)
+        and not _is_consonant(stem, len(stem) - 2)
+        and _is_consonant(stem, len(stem) - 1)
+    )
+
+
+@lru_cache(maxsize=262144)
+def stem(word):
+    """Porter stemmer step 1: plurals, -ed and -ing, and a final y
+    
+    'ponies' -> 'poni', 'indexing' -> 'index', 'hoped' -> 'hope'. Words that
+    are not plain ASCII letters are returned unchanged.
+    """
+    if len(word) <= 2 or not (word.isascii() and word.isalpha()):
+        return word
+    
+    if word.endswith('sses') or word.endswith('ies'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    
+    if word.endswith('eed'):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                elif len(word) >= 2 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1) and word[-1] not in 'lsz':
+                    word = word[:-1]
+                elif _measure(word) == 1 and _ends_cvc(word):
+                    word += 'e'
+                break
+    
+    if word.endswith('y') and _has_vowel(word[:-1]):
+        word = word[:-1] + 'i'
+    return word
+
+
+class Analyzer:
+    """Configurable tokenizer shared by indexing and querying
+    
+    Changing the configuration changes the terms, so documents indexed
+    under one configuration must be reindexed to be searched under another.
+    """
+    
+    def __init__(self, stop_words=STOP_WORDS, min_length=2, fold=False, stem=False, pattern=WORD_PATTERN):
+        self.stop_words = frozenset(stop_words)
+        self.min_length = min_length
+        self.fold = fold
+        self.stem = stem
+        self.pattern = pattern
+    
+    @property
+    def exact(self):
+        """True when every term is just its matched text lowercased"""
+        return not self.fold and not self.stem
+    
+    def _normalize(self, word):
+        if self.fold:
+            word = fold(word)
+        if self.stem:
+            word = stem(word)
+        return word
+    
+    def prefix(self, word):
+        """A partial word as the start of a term: folded like terms, never stemmed"""
+        word = word.lower()
+        return fold(word) if self.fold else word
+    
+    def spans(self, text):
+        """Yield (term, start, end) for every term of text
+        
+        The n-th span is the term stored at position n, so positions can be
+        mapped back to character offsets.
+        """
+        lowered = text.lower()
+        # A few characters lowercase to several, shifting offsets; those
+        # texts are matched first and lowercased a word at a time
+        per_word = len(lowered) != len(text)
+        stop_words = self.stop_words
+        min_length = self.min_length
+        exact = self.exact
+        for match in self.pattern.finditer(text if per_word else lowered):
+            word = match.group().lower() if per_word else match.group()
+            if word not in stop_words and len(word) >= min_length:
+                yield (word if exact else self._normalize(word)), match.start(), match.end()
+    
+    def tokenize(self, text):
+        """List the terms of text"""
+        # Lowercased as in spans(); one lower() and findall keep the loop in C
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            words = map(str.lower, self.pattern.findall(text))
+        else:
+            words = self.pattern.findall(lowered)
+        stop_words = self.stop_words
+        min_length = self.min_length
+        words = [word for word in words if word not in stop_words and len(word) >= min_length]
+        if self.exact:
+            return words
+        return list(map(self._normalize, words))
+    
+    def iter_tokens(self, text):
+        """Yield the terms of text one at a time"""
+        for word, _, _ in self.spans(text):
+            yield word
+    
+    def stream(self, lines):
+        """Yield the terms of an iterable of lines, such as an open file
+        
+        Terms never span lines, so arbitrarily large inputs are analyzed
+        without being read into memory at once.
+        """
+        for line in lines:
+            yield from self.iter_tokens(line)
+    
+    def find_token(self, text, word, n):
+        """Offset of the n-th occurrence of term word in text, or -1"""
+        for term, start, _ in self.spans(text):
+            if term == word:
+                if n == 0:
+                    return start
+                n -= 1
+        return -1
+    
+    def tokenize_batch(self, texts, workers=None, chunksize=256):
+        """Tokenize many texts in a process pool, yielding token lists in order"""
+        workers = workers or multiprocessing.cpu_count()
+        if workers <= 1:
+            for text in texts:
+                yield self.tokenize(text)
+            return
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(self,)) as pool:
+            yield from pool.imap(_tokenize_in_worker, texts, chunksize)
+
+
+# The analyzer of a tokenize_batch worker process
+_worker_analyzer = None
+
+
+def _init_worker(analyzer):
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+
+
+def _tokenize_in_worker(text):
+    return _worker_analyzer.tokenize(text)
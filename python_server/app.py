@@ -3,12 +3,42 @@ Python Flask Server for Search Engine
 A simple search engine with SQLite database and inverted index
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 import json
-import sqlite3
+import re
 import os
+import sys
 import time
+import heapq
+import multiprocessing
+import threading
+from collections import Counter
+from bisect import bisect_left
+from itertools import groupby, islice
+
+# Sibling modules are imported directly, whether run as a script or under gunicorn
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scoring import (
+    SCORERS, MODES, CANDIDATES, PostingCursor, frequency_query, bm25_query, bm25_params,
+    bm25_idf, bm25_upper_bound, wand_top_k
+)
+from postings import PostingIndex
+from positions import encode_positions, decode_positions, intersect_all, contains_phrase, min_window
+from segment import SegmentIndex
+from cache import ResultCache
+from cursors import CursorError, Snapshot, SnapshotStore, search_fingerprint, encode_cursor, decode_cursor
+from pool import ConnectionPool
+from metrics import Registry, StageTimer, NULL_TIMER, profile_call
+from analysis import Analyzer
+from shards import ShardSet, shard_paths, merge_top_k
+from terms import TermDictionary, LiveTermDictionary
+from facets import CategoryIndex
+from startup import StartupTimes, read_state, write_state
+
+# Startup steps are timed from here
+STARTED_AT = time.time()
 
 # Get the base directory (project root)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,21 +47,107 @@ app = Flask(__name__, static_folder=os.path.join(BASE_DIR, 'frontend'), static_u
 CORS(app)
 
 # Configuration
-DATABASE_PATH = os.path.join(BASE_DIR, 'data', 'search_index.db')
+DATABASE_PATH = os.environ.get('SEARCH_DB_PATH', os.path.join(BASE_DIR, 'data', 'search_index.db'))
+BULK_BATCH_SIZE = 5000
+
+# Idle connections kept per worker (0 opens a new connection per request)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+
+# WAL lets searches read while a writer indexes; synchronous=NORMAL only
+# syncs at checkpoints, which is safe in WAL mode against application crashes
+SQLITE_PRAGMAS = [
+    ('journal_mode', os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')),
+    ('synchronous', os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+    # Negative sizes are in KiB: 64 MiB of page cache per connection
+    ('cache_size', int(os.environ.get('SQLITE_CACHE_SIZE', -65536))),
+    ('mmap_size', int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+]
+
+# 'sqlite' answers every query from the database; 'memory' loads the
+# postings into each worker at startup and answers searches from there;
+# 'segment' maps a shared on-disk segment file into every worker
+# Sharding: with SHARD_COUNT above 1 documents are partitioned by id across
+# that many databases next to DATABASE_PATH, which only hands out ids, and
+# searches fan out to SHARD_WORKERS processes
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 1))
+SHARD_WORKERS = int(os.environ.get('SHARD_WORKERS', SHARD_COUNT))
+
+INDEX_ENGINE = os.environ.get('INDEX_ENGINE', 'sqlite')
+SEGMENT_PATH = os.environ.get('SEGMENT_PATH', os.path.splitext(DATABASE_PATH)[0] + '.seg')
+SEGMENT_MERGE_DOCS = int(os.environ.get('SEGMENT_MERGE_DOCS', 10000))
+
+# Startup: with INIT_ON_STARTUP every process creates the schema, and seeds
+# an empty database, when it imports the app; turn it off once
+# `python python_server/manage.py init` has done that. The index engine and
+# the state file written by `manage.py snapshot` are attached at import, so
+# a gunicorn --preload master attaches once for all of its workers, or with
+# LAZY_ATTACH by each process on its first request
+INIT_ON_STARTUP = os.environ.get('INIT_ON_STARTUP', '1').lower() not in ('0', 'false', 'no')
+LAZY_ATTACH = os.environ.get('LAZY_ATTACH', '0').lower() not in ('0', 'false', 'no')
+STATE_PATH = os.environ.get('STATE_PATH', os.path.splitext(DATABASE_PATH)[0] + '.state')
+
+# Proximity boost: weight of the boost and how many top results are re-ranked;
+# results past them keep their unboosted order
+PROXIMITY_WEIGHT = 0.5
+PROXIMITY_CANDIDATES = 100
+POSITION_BATCH_SIZE = 500
+
+# Category and phrase filters with at most this many documents per posting
+# of the query words are intersected by looking their documents up in the
+# index; larger ones are tested against the postings as they are ranked
+FILTER_PROBE_RATIO = 2
+
+# Snippets start at the densest cluster of query words within this many
+# tokens, looking only at the first SNIPPET_MAX_HITS occurrences
+SNIPPET_WINDOW = 20
+SNIPPET_MAX_HITS = 64
+
+# Search result cache: entry and memory bounds, and entry lifetime in seconds
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+RESULT_CACHE_BYTES = int(os.environ.get('RESULT_CACHE_BYTES', 64 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 300))
+
+# Cursor pagination: ranked result lists kept for follow-up pages, their
+# memory bound and how long one lives after its last page was read
+CURSOR_SNAPSHOTS = int(os.environ.get('CURSOR_SNAPSHOTS', 256))
+CURSOR_SNAPSHOT_BYTES = int(os.environ.get('CURSOR_SNAPSHOT_BYTES', 64 * 1024 * 1024))
+CURSOR_TTL = float(os.environ.get('CURSOR_TTL', 60))
+
+# Term dictionary for /api/suggest and fuzzy search: seconds between rebuilds
+# once new documents are indexed, indexed terms tried for each unknown query
+# word, and leading characters a fuzzy match must share with the word
+TERM_DICTIONARY_REFRESH = float(os.environ.get('TERM_DICTIONARY_REFRESH', 30))
+FUZZY_EXPANSIONS = int(os.environ.get('FUZZY_EXPANSIONS', 3))
+FUZZY_PREFIX_LENGTH = int(os.environ.get('FUZZY_PREFIX_LENGTH', 1))
+SUGGEST_MAX_LIMIT = 20
+# Suggestions are requested on every keystroke, so their fuzzy matches
+# allow one edit after two exact characters, which bounds the lookup
+SUGGEST_FUZZY_EDITS = 1
+SUGGEST_FUZZY_PREFIX_LENGTH = 2
+
+# Analyzer options: accent folding and stemming. They change the index terms,
+# so documents indexed before switching them must be indexed again
+ANALYZER_FOLD = os.environ.get('ANALYZER_FOLD', '0').lower() not in ('0', 'false', 'no')
+ANALYZER_STEM = os.environ.get('ANALYZER_STEM', '0').lower() not in ('0', 'false', 'no')
+
+# Per-stage timers and request metrics for /api/metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+PROFILE_LINES = 30
+
+# Secondary indexes on inverted_index (dropped and rebuilt around bulk loads)
+INDEX_STATEMENTS = {
+    'idx_word': 'CREATE INDEX IF NOT EXISTS idx_word ON inverted_index(word)',
+    'idx_document': 'CREATE INDEX IF NOT EXISTS idx_document ON inverted_index(document_id)',
+}
 
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a database connection from the pool (close() returns it)"""
+    return db_pool.acquire()
 
 
-def init_database():
-    """Initialize the database with sample data if not exists"""
-    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
-    
-    conn = get_db_connection()
+def create_schema(conn):
+    """Create the tables and indexes of the database or of one shard"""
     cursor = conn.cursor()
     
     # Create tables
@@ -58,15 +174,78 @@ def init_database():
         )
     ''')
     
+    # Corpus statistics for ranking, maintained at index time
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS doc_stats (
+            document_id INTEGER PRIMARY KEY,
+            length INTEGER NOT NULL
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS term_stats (
+            word TEXT PRIMARY KEY,
+            doc_freq INTEGER NOT NULL,
+            max_frequency INTEGER NOT NULL DEFAULT 0,
+            min_length INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # max_frequency and min_length were added for top-k upper bounds
+    cursor.execute('PRAGMA table_info(term_stats)')
+    if 'max_frequency' not in [row['name'] for row in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE term_stats ADD COLUMN max_frequency INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('ALTER TABLE term_stats ADD COLUMN min_length INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('''
+            UPDATE term_stats SET
+                max_frequency = (
+                    SELECT MAX(frequency) FROM inverted_index WHERE inverted_index.word = term_stats.word
+                ),
+                min_length = (
+                    SELECT MIN(ds.length) FROM inverted_index ii
+                    JOIN doc_stats ds ON ds.document_id = ii.document_id
+                    WHERE ii.word = term_stats.word
+                )
+        ''')
+        conn.commit()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS index_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    
     # Create indexes for faster searching
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_word ON inverted_index(word)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document ON inverted_index(document_id)')
+    for statement in INDEX_STATEMENTS.values():
+        cursor.execute(statement)
     
-    # Check if we have sample data
-    cursor.execute('SELECT COUNT(*) FROM documents')
-    count = cursor.fetchone()[0]
+    # Databases created before corpus statistics existed are backfilled once
+    cursor.execute("SELECT value FROM index_meta WHERE key = 'doc_count'")
+    if cursor.fetchone() is None:
+        rebuild_corpus_stats(cursor)
+    conn.commit()
+
+
+def init_database():
+    """Initialize the database with sample data if not exists"""
+    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
     
-    if count == 0:
+    conn = get_db_connection()
+    create_schema(conn)
+    
+    # Check if we have sample data, without counting every document
+    if shard_set is None:
+        empty = conn.execute('SELECT 1 FROM documents LIMIT 1').fetchone() is None
+    else:
+        empty = True
+        for shard in range(shard_set.count):
+            shard_conn = shard_set.connect(shard)
+            create_schema(shard_conn)
+            empty = empty and shard_conn.execute('SELECT 1 FROM documents LIMIT 1').fetchone() is None
+            shard_conn.close()
+    
+    if empty:
         # Insert sample data
         sample_documents = [
             {
@@ -192,149 +371,1506 @@ def init_database():
         ]
         
         for doc in sample_documents:
-            cursor.execute('''
-                INSERT INTO documents (title, content, url, category)
-                VALUES (?, ?, ?, ?)
-            ''', (doc['title'], doc['content'], doc['url'], doc['category']))
-            
-            doc_id = cursor.lastrowid
-            
-            # Build inverted index
-            words = tokenize(doc['title'] + ' ' + doc['content'])
-            word_freq = {}
-            for pos, word in enumerate(words):
-                if word not in word_freq:
-                    word_freq[word] = {'count': 0, 'positions': []}
-                word_freq[word]['count'] += 1
-                word_freq[word]['positions'].append(pos)
-            
-            for word, data in word_freq.items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO inverted_index (word, document_id, frequency, positions)
-                    VALUES (?, ?, ?, ?)
-                ''', (word, doc_id, data['count'], json.dumps(data['positions'])))
+            store_document(conn, doc)
         
-        conn.commit()
         print(f"Initialized database with {len(sample_documents)} sample documents")
     
     conn.close()
 
 
+def rebuild_corpus_stats(cursor):
+    """Recompute document lengths, document frequencies and corpus totals"""
+    cursor.execute('DELETE FROM doc_stats')
+    cursor.execute('''
+        INSERT INTO doc_stats (document_id, length)
+        SELECT document_id, SUM(frequency) FROM inverted_index GROUP BY document_id
+    ''')
+    
+    cursor.execute('DELETE FROM term_stats')
+    cursor.execute('''
+        INSERT INTO term_stats (word, doc_freq, max_frequency, min_length)
+        SELECT ii.word, COUNT(*), MAX(ii.frequency), MIN(ds.length)
+        FROM inverted_index ii
+        JOIN doc_stats ds ON ds.document_id = ii.document_id
+        GROUP BY ii.word
+    ''')
+    
+    cursor.execute('''
+        INSERT OR REPLACE INTO index_meta (key, value)
+        SELECT 'doc_count', COUNT(*) FROM documents
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO index_meta (key, value)
+        SELECT 'total_length', COALESCE(SUM(length), 0) FROM doc_stats
+    ''')
+
+
+def record_document_stats(cursor, indexed_docs):
+    """Update corpus statistics for newly indexed (doc_id, word_freq) pairs"""
+    doc_lengths = []
+    doc_freqs = Counter()
+    max_freqs = {}
+    min_lengths = {}
+    for doc_id, word_freq in indexed_docs:
+        length = sum(data['count'] for data in word_freq.values())
+        doc_lengths.append((doc_id, length))
+        doc_freqs.update(word_freq.keys())
+        for word, data in word_freq.items():
+            if data['count'] > max_freqs.get(word, 0):
+                max_freqs[word] = data['count']
+            if length < min_lengths.get(word, length + 1):
+                min_lengths[word] = length
+    
+    cursor.executemany('INSERT OR REPLACE INTO doc_stats (document_id, length) VALUES (?, ?)', doc_lengths)
+    cursor.executemany('''
+        INSERT INTO term_stats (word, doc_freq, max_frequency, min_length) VALUES (?, ?, ?, ?)
+        ON CONFLICT(word) DO UPDATE SET
+            doc_freq = doc_freq + excluded.doc_freq,
+            max_frequency = MAX(max_frequency, excluded.max_frequency),
+            min_length = MIN(min_length, excluded.min_length)
+    ''', [(word, count, max_freqs[word], min_lengths[word]) for word, count in doc_freqs.items()])
+    cursor.executemany('''
+        INSERT INTO index_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+    ''', [
+        ('doc_count', len(doc_lengths)),
+        ('total_length', sum(length for _, length in doc_lengths)),
+        # Bumped by every write so each worker can tell its cache is stale
+        ('generation', 1)
+    ])
+
+
+def get_index_generation(cursor):
+    """Read the index generation, which changes whenever documents are indexed"""
+    cursor.execute("SELECT value FROM index_meta WHERE key = 'generation'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def bump_index_generation(cursor):
+    """Mark the catalog of a sharded index as changed"""
+    cursor.execute('''
+        INSERT INTO index_meta (key, value) VALUES ('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    ''')
+
+
+def allocate_doc_ids(conn, count):
+    """Reserve count consecutive document ids in the catalog, returning the first"""
+    cursor = conn.execute('''
+        INSERT INTO index_meta (key, value) VALUES ('next_doc_id', ?)
+        ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+        RETURNING value
+    ''', (count,))
+    last_id = cursor.fetchone()[0]
+    conn.commit()
+    return last_id - count + 1
+
+
+def get_corpus_stats(cursor, words):
+    """Read document count, average length and per-term statistics of words"""
+    cursor.execute("SELECT key, value FROM index_meta WHERE key IN ('doc_count', 'total_length')")
+    meta = {row['key']: row['value'] for row in cursor.fetchall()}
+    doc_count = meta.get('doc_count', 0)
+    
+    placeholders = ','.join('?' * len(words))
+    cursor.execute(f'''
+        SELECT word, doc_freq, max_frequency, min_length
+        FROM term_stats WHERE word IN ({placeholders})
+    ''', words)
+    rows = cursor.fetchall()
+    
+    return {
+        'doc_count': doc_count,
+        'avg_length': meta.get('total_length', 0) / doc_count if doc_count else 0,
+        'doc_freqs': {row['word']: row['doc_freq'] for row in rows},
+        'max_freqs': {row['word']: row['max_frequency'] for row in rows},
+        'min_lengths': {row['word']: row['min_length'] for row in rows}
+    }
+
+
+def token_spans(text):
+    """Yield (word, start, end) for every indexed word of text
+    
+    The n-th span is the word stored at position n, so positions can be
+    mapped back to character offsets.
+    """
+    return analyzer.spans(text)
+
+
 def tokenize(text):
-    """Simple tokenizer - splits text into lowercase words"""
-    import re
-    # Remove special characters and split
-    words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-    # Remove common stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-                  'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been',
-                  'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-                  'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
-                  'those', 'it', 'its', 'as', 'if', 'then', 'than', 'so', 'such'}
-    return [w for w in words if w not in stop_words and len(w) > 1]
-
-
-def search_database(query, page=1, limit=10):
-    """Search the database using the inverted index"""
+    """Split text into its index terms"""
+    return analyzer.tokenize(text)
+
+
+def build_word_index(text):
+    """Build word frequencies and positions for a piece of text"""
+    word_freq = {}
+    for pos, word in enumerate(tokenize(text)):
+        if word not in word_freq:
+            word_freq[word] = {'count': 0, 'positions': []}
+        word_freq[word]['count'] += 1
+        word_freq[word]['positions'].append(pos)
+    return word_freq
+
+
+def analyze_document(doc):
+    """Build a document's word index (runs in bulk worker processes)"""
+    return build_word_index(doc['title'] + ' ' + doc['content'])
+
+
+def read_ndjson_documents(lines, errors):
+    """Parse NDJSON lines into documents, collecting bad lines in errors"""
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            doc = json.loads(line)
+        except ValueError as e:
+            errors.append({'line': line_number, 'error': str(e)})
+            continue
+        
+        if not isinstance(doc, dict) or 'title' not in doc or 'content' not in doc:
+            errors.append({'line': line_number, 'error': 'Title and content are required'})
+            continue
+        
+        yield doc
+
+
+def _batches(docs, batch_size):
+    """Group an iterable of documents into lists of batch_size"""
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_batch(conn, batch, analyzed, doc_ids=None):
+    """Write one batch of documents and postings in a single transaction
+    
+    Without doc_ids the documents take the ids after the largest one.
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    
+    try:
+        # Ids are assigned here so postings can be written with executemany
+        if doc_ids is None:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM documents')
+            first_id = cursor.fetchone()[0] + 1
+            doc_ids = range(first_id, first_id + len(batch))
+        
+        cursor.executemany('''
+            INSERT INTO documents (id, title, content, url, category)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (doc_id, doc['title'], doc['content'], doc.get('url', ''), doc.get('category', 'General'))
+            for doc_id, doc in zip(doc_ids, batch)
+        ])
+        
+        postings = [
+            (word, doc_id, data['count'], encode_positions(data['positions']))
+            for doc_id, word_freq in zip(doc_ids, analyzed)
+            for word, data in word_freq.items()
+        ]
+        cursor.executemany('''
+            INSERT INTO inverted_index (word, document_id, frequency, positions)
+            VALUES (?, ?, ?, ?)
+        ''', postings)
+        
+        record_document_stats(cursor, list(zip(doc_ids, analyzed)))
+        
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    
+    return len(postings)
+
+
+def _write_pending(conn, pending, pool, timer):
+    """Wait for a tokenized batch and write it, timing both"""
+    batch, analyzed = pending
+    timer.mark('bulk_read')
+    if pool:
+        analyzed = analyzed.get()
+    timer.mark('bulk_analyze')
+    posting_count = _write_batch(conn, batch, analyzed)
+    timer.mark('bulk_write')
+    return posting_count
+
+
+def write_shard_batch(conn, batch, doc_ids):
+    """Tokenize and write one shard's part of a batch (runs in a shard worker)"""
+    conn.isolation_level = None
+    return _write_batch(conn, batch, [analyze_document(doc) for doc in batch], doc_ids)
+
+
+def set_shard_indexes(conn, present):
+    """Drop or recreate the secondary indexes of one shard"""
+    for name, statement in INDEX_STATEMENTS.items():
+        conn.execute(statement if present else f'DROP INDEX IF EXISTS {name}')
+
+
+def bulk_index_sharded(lines, batch_size=BULK_BATCH_SIZE, rebuild_indexes=False):
+    """Index a stream of NDJSON documents into the shards
+    
+    Each batch gets consecutive ids from the catalog and is split by shard;
+    every shard worker tokenizes and writes its part while the next batch
+    is read.
+    """
+    start_time = time.time()
+    errors = []
+    doc_count = 0
+    posting_count = 0
+    
+    conn = get_db_connection()
+    timer = StageTimer() if METRICS_ENABLED else NULL_TIMER
+    
+    def split(batch):
+        first_id = allocate_doc_ids(conn, len(batch))
+        parts = [([], []) for _ in range(shard_set.count)]
+        for doc_id, doc in enumerate(batch, first_id):
+            docs, doc_ids = parts[shard_set.shard_of(doc_id)]
+            docs.append(doc)
+            doc_ids.append(doc_id)
+        return [part if part[0] else None for part in parts]
+    
+    try:
+        if rebuild_indexes:
+            shard_set.scatter(set_shard_indexes, [(False,)] * shard_set.count)
+        
+        pending = None
+        for batch in _batches(read_ndjson_documents(lines, errors), batch_size):
+            written = shard_set.scatter_async(write_shard_batch, split(batch))
+            timer.mark('bulk_read')
+            if pending:
+                posting_count += sum(pending.get())
+            timer.mark('bulk_write')
+            doc_count += len(batch)
+            pending = written
+        if pending:
+            posting_count += sum(pending.get())
+        timer.mark('bulk_write')
+    
+    finally:
+        if rebuild_indexes:
+            shard_set.scatter(set_shard_indexes, [(True,)] * shard_set.count)
+            timer.mark('rebuild_indexes')
+        bump_index_generation(conn.cursor())
+        conn.commit()
+        conn.close()
+        timer.observe(INDEX_STAGES)
+    
+    elapsed = time.time() - start_time
+    
+    return {
+        'documents': doc_count,
+        'postings': posting_count,
+        'errors': errors,
+        'elapsed': elapsed,
+        'docs_per_sec': doc_count / elapsed if elapsed else 0,
+        'postings_per_sec': posting_count / elapsed if elapsed else 0
+    }
+
+
+def bulk_index_documents(lines, batch_size=BULK_BATCH_SIZE, workers=None, rebuild_indexes=False):
+    """Index a stream of NDJSON documents using a tokenizer pool and batched writes
+    
+    A sharded index is written by its shard workers instead, so workers is
+    ignored there.
+    """
+    attach_index()
+    if shard_set is not None:
+        return bulk_index_sharded(lines, batch_size, rebuild_indexes)
+    
     start_time = time.time()
+    errors = []
+    doc_count = 0
+    posting_count = 0
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
     
     conn = get_db_connection()
+    conn.isolation_level = None
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    timer = StageTimer() if METRICS_ENABLED else NULL_TIMER
+    
+    try:
+        if rebuild_indexes:
+            for name in INDEX_STATEMENTS:
+                conn.execute(f'DROP INDEX IF EXISTS {name}')
+        
+        # Tokenize the next batch in the pool while the current one is written
+        pending = None
+        for batch in _batches(read_ndjson_documents(lines, errors), batch_size):
+            if pool:
+                analyzed = pool.map_async(analyze_document, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            else:
+                analyzed = [analyze_document(doc) for doc in batch]
+            
+            if pending:
+                posting_count += _write_pending(conn, pending, pool, timer)
+                doc_count += len(pending[0])
+            pending = (batch, analyzed)
+        
+        if pending:
+            posting_count += _write_pending(conn, pending, pool, timer)
+            doc_count += len(pending[0])
+    
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if rebuild_indexes:
+            for statement in INDEX_STATEMENTS.values():
+                conn.execute(statement)
+            timer.mark('rebuild_indexes')
+        refresh_index_engine(conn, merge=True)
+        refresh_categories(conn)
+        timer.mark('refresh')
+        conn.close()
+        timer.observe(INDEX_STAGES)
+    
+    elapsed = time.time() - start_time
+    
+    return {
+        'documents': doc_count,
+        'postings': posting_count,
+        'errors': errors,
+        'elapsed': elapsed,
+        'docs_per_sec': doc_count / elapsed if elapsed else 0,
+        'postings_per_sec': posting_count / elapsed if elapsed else 0
+    }
+
+
+def load_index_engine(postings=None):
+    """Load the in-memory posting index or open the segment file
+    
+    postings is a posting index restored from the state file; only the
+    documents indexed since it was written are read into it.
+    """
+    start_time = time.time()
+    conn = get_db_connection()
+    if INDEX_ENGINE == 'segment':
+        engine = SegmentIndex(SEGMENT_PATH, SEGMENT_MERGE_DOCS, get_db_connection)
+        engine.open(conn)
+    elif postings is not None:
+        engine = postings
+        engine.refresh(conn)
+    else:
+        engine = PostingIndex()
+        engine.load(conn)
+    conn.close()
+    
+    print(f"Opened {INDEX_ENGINE} index in {time.time() - start_time:.2f}s: {json.dumps(engine.stats())}")
+    return engine
+
+
+def attach_index():
+    """Open the index engine and restore the state file, once per process"""
+    global index_engine, index_attached
+    if index_attached:
+        return
+    with attach_lock:
+        if index_attached:
+            return
+        start_time = time.time()
+        conn = get_db_connection()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'index_meta'").fetchone() is None:
+            conn.close()
+            raise RuntimeError('The database has no index yet: run python python_server/manage.py init')
+        state = read_state(STATE_PATH)
+        startup_times.state = restore_state(conn, state)
+        conn.close()
+        if INDEX_ENGINE in ('memory', 'segment') and shard_set is None:
+            restored = startup_times.state in ('restored', 'stale')
+            index_engine = load_index_engine(state.get('postings') if restored else None)
+        startup_times.mark('attach', start_time)
+        index_attached = True
+        print(f"Attached index in {time.time() - start_time:.2f}s (state file {startup_times.state})")
+
+
+def restore_state(conn, state):
+    """Take the term dictionary and category bitsets from a state file
+    
+    Returns how the state compares with the database: 'missing',
+    'mismatched' when it was written for another shard count, 'stale' when
+    documents were indexed since, which are read on first use, or 'restored'.
+    """
+    if state is None:
+        return 'missing'
+    if state['shard_count'] != SHARD_COUNT:
+        return 'mismatched'
+    term_dictionary.restore(state['terms'], state['generation'])
+    category_indexes.update(state['categories'])
+    return 'restored' if state['generation'] == get_index_generation(conn.cursor()) else 'stale'
+
+
+def write_state_file(path=STATE_PATH):
+    """Read the term dictionary and category bitsets into a state file
+    
+    With INDEX_ENGINE=memory the posting index goes into it as well.
+    """
+    conn = get_db_connection()
+    # Read first, so documents indexed meanwhile are caught up on restore
+    generation = get_index_generation(conn.cursor())
+    categories = {}
+    if shard_set is None:
+        categories[None] = CategoryIndex()
+        categories[None].refresh(conn)
+    else:
+        for shard in range(shard_set.count):
+            shard_conn = shard_set.connect(shard)
+            categories[shard] = CategoryIndex()
+            categories[shard].refresh(shard_conn)
+            shard_conn.close()
+    postings = None
+    if INDEX_ENGINE == 'memory' and shard_set is None:
+        postings = PostingIndex()
+        postings.load(conn)
+    conn.close()
+    
+    state = {
+        'generation': generation,
+        'shard_count': SHARD_COUNT,
+        'terms': load_term_dictionary(),
+        'categories': categories,
+        'postings': postings
+    }
+    write_state(path, state)
+    return state
+
+
+def refresh_index_engine(conn, merge=False):
+    """Bring the index engine up to date with the database, returning
+    whether it is
+    
+    Only one thread refreshes at a time. A search skips the refresh while
+    another thread is refreshing, and ranks against the engine as it was;
+    a write waits so its document is visible, but not for a segment merge
+    it starts, which runs in the background.
+    """
+    if index_engine is None:
+        return True
+    if not engine_lock.acquire(blocking=merge):
+        return False
+    try:
+        index_engine.refresh(conn)
+        if merge:
+            index_engine.maybe_merge(conn)
+    finally:
+        engine_lock.release()
+    return True
+
+
+def categories_of(conn, shard=None):
+    """Category bitsets of the database, or of one shard, brought up to date"""
+    categories = category_indexes.get(shard)
+    if categories is None:
+        categories = category_indexes.setdefault(shard, CategoryIndex())
+    categories.refresh(conn)
+    return categories
+
+
+def refresh_categories(conn):
+    """Add newly indexed documents to the category bitsets once they are in use
+    
+    Shard workers keep the bitsets of their shards and catch up when they
+    next filter or count.
+    """
+    if None in category_indexes:
+        categories_of(conn)
+
+
+def shard_category_stats(conn, shard):
+    """Category figures of one shard (runs in a shard worker)"""
+    return categories_of(conn, shard).stats()
+
+
+def load_term_dictionary():
+    """Read every indexed term and its document frequency into a TermDictionary"""
+    start_time = time.time()
+    if shard_set is None:
+        conn = get_db_connection()
+        terms = TermDictionary(conn.execute('SELECT word, doc_freq FROM term_stats ORDER BY word'), SUGGEST_MAX_LIMIT)
+        conn.close()
+    else:
+        # A word's document frequency is summed over the shards holding it
+        conns = [shard_set.connect(shard) for shard in range(shard_set.count)]
+        merged = heapq.merge(*(conn.execute('SELECT word, doc_freq FROM term_stats ORDER BY word') for conn in conns),
+                             key=lambda row: row[0])
+        terms = TermDictionary(
+            ((word, sum(row[1] for row in rows)) for word, rows in groupby(merged, key=lambda row: row[0])),
+            SUGGEST_MAX_LIMIT
+        )
+        for conn in conns:
+            conn.close()
+    
+    print(f"Loaded term dictionary in {time.time() - start_time:.2f}s: {json.dumps(terms.stats())}")
+    return terms
+
+
+def current_terms(conn):
+    """The term dictionary, rebuilt in the background as documents are indexed"""
+    return term_dictionary.get(get_index_generation(conn.cursor()))
+
+
+def expand_fuzzy(conn, words):
+    """Replace query words missing from the index with their closest terms
+    
+    Returns the new words and {word: [terms]} for every word replaced.
+    Words that are indexed are kept as they are; a word with no term
+    within its edit distance is dropped.
+    """
+    unique_words = list(dict.fromkeys(words))
+    stats = global_corpus_stats(unique_words) if shard_set is not None else get_corpus_stats(conn.cursor(), unique_words)
+    known = stats['doc_freqs']
+    if all(word in known for word in unique_words):
+        return words, {}
+    
+    terms = current_terms(conn)
+    expansions = {}
+    expanded = []
+    for word in words:
+        if word in known:
+            expanded.append(word)
+            continue
+        if word not in expansions:
+            matches = terms.fuzzy(word, limit=FUZZY_EXPANSIONS, prefix_length=FUZZY_PREFIX_LENGTH)
+            expansions[word] = [term for term, _, _ in matches]
+        expanded.extend(expansions[word])
+    return expanded, expansions
+
+
+def _ranked_rows(ranked):
+    """Convert wand_top_k tuples into rows shaped like the SQL results"""
+    return [
+        {'document_id': doc_id, 'score': score, 'matched_words': matched, 'total_freq': total_freq}
+        for doc_id, score, matched, total_freq in ranked
+    ]
+
+
+def common_word_matches(doc_freqs, allowed, count_allowed):
+    """Matches of the query's most common word: a lower bound for top-k totals
+    
+    Every document holding it matches; with a filter, count_allowed(word,
+    doc_freq) counts the ones the filter allows. Ties go to the first word
+    in term order, so every engine and every shard counts the same word.
+    """
+    doc_freqs = {word: doc_freq for word, doc_freq in doc_freqs.items() if doc_freq}
+    if not doc_freqs:
+        return 0
+    word = min(doc_freqs, key=lambda word: (-doc_freqs[word], word))
+    return doc_freqs[word] if allowed is None else count_allowed(word, doc_freqs[word])
+
+
+def count_allowed(cursor, word, doc_freq, allowed):
+    """Number of documents in allowed holding word
+    
+    A filter smaller than the word's postings has its documents looked up;
+    a larger one is tested against the postings.
+    """
+    if len(allowed) <= doc_freq:
+        cursor.execute(f'''
+            WITH {CANDIDATES}
+            SELECT COUNT(*) FROM candidates c
+            JOIN inverted_index ii ON ii.word = ? AND ii.document_id = c.document_id
+        ''', (json.dumps(list(allowed)), word))
+        return cursor.fetchone()[0]
+    cursor.execute('SELECT document_id FROM inverted_index WHERE word = ?', (word,))
+    return sum(1 for row in cursor if row[0] in allowed)
+
+
+def top_k_total(rows, k, matches):
+    """Total reported for a top-k ranking cut off at k
+    
+    A ranking shorter than k holds every match; otherwise matches, the
+    lower bound from common_word_matches, is reported, and never less
+    than the k documents found.
+    """
+    return len(rows) if len(rows) < k else max(k, matches)
+
+
+def rank_in_memory(words, scorer, mode, k, allowed=None):
+    """Rank documents from the in-memory index, returning (rows, total)
+    
+    Top-k totals are the lower bound of common_word_matches.
+    """
+    if mode == 'topk':
+        ranked = index_engine.top_k(words, k, allowed)
+        doc_freqs = {word: index_engine.doc_freq(word) for word in words}
+        total = common_word_matches(doc_freqs, allowed, lambda word, _: index_engine.count_allowed(word, allowed))
+        return _ranked_rows(ranked), total
+    
+    if scorer == 'bm25':
+        doc_scores = index_engine.rank_bm25(words, allowed)
+    else:
+        doc_scores = index_engine.rank_frequency(words, allowed)
+    return doc_scores, len(doc_scores)
+
+
+def rank_documents(conn, words, scorer, mode, k, allowed=None, stats=None):
+    """Score documents for query words, returning (rows, total matches)
+    
+    allowed, when given, is the set of document ids that may be returned:
+    a set or a Bitset. stats replaces the database's own corpus statistics,
+    so that every shard of a sharded index scores with the global ones.
+    Top-k rankings hold at most k rows and their totals are the lower bound
+    of common_word_matches, however the filter is applied.
+    """
+    if index_engine is not None:
+        return rank_in_memory(words, scorer, mode, k, allowed)
+    
     cursor = conn.cursor()
+    if scorer == 'bm25' or allowed is not None:
+        stats = stats or get_corpus_stats(cursor, words)
+    # The smaller side drives the intersection with a filter: a small one
+    # has its documents looked up in the index, which ranks all of them for
+    # less than WAND would spend walking the postings in top-k mode; a large
+    # one is tested against the postings
+    probe = allowed is not None and \
+        len(allowed) * len(words) <= FILTER_PROBE_RATIO * sum(stats['doc_freqs'].values())
+    
+    if mode == 'topk' and not probe:
+        doc_scores = top_k_search(conn, words, stats, k, allowed)
+    else:
+        candidates = [json.dumps(list(allowed))] if probe else []
+        if scorer == 'bm25':
+            cursor.execute(
+                bm25_query(len(words), probe),
+                candidates + bm25_params(words, stats['doc_freqs'], stats['doc_count'], stats['avg_length'])
+            )
+        else:
+            cursor.execute(frequency_query(len(words), probe), candidates + words)
+        
+        doc_scores = cursor.fetchall()
+        if allowed is not None and not probe:
+            doc_scores = [row for row in doc_scores if row['document_id'] in allowed]
+        if mode != 'topk':
+            return doc_scores, len(doc_scores)
+        # A probed filter ranks all of its matches; keep the k WAND would find
+        doc_scores = doc_scores[:k]
+    
+    # Only the best k documents are scored, so the total is a lower bound
+    total = common_word_matches(
+        stats['doc_freqs'], allowed, lambda word, doc_freq: count_allowed(cursor, word, doc_freq, allowed)
+    )
+    return doc_scores, total
+
+
+def parse_query(query):
+    """Split a query into its words and its quoted phrases"""
+    phrases = []
+    for text in re.findall(r'"([^"]*)"', query):
+        words = tokenize(text)
+        # A one-word phrase is just a word
+        if len(words) > 1:
+            phrases.append(words)
+    return tokenize(query), phrases
+
+
+def docs_with_all_words(conn, words):
+    """Sorted ids of documents containing every word"""
+    if index_engine is not None:
+        return index_engine.docs_with_all(words)
+    
+    cursor = conn.cursor()
+    doc_lists = []
+    for word in words:
+        cursor.execute('SELECT document_id FROM inverted_index WHERE word = ? ORDER BY document_id', (word,))
+        doc_lists.append([row[0] for row in cursor.fetchall()])
+    return intersect_all(doc_lists)
+
+
+def fetch_positions(conn, doc_ids, words):
+    """Read {doc_id: {word: positions}} for words in the given documents"""
+    positions = {}
+    cursor = conn.cursor()
+    word_placeholders = ','.join('?' * len(words))
+    for i in range(0, len(doc_ids), POSITION_BATCH_SIZE):
+        batch = doc_ids[i:i + POSITION_BATCH_SIZE]
+        cursor.execute(f'''
+            SELECT document_id, word, positions FROM inverted_index
+            WHERE word IN ({word_placeholders}) AND document_id IN ({','.join('?' * len(batch))})
+        ''', list(words) + list(batch))
+        for doc_id, word, value in cursor.fetchall():
+            positions.setdefault(doc_id, {})[word] = decode_positions(value)
+    return positions
+
+
+def match_phrases(conn, phrases, allowed=None):
+    """Ids of documents containing every phrase, among allowed when given"""
+    words = list(dict.fromkeys(word for phrase in phrases for word in phrase))
+    
+    # Intersect document ids first; positions are only read for candidates
+    candidates = docs_with_all_words(conn, words)
+    if allowed is not None:
+        candidates = [doc_id for doc_id in candidates if doc_id in allowed]
+    positions = fetch_positions(conn, candidates, words)
+    
+    return {
+        doc_id for doc_id in candidates
+        if all(contains_phrase([positions[doc_id][word] for word in phrase]) for phrase in phrases)
+    }
+
+
+def candidate_filter(conn, phrases, categories, shard=None):
+    """Ids of the documents a search may return, or None when any may be
+    
+    Documents must contain every phrase and, with categories, be in one of
+    them. Phrase candidates are narrowed by the category bitset before any
+    positions are read.
+    """
+    selected = categories_of(conn, shard).select(categories) if categories else None
+    if phrases:
+        return match_phrases(conn, phrases, selected)
+    return selected
+
+
+def count_facets(conn, doc_scores, shard=None):
+    """{category: matches} of ranked rows"""
+    return categories_of(conn, shard).counts(row['document_id'] for row in doc_scores)
+
+
+def apply_proximity_boost(conn, doc_scores, words, count):
+    """Boost the top results whose query words occur close together"""
+    top = [row if isinstance(row, dict) else dict(zip(row.keys(), row)) for row in doc_scores[:count]]
+    positions = _read_shards(conn, fetch_positions, [row['document_id'] for row in top if row['matched_words'] > 1], words)
+    
+    for row in top:
+        doc_positions = positions.get(row['document_id'])
+        if not doc_positions or len(doc_positions) < 2:
+            continue
+        # The boost is largest when all matched words are adjacent
+        span = min_window(list(doc_positions.values()))
+        row['score'] *= 1 + PROXIMITY_WEIGHT * (len(doc_positions) - 1) / (span - 1)
+    
+    top.sort(key=lambda row: (-row['score'], row['document_id']))
+    return top + list(doc_scores[count:])
+
+
+def top_k_search(conn, words, stats, k, allowed=None):
+    """Rank the k best documents by BM25 using WAND over streamed postings"""
+    cursors = []
+    for word in words:
+        if word not in stats['doc_freqs']:
+            continue
+        idf = bm25_idf(stats['doc_count'], stats['doc_freqs'][word])
+        upper_bound = bm25_upper_bound(idf, stats['max_freqs'][word], stats['min_lengths'][word], stats['avg_length'])
+        cursors.append(PostingCursor(conn, word, idf, upper_bound))
+    
+    return _ranked_rows(wand_top_k(cursors, k, stats['avg_length'], allowed))
+
+
+def global_corpus_stats(words):
+    """Corpus statistics of words over every shard of a sharded index"""
+    doc_count = 0
+    total_length = 0
+    doc_freqs = Counter()
+    max_freqs = {}
+    min_lengths = {}
+    for shard in range(shard_set.count):
+        conn = shard_set.connect(shard)
+        stats = get_corpus_stats(conn.cursor(), words)
+        conn.close()
+        doc_count += stats['doc_count']
+        total_length += stats['avg_length'] * stats['doc_count']
+        doc_freqs.update(stats['doc_freqs'])
+        for word, frequency in stats['max_freqs'].items():
+            max_freqs[word] = max(max_freqs.get(word, 0), frequency)
+        for word, length in stats['min_lengths'].items():
+            min_lengths[word] = min(min_lengths.get(word, length), length)
+    
+    return {
+        'doc_count': doc_count,
+        'avg_length': total_length / doc_count if doc_count else 0,
+        'doc_freqs': dict(doc_freqs),
+        'max_freqs': max_freqs,
+        'min_lengths': min_lengths
+    }
+
+
+def _rank_key(scorer):
+    """Sort key of (doc_id, score, matched_words, total_freq) rows, best first"""
+    if scorer == 'frequency':
+        # The order of frequency_query
+        return lambda row: (-row[2], -row[3], row[0])
+    return lambda row: (-row[1], row[0])
+
+
+def search_shard(conn, shard, words, phrases, scorer, mode, k, stats, categories=(), facets=False):
+    """Rank one shard, returning its best k rows, its number of matches and
+    their category counts (None without facets)
+    
+    Runs in a shard worker. Rows are (doc_id, score, matched_words,
+    total_freq) tuples ordered by _rank_key.
+    """
+    allowed = candidate_filter(conn, phrases, categories, shard) if phrases or categories else None
+    doc_scores, total = rank_documents(conn, words, scorer, mode, k, allowed, stats)
+    if phrases:
+        # Phrase words are query words, so every candidate matches and the
+        # count is exact in top-k mode too
+        total = len(allowed)
+    counts = count_facets(conn, doc_scores, shard) if facets else None
+    rows = [(row['document_id'], row['score'], row['matched_words'], row['total_freq']) for row in doc_scores]
+    return heapq.nsmallest(k, rows, key=_rank_key(scorer)), total, counts
+
+
+def rank_shards(words, phrases, scorer, mode, k, timer=NULL_TIMER, categories=(), facets=False):
+    """Rank every shard in parallel and merge their best k, returning (rows,
+    total, category counts)
+    """
+    # BM25 needs the statistics of the whole corpus for consistent scores
+    stats = global_corpus_stats(words) if scorer == 'bm25' else None
+    timer.mark('shard_stats')
+    
+    results = shard_set.scatter(search_shard, [
+        (shard, words, phrases, scorer, mode, k, stats, categories, facets) for shard in range(shard_set.count)
+    ])
+    rows = merge_top_k([shard_rows for shard_rows, _, _ in results], k, _rank_key(scorer))
+    if mode == 'topk' and not phrases and not categories:
+        # Top-k totals are a lower bound from the global document frequencies
+        total = common_word_matches(stats['doc_freqs'], None, None)
+    else:
+        # Shards count the same word, so filtered lower bounds add up as
+        # exact totals do
+        total = sum(shard_total for _, shard_total, _ in results)
+    counts = None
+    if facets:
+        counts = Counter()
+        for _, _, shard_counts in results:
+            counts.update(shard_counts)
+    return _ranked_rows(rows), total, counts
+
+
+def _read_shards(conn, function, doc_ids, *args):
+    """Merge function(conn, ids, *args) dicts over the shards holding doc_ids"""
+    if shard_set is None:
+        return function(conn, doc_ids, *args)
+    
+    merged = {}
+    for shard, shard_ids in enumerate(shard_set.group(doc_ids)):
+        if shard_ids:
+            shard_conn = shard_set.connect(shard)
+            merged.update(function(shard_conn, shard_ids, *args))
+            shard_conn.close()
+    return merged
+
+
+def fetch_documents(conn, doc_ids):
+    """Read {doc_id: document} for a page of results in one query"""
+    documents = {}
+    if index_engine is not None:
+        for doc_id in doc_ids:
+            doc = index_engine.document(doc_id)
+            if doc is not None:
+                documents[doc_id] = doc
+    
+    missing = [doc_id for doc_id in doc_ids if doc_id not in documents]
+    if missing:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, title, content, url, category
+            FROM documents WHERE id IN ({','.join('?' * len(missing))})
+        ''', missing)
+        for row in cursor.fetchall():
+            documents[row['id']] = row
+    return documents
+
+
+def search_database(query, page=1, limit=10, scorer='frequency', mode='exhaustive', proximity=False, ids_only=False,
+                    profile=False, after=None, fuzzy=False, categories=(), facets=False):
+    """Search the database using the inverted index
+    
+    With profile set the response includes the time spent in each stage.
+    With fuzzy set, query words that are not indexed are replaced by the
+    closest indexed terms. With categories only documents in one of them
+    match; with facets the response counts the matches of each category.
+    after is the decoded cursor of the previous page; it replaces page and
+    the page is read from that search's snapshot when it is still held.
+    """
+    start_time = time.time()
+    attach_index()
+    timer = StageTimer() if METRICS_ENABLED or profile else NULL_TIMER
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    timer.mark('connect')
     
     # Tokenize query
-    query_words = tokenize(query)
+    query_words, phrases = parse_query(query)
+    # The words as typed, before fuzzy expansion
+    query_tokens = tuple(query_words)
+    timer.mark('tokenize')
+    
+    expansions = None
+    if fuzzy and query_words:
+        query_words, expansions = expand_fuzzy(conn, query_words)
+        timer.mark('fuzzy')
     
     if not query_words:
+        conn.close()
         return {'results': [], 'total': 0, 'search_time': 0}
     
+    # Queries differing only in case or punctuation share a cache entry; fuzzy
+    # ones are keyed by the words as typed, since their expansions differ
+    cache_key = (
+        query_tokens, tuple(map(tuple, phrases)), page, limit, scorer, mode, proximity, ids_only, fuzzy,
+        tuple(categories), facets
+    )
+    # Snapshot pages cost no more than a cache hit, so they are not cached
+    if result_cache.enabled and after is None:
+        generation = get_index_generation(cursor)
+        cached = result_cache.get(cache_key, generation)
+        timer.mark('cache')
+        if cached is not None:
+            conn.close()
+            return _finish_search(dict(cached, search_time=time.time() - start_time, cached=True), timer, profile)
+    
     # Search using inverted index
-    placeholders = ','.join('?' * len(query_words))
+    rank_start = time.time()
+    unique_words = list(dict.fromkeys(query_words))
+    # Whether the ranking saw every document of the cache generation
+    current = True
     
-    # Get document IDs and calculate relevance score
-    cursor.execute(f'''
-        SELECT document_id, 
-               SUM(frequency) as total_freq,
-               COUNT(DISTINCT word) as matched_words
-        FROM inverted_index 
-        WHERE word IN ({placeholders})
-        GROUP BY document_id
-        ORDER BY matched_words DESC, total_freq DESC
-    ''', query_words)
-    
-    doc_scores = cursor.fetchall()
-    total_results = len(doc_scores)
+    snapshot = snapshots.get(after.snapshot) if after is not None else None
+    if snapshot is not None and snapshot.covers(after.position + limit):
+        snapshot_id = after.snapshot
+        offset = snapshot.resume(after)
+        facet_counts = snapshot.facets
+        timer.mark('snapshot')
+    else:
+        offset = (page - 1) * limit if after is None else after.position
+        # Rankings cut off at k deepen geometrically as a cursor pages past them
+        k = offset + limit if after is None else max(offset + limit, 2 * offset)
+        
+        current = refresh_index_engine(conn)
+        timer.mark('refresh')
+        
+        boost = proximity and len(unique_words) > 1
+        if boost:
+            # The boost re-ranks the same top results whichever page is asked
+            # for, so every page is cut from one ranking
+            k = max(PROXIMITY_CANDIDATES, k)
+        if shard_set is not None:
+            # Every shard matches phrases and ranks its own documents
+            doc_scores, total_results, facet_counts = rank_shards(
+                unique_words, phrases, scorer, mode, k, timer, categories, facets
+            )
+            timer.mark('rank')
+        else:
+            # Phrases and categories narrow the candidates before anything is scored
+            allowed = None
+            if phrases or categories:
+                allowed = candidate_filter(conn, phrases, categories)
+                timer.mark('filter')
+            
+            # Get document IDs and calculate relevance score
+            doc_scores, total_results = rank_documents(conn, unique_words, scorer, mode, k, allowed)
+            if phrases:
+                # Phrase words are query words, so every candidate matches
+                total_results = len(allowed)
+            timer.mark('rank')
+            
+            facet_counts = None
+            if facets:
+                facet_counts = count_facets(conn, doc_scores)
+                timer.mark('facets')
+        
+        if mode == 'topk':
+            total_results = top_k_total(doc_scores, k, total_results)
+        
+        if boost:
+            doc_scores = apply_proximity_boost(conn, doc_scores, unique_words, PROXIMITY_CANDIDATES)
+            timer.mark('proximity')
+        
+        # A ranking shorter than k, or as long as the matches, has them all
+        snapshot = Snapshot(
+            doc_scores, total_results, len(doc_scores) < k or len(doc_scores) >= total_results, facet_counts
+        )
+        if after is not None:
+            offset = snapshot.resume(after)
+        snapshot_id = None
     
     # Paginate
-    offset = (page - 1) * limit
-    paginated_docs = doc_scores[offset:offset + limit]
+    paginated_docs = snapshot.rows(offset, offset + limit)
+    total_results = snapshot.total
+    next_cursor = None
+    if paginated_docs and (offset + limit < len(snapshot) or not snapshot.complete):
+        if snapshot_id is None:
+            snapshot_id = snapshots.put(snapshot)
+        last = paginated_docs[-1]
+        next_cursor = encode_cursor(
+            (snapshot_id or '', offset + len(paginated_docs), last['score'], last['document_id']),
+            search_fingerprint(query_tokens, phrases, scorer, mode, proximity, fuzzy, categories)
+        )
+    rank_time = time.time() - rank_start
+    timer.mark('paginate')
     
-    results = []
-    for doc_score in paginated_docs:
-        doc_id = doc_score['document_id']
+    page_ids = [doc_score['document_id'] for doc_score in paginated_docs]
+    if ids_only:
+        results = [{'id': doc_score['document_id'], 'score': doc_score['score']} for doc_score in paginated_docs]
+    else:
+        # One query for the documents and one for the positions of the page
+        documents = _read_shards(conn, fetch_documents, page_ids)
+        positions = _read_shards(conn, fetch_positions, page_ids, unique_words)
+        # Folded or stemmed terms differ from the text, so snippets fall back
+        # to re-analyzing it
+        pattern = word_pattern(unique_words) if analyzer.exact else None
+        timer.mark('hydrate')
         
-        cursor.execute('''
-            SELECT id, title, content, url, category
-            FROM documents WHERE id = ?
-        ''', (doc_id,))
-        
-        doc = cursor.fetchone()
-        if doc:
-            # Create snippet
-            content = doc['content']
-            snippet = create_snippet(content, query_words)
-            
-            results.append({
-                'id': doc['id'],
-                'title': doc['title'],
-                'snippet': snippet,
-                'url': doc['url'],
-                'category': doc['category'],
-                'score': doc_score['matched_words'] * 10 + doc_score['total_freq']
-            })
+        results = []
+        for doc_score in paginated_docs:
+            doc_id = doc_score['document_id']
+            doc = documents.get(doc_id)
+            if doc:
+                snippet = create_snippet(doc['title'], doc['content'], positions.get(doc_id, {}), pattern)
+                
+                results.append({
+                    'id': doc['id'],
+                    'title': doc['title'],
+                    'snippet': snippet['text'],
+                    'highlights': snippet['highlights'],
+                    'title_highlights': snippet['title_highlights'],
+                    'url': doc['url'],
+                    'category': doc['category'],
+                    'score': doc_score['score']
+                })
+        timer.mark('snippets')
     
     conn.close()
     
     search_time = time.time() - start_time
     
-    return {
+    response = {
         'results': results,
         'total': total_results,
         'search_time': search_time,
-        'page': page,
-        'limit': limit
+        'rank_time': rank_time,
+        'scorer': scorer,
+        'mode': mode,
+        'phrases': [' '.join(phrase) for phrase in phrases],
+        'page': page if after is None else offset // limit + 1,
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'cached': False
     }
+    if fuzzy:
+        response['expansions'] = expansions
+    if categories:
+        response['categories'] = list(categories)
+    if facets:
+        # Most matches first
+        response['facets'] = [
+            {'category': category, 'count': count}
+            for category, count in sorted(facet_counts.items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+    # A ranking from an engine that missed its refresh would outlive the
+    # documents it lacks under the newer generation
+    if result_cache.enabled and after is None and current:
+        result_cache.put(cache_key, generation, response)
+    return _finish_search(response, timer, profile)
+
+
+def _finish_search(response, timer, profile):
+    """Record stage timings, adding the breakdown to a profiled response"""
+    startup_times.first_query()
+    if METRICS_ENABLED:
+        timer.observe(SEARCH_STAGES)
+    if profile:
+        response = dict(response, profile={'stages_ms': timer.breakdown()})
+    return response
+
+
+def word_pattern(words):
+    """Regex matching whole occurrences of any of the words"""
+    return re.compile(r'\b(?:' + '|'.join(map(re.escape, words)) + r')\b', re.IGNORECASE)
+
 
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
 
-def create_snippet(content, query_words, max_length=200):
-    """Create a snippet highlighting query terms"""
-    content_lower = content.lower()
+
+def find_word(text, word, n):
+    """Offset of the n-th whole-word occurrence of word in text, or -1
     
-    # Find the first occurrence of any query word
-    best_pos = len(content)
-    for word in query_words:
-        pos = content_lower.find(word)
-        if pos != -1 and pos < best_pos:
-            best_pos = pos
+    A whole-word occurrence is exactly a token equal to word, so the n-th
+    one is the word's n-th stored position. str.find on lowercased text is
+    much faster than a case-insensitive regex, and only a growing prefix of
+    the text is lowercased since the occurrence is usually near the start.
+    """
+    size = 4096
+    start = 0
+    while True:
+        limit = min(len(text), size)
+        lowered = text[:limit].lower()
+        if len(lowered) != limit:
+            # Lowercasing changed some offsets; fall back to the regex
+            match = next(islice(word_pattern([word]).finditer(text), n, None), None)
+            return match.start() if match else -1
+        complete = limit == len(text)
+        
+        found = lowered.find(word, start)
+        while found != -1:
+            end = found + len(word)
+            if end == limit and not complete:
+                # The character after the match is not lowercased yet
+                break
+            if (found == 0 or not _is_word_char(lowered[found - 1])) and (end == limit or not _is_word_char(lowered[end])):
+                if n == 0:
+                    return found
+                n -= 1
+            found = lowered.find(word, found + 1)
+        
+        if complete:
+            return -1
+        start = found if found != -1 else max(start, limit - len(word) + 1)
+        size *= 4
+
+
+def create_snippet(title, content, positions, pattern, max_length=200):
+    """Create a snippet around the densest cluster of query words
     
-    # Create snippet around the found position
-    start = max(0, best_pos - 50)
-    end = min(len(content), start + max_length)
+    positions holds the stored positions of the query words, counted over
+    the title followed by the content, and pattern is the word_pattern of
+    the query, or None to locate the words by analyzing the text. Highlights
+    are [start, end) offsets of whole query words in the snippet text and in
+    the title.
+    """
+    title_tokens = len(tokenize(title))
     
-    snippet = content[start:end]
+    # The first content positions of the query words
+    hits = []
+    for word_positions in positions.values():
+        hits.extend(word_positions[bisect_left(word_positions, title_tokens):])
+    hits.sort()
+    del hits[SNIPPET_MAX_HITS:]
     
-    # Add ellipsis if needed
-    if start > 0:
-        snippet = '...' + snippet
-    if end < len(content):
-        snippet = snippet + '...'
+    # Start from the window of SNIPPET_WINDOW tokens holding the most hits
+    anchor = 0
+    if hits:
+        best = 0
+        left = 0
+        for right, position in enumerate(hits):
+            while position - hits[left] >= SNIPPET_WINDOW:
+                left += 1
+            if right - left + 1 > best:
+                best = right - left + 1
+                anchor_position = hits[left]
+        
+        # The anchor is the n-th content occurrence of its word
+        for word, word_positions in positions.items():
+            i = bisect_left(word_positions, anchor_position)
+            if i < len(word_positions) and word_positions[i] == anchor_position:
+                n = i - bisect_left(word_positions, title_tokens)
+                found = find_word(content, word, n) if pattern else analyzer.find_token(content, word, n)
+                anchor = max(0, found)
+                break
+    
+    # Create snippet around the anchor, without cutting words in half
+    start = max(0, anchor - 50)
+    while 0 < start < anchor and content[start - 1].isalnum():
+        start += 1
+    end = min(len(content), start + max_length)
+    while anchor < end < len(content) and content[end].isalnum() and content[end - 1].isalnum():
+        end -= 1
+    
+    prefix = '...' if start > 0 else ''
+    # Highlight offsets relative to content[start:end] and to the title
+    if pattern:
+        highlights = [(match.start() - start, match.end() - start) for match in pattern.finditer(content, start, end)]
+        title_highlights = [[match.start(), match.end()] for match in pattern.finditer(title)]
+    else:
+        words = set(positions)
+        highlights = [(word_start, word_end) for word, word_start, word_end in token_spans(content[start:end]) if word in words]
+        title_highlights = [[word_start, word_end] for word, word_start, word_end in token_spans(title) if word in words]
     
-    return snippet
+    return {
+        'text': prefix + content[start:end] + ('...' if end < len(content) else ''),
+        'highlights': [[word_start + len(prefix), word_end + len(prefix)] for word_start, word_end in highlights],
+        'title_highlights': title_highlights
+    }
 
 
 # Search function wrapper
-def perform_search(query, page=1, limit=10):
+def perform_search(query, page=1, limit=10, **options):
     """Perform search using the Python implementation"""
-    return search_database(query, page, limit)
+    return search_database(query, page, limit, **options)
+
+
+class RequestError(ValueError):
+    """Invalid request, answered with 400 by every server"""
+
+
+def parse_search_request(data, debug=None):
+    """Validate a /api/search body into perform_search arguments
+    
+    debug is the ?debug= query parameter, used when the body has none.
+    """
+    if not data or 'query' not in data:
+        raise RequestError('Query is required')
+    
+    query = data.get('query', '').strip()
+    scorer = data.get('scorer', 'frequency')
+    mode = data.get('mode', 'exhaustive')
+    debug = data.get('debug', debug)
+    
+    if not query:
+        raise RequestError('Query cannot be empty')
+    
+    if scorer not in SCORERS:
+        raise RequestError(f"Scorer must be one of: {', '.join(SCORERS)}")
+    
+    if mode not in MODES:
+        raise RequestError(f"Mode must be one of: {', '.join(MODES)}")
+    
+    if mode == 'topk' and scorer != 'bm25':
+        raise RequestError('Top-k mode requires the bm25 scorer')
+    
+    if debug not in (None, 'profile'):
+        raise RequestError('debug must be profile')
+    
+    categories = data.get('category') or []
+    if isinstance(categories, str):
+        categories = [categories]
+    if not isinstance(categories, list) or not all(isinstance(category, str) for category in categories):
+        raise RequestError('category must be a string or a list of strings')
+    categories = tuple(dict.fromkeys(categories))
+    
+    facets = bool(data.get('facets', False))
+    if facets and mode == 'topk':
+        raise RequestError('Facet counts require the exhaustive mode')
+    
+    after = None
+    if data.get('cursor'):
+        try:
+            fingerprint = search_fingerprint(
+                *parse_query(query), scorer, mode, data.get('proximity', False), data.get('fuzzy', False), categories
+            )
+            after = decode_cursor(str(data['cursor']), fingerprint)
+        except CursorError as e:
+            raise RequestError(str(e))
+    
+    return {
+        'query': query,
+        'page': data.get('page', 1),
+        'limit': data.get('limit', 10),
+        'scorer': scorer,
+        'mode': mode,
+        'proximity': bool(data.get('proximity', False)),
+        'ids_only': bool(data.get('ids_only', False)),
+        'profile': debug == 'profile',
+        'cprofile': debug == 'profile' and bool(data.get('cprofile')),
+        'fuzzy': bool(data.get('fuzzy', False)),
+        'categories': categories,
+        'facets': facets,
+        'after': after
+    }
+
+
+def execute_search(params):
+    """Run a search parsed by parse_search_request"""
+    options = dict(params)
+    if options.pop('cprofile'):
+        # cProfile dump of this one request
+        results, dump = profile_call(perform_search, lines=PROFILE_LINES, **options)
+        results['profile']['cprofile'] = dump
+        return results
+    
+    # Perform search using Python implementation
+    return perform_search(**options)
+
+
+def parse_suggest_request(args):
+    """Validate /api/suggest query parameters into suggest_terms arguments"""
+    query = (args.get('q') or '').strip()
+    if not query:
+        raise RequestError('q is required')
+    
+    try:
+        limit = int(args.get('limit', 10))
+    except ValueError:
+        raise RequestError('limit must be an integer')
+    if not 1 <= limit <= SUGGEST_MAX_LIMIT:
+        raise RequestError(f'limit must be between 1 and {SUGGEST_MAX_LIMIT}')
+    
+    return {
+        'query': query,
+        'limit': limit,
+        'fuzzy': str(args.get('fuzzy', '0')).lower() not in ('0', 'false', 'no')
+    }
+
+
+def suggest_terms(query, limit=10, fuzzy=False):
+    """Complete the last word of query with indexed terms, most frequent first
+    
+    With fuzzy set, terms within a few edits of the word fill the remaining
+    places, for words that are mistyped rather than unfinished.
+    """
+    start_time = time.time()
+    words = list(analyzer.pattern.finditer(query))
+    # A query ending in a space or punctuation has no word to complete
+    if not words or words[-1].end() != len(query):
+        return {'suggestions': [], 'suggest_time': time.time() - start_time}
+    last = words[-1]
+    head = query[:last.start()]
+    prefix = analyzer.prefix(last.group())
+    
+    attach_index()
+    conn = get_db_connection()
+    terms = current_terms(conn)
+    conn.close()
+    
+    matches = terms.complete(prefix, limit)
+    if fuzzy and len(matches) < limit:
+        seen = {term for term, _ in matches}
+        for term, doc_freq, _ in terms.fuzzy(prefix, SUGGEST_FUZZY_EDITS, limit, SUGGEST_FUZZY_PREFIX_LENGTH):
+            if term not in seen and len(matches) < limit:
+                matches.append((term, doc_freq))
+    
+    return {
+        'suggestions': [{'text': head + term, 'term': term, 'doc_freq': doc_freq} for term, doc_freq in matches],
+        'suggest_time': time.time() - start_time
+    }
+
+
+def index_document(data):
+    """Index one /api/index document, returning its id"""
+    if not data or 'title' not in data or 'content' not in data:
+        raise RequestError('Title and content are required')
+    
+    attach_index()
+    timer = StageTimer() if METRICS_ENABLED else NULL_TIMER
+    conn = get_db_connection()
+    timer.mark('connect')
+    
+    try:
+        doc_id = store_document(conn, data, timer)
+        refresh_index_engine(conn, merge=True)
+        refresh_categories(conn)
+        timer.mark('refresh')
+        timer.observe(INDEX_STAGES)
+        return doc_id
+    
+    finally:
+        conn.close()
+
+
+def write_document(cursor, doc, doc_id=None, timer=NULL_TIMER):
+    """Insert a document and its postings without committing, returning its id"""
+    cursor.execute('''
+        INSERT INTO documents (id, title, content, url, category)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (
+        doc_id,
+        doc['title'],
+        doc['content'],
+        doc.get('url', ''),
+        doc.get('category', 'General')
+    ))
+    
+    doc_id = cursor.lastrowid
+    
+    # Build inverted index
+    word_freq = build_word_index(doc['title'] + ' ' + doc['content'])
+    timer.mark('tokenize')
+    for word, freq_data in word_freq.items():
+        cursor.execute('''
+            INSERT OR REPLACE INTO inverted_index (word, document_id, frequency, positions)
+            VALUES (?, ?, ?, ?)
+        ''', (word, doc_id, freq_data['count'], encode_positions(freq_data['positions'])))
+    timer.mark('write')
+    
+    record_document_stats(cursor, [(doc_id, word_freq)])
+    timer.mark('stats')
+    return doc_id
+
+
+def store_document(conn, doc, timer=NULL_TIMER):
+    """Index and commit one document, in its shard when the index is sharded
+    
+    conn is a connection to the database, which is the catalog of a sharded
+    index: it hands out the id that picks the shard, and its generation is
+    bumped once the shard has committed.
+    """
+    if shard_set is None:
+        try:
+            doc_id = write_document(conn.cursor(), doc, timer=timer)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        timer.mark('commit')
+        return doc_id
+    
+    doc_id = allocate_doc_ids(conn, 1)
+    shard_conn = shard_set.connect(shard_set.shard_of(doc_id))
+    try:
+        write_document(shard_conn.cursor(), doc, doc_id, timer)
+        shard_conn.commit()
+    except Exception:
+        shard_conn.rollback()
+        raise
+    finally:
+        shard_conn.close()
+    bump_index_generation(conn.cursor())
+    conn.commit()
+    timer.mark('commit')
+    return doc_id
+
+
+def index_stats():
+    """Index statistics for /api/stats"""
+    attach_index()
+    if shard_set is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) FROM documents')
+        doc_count = cursor.fetchone()[0]
+        
+        cursor.execute('SELECT COUNT(DISTINCT word) FROM inverted_index')
+        word_count = cursor.fetchone()[0]
+        
+        categories = categories_of(conn).stats()
+        conn.close()
+    else:
+        # Words are counted once however many shards hold them
+        doc_count = 0
+        vocabularies = []
+        conns = [shard_set.connect(shard) for shard in range(shard_set.count)]
+        for conn in conns:
+            doc_count += conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            vocabularies.append(row[0] for row in conn.execute('SELECT word FROM term_stats ORDER BY word'))
+        word_count = sum(1 for _ in groupby(heapq.merge(*vocabularies)))
+        for conn in conns:
+            conn.close()
+        categories = shard_set.scatter(shard_category_stats, [(shard,) for shard in range(shard_set.count)])
+    
+    stats = {
+        'documents': doc_count,
+        'unique_words': word_count,
+        'engine': index_engine.stats() if index_engine is not None else {'type': 'sqlite'},
+        'cache': result_cache.stats(),
+        'snapshots': snapshots.stats(),
+        'terms': term_dictionary.stats(),
+        'categories': categories,
+        'startup': startup_times.stats(),
+        'pool': db_pool.stats()
+    }
+    if shard_set is not None:
+        stats['shards'] = shard_set.stats()
+    return stats
 
 
 # Routes
@@ -359,102 +1895,132 @@ def serve_style():
 @app.route('/api/search', methods=['POST'])
 def search():
     """Handle search requests"""
-    data = request.get_json()
-    
-    if not data or 'query' not in data:
-        return jsonify({'error': 'Query is required'}), 400
-    
-    query = data.get('query', '').strip()
-    page = data.get('page', 1)
-    limit = data.get('limit', 10)
-    
-    if not query:
-        return jsonify({'error': 'Query cannot be empty'}), 400
+    try:
+        params = parse_search_request(request.get_json(), request.args.get('debug'))
+    except RequestError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Perform search using Python implementation
-    results = perform_search(query, page, limit)
+    return jsonify(execute_search(params))
+
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    """Complete the word being typed"""
+    try:
+        params = parse_suggest_request(request.args)
+    except RequestError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify(results)
+    return jsonify(suggest_terms(**params))
 
 
 @app.route('/api/index', methods=['POST'])
 def add_document():
     """Add a new document to the index"""
-    data = request.get_json()
+    try:
+        doc_id = index_document(request.get_json())
+    except RequestError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
-    if not data or 'title' not in data or 'content' not in data:
-        return jsonify({'error': 'Title and content are required'}), 400
+    return jsonify({
+        'message': 'Document added successfully',
+        'id': doc_id
+    })
+
+
+@app.route('/api/index/bulk', methods=['POST'])
+def add_documents_bulk():
+    """Add documents in bulk from an NDJSON request body
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    Documents are tokenized in the request's own worker unless the request
+    asks for a tokenizer pool, which is started and stopped with it; large
+    loads belong to bulk_load.py, which uses every core by default.
+    """
+    batch_size = request.args.get('batch_size', BULK_BATCH_SIZE, type=int)
+    workers = request.args.get('workers', 1, type=int)
+    rebuild_indexes = request.args.get('rebuild_indexes', '').lower() in ('1', 'true', 'yes')
     
-    try:
-        cursor.execute('''
-            INSERT INTO documents (title, content, url, category)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            data['title'],
-            data['content'],
-            data.get('url', ''),
-            data.get('category', 'General')
-        ))
-        
-        doc_id = cursor.lastrowid
-        
-        # Build inverted index
-        words = tokenize(data['title'] + ' ' + data['content'])
-        word_freq = {}
-        for pos, word in enumerate(words):
-            if word not in word_freq:
-                word_freq[word] = {'count': 0, 'positions': []}
-            word_freq[word]['count'] += 1
-            word_freq[word]['positions'].append(pos)
-        
-        for word, freq_data in word_freq.items():
-            cursor.execute('''
-                INSERT OR REPLACE INTO inverted_index (word, document_id, frequency, positions)
-                VALUES (?, ?, ?, ?)
-            ''', (word, doc_id, freq_data['count'], json.dumps(freq_data['positions'])))
-        
-        conn.commit()
-        
-        return jsonify({
-            'message': 'Document added successfully',
-            'id': doc_id
-        })
+    if batch_size < 1:
+        return jsonify({'error': 'batch_size must be positive'}), 400
+    if workers < 1:
+        return jsonify({'error': 'workers must be positive'}), 400
     
+    try:
+        report = bulk_index_documents(request.stream, batch_size, workers, rebuild_indexes)
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
     
-    finally:
-        conn.close()
+    return jsonify(report)
 
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get index statistics"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM documents')
-    doc_count = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(DISTINCT word) FROM inverted_index')
-    word_count = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    return jsonify({
-        'documents': doc_count,
-        'unique_words': word_count
-    })
+    return jsonify(index_stats())
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request counters and latency histograms in Prometheus text format"""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
 
+@app.after_request
+def record_request_metrics(response):
+    if METRICS_ENABLED and 'request_start' in g:
+        # Label by route pattern rather than raw path to bound the series
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_COUNT.inc(endpoint, request.method, str(response.status_code))
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint)
+    return response
+
+
+# Each worker keeps its own connections, result cache and metrics
+analyzer = Analyzer(fold=ANALYZER_FOLD, stem=ANALYZER_STEM)
+db_pool = ConnectionPool(DATABASE_PATH, DB_POOL_SIZE, SQLITE_PRAGMAS)
+shard_set = ShardSet(shard_paths(DATABASE_PATH, SHARD_COUNT), SHARD_WORKERS, DB_POOL_SIZE, SQLITE_PRAGMAS) if SHARD_COUNT > 1 else None
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_BYTES, RESULT_CACHE_TTL)
+snapshots = SnapshotStore(CURSOR_SNAPSHOTS, CURSOR_SNAPSHOT_BYTES, CURSOR_TTL)
+term_dictionary = LiveTermDictionary(load_term_dictionary, TERM_DICTIONARY_REFRESH)
+# Category bitsets by shard (None for an unsharded database), read on first use
+category_indexes = {}
+startup_times = StartupTimes(STARTED_AT)
+
+metrics = Registry()
+REQUEST_COUNT = metrics.counter('search_http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('search_http_request_duration_seconds', 'HTTP request latency', ('endpoint',))
+SEARCH_STAGES = metrics.histogram('search_stage_duration_seconds', 'Time spent in each stage of a search', ('stage',))
+INDEX_STAGES = metrics.histogram('search_index_stage_duration_seconds', 'Time spent in each stage of indexing', ('stage',))
+
 # Initialize database on module load (for Render/Gunicorn)
-print("Initializing database...")
-init_database()
-print("Database initialized.")
+if INIT_ON_STARTUP:
+    print("Initializing database...")
+    init_start = time.time()
+    init_database()
+    startup_times.mark('init', init_start)
+    print("Database initialized.")
+
+# Each process loads the postings (or maps the segment) when it attaches;
+# a sharded index is searched in its SQLite shards instead
+engine_lock = threading.Lock()
+attach_lock = threading.Lock()
+index_engine = None
+index_attached = False
+if not LAZY_ATTACH:
+    attach_index()
+
+# Close the connections opened while initializing, so that a gunicorn
+# --preload master forks its workers without open SQLite handles
+db_pool.close_all()
+if shard_set is not None:
+    shard_set.close()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
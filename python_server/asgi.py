@@ -0,0 +1,227 @@
+"""
+ASGI server for the search engine
+Serves /api/search, /api/suggest, /api/index and /api/stats with the
+same request and response contract as the Flask app, under an asyncio
+server such as uvicorn. The event loop only parses and answers requests: searches and
+stats run in a bounded thread pool and writes in a single writer thread,
+identical searches in flight share one execution, and requests beyond
+the queue limits are turned away with 503 instead of piling up.
+
+Usage:
+    uvicorn python_server.asgi:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as search_app
+from app import (
+    RequestError, parse_search_request, execute_search, parse_suggest_request, suggest_terms, index_document,
+    index_stats
+)
+
+# Threads running searches and stats; more than the connection pool keeps
+# idle would open and close a connection per request
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', search_app.DB_POOL_SIZE or 8))
+# Requests allowed to wait for a thread, per pool, before answering 503
+ASGI_MAX_QUEUE = int(os.environ.get('ASGI_MAX_QUEUE', 64))
+ASGI_MAX_WRITE_QUEUE = int(os.environ.get('ASGI_MAX_WRITE_QUEUE', 256))
+RETRY_AFTER_SECONDS = 1
+
+JSON = b'application/json'
+
+
+class Overloaded(Exception):
+    """A pool's queue is full"""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work once its queue is full
+    
+    depth counts calls running or waiting for a thread. The threads are
+    started on first use, so each server worker process gets its own.
+    """
+    
+    def __init__(self, threads, max_queue):
+        self.threads = threads
+        self.max_queue = max_queue
+        self.executor = None
+        self.depth = 0
+        self.rejected = 0
+    
+    async def run(self, function, *args):
+        if self.depth >= self.threads + self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.threads)
+        self.depth += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.depth -= 1
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+    
+    def stats(self):
+        return {
+            'threads': self.threads,
+            'depth': self.depth,
+            'max_queue': self.max_queue,
+            'rejected': self.rejected
+        }
+
+
+def encode(value):
+    return json.dumps(value).encode()
+
+
+class SearchServer:
+    """ASGI application over the search engine's request functions"""
+    
+    def __init__(self, threads=ASGI_THREADS, max_queue=ASGI_MAX_QUEUE, max_write_queue=ASGI_MAX_WRITE_QUEUE):
+        self.readers = BoundedExecutor(threads, max_queue)
+        # SQLite takes one writer at a time, so writes queue here rather
+        # than contend for the database lock
+        self.writer = BoundedExecutor(1, max_write_queue)
+        # Search key -> task producing the encoded response, shared by identical searches
+        self.in_flight = {}
+        self.coalesced = 0
+        self.routes = {
+            ('POST', '/api/search'): self.search,
+            ('GET', '/api/suggest'): self.suggest,
+            ('POST', '/api/index'): self.index,
+            ('GET', '/api/stats'): self.stats,
+            ('GET', '/api/metrics'): self.metrics
+        }
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        
+        start_time = time.perf_counter()
+        method = scope['method']
+        path = scope['path']
+        handler = self.routes.get((method, path))
+        headers = []
+        if handler is not None:
+            try:
+                status, body, content_type = await handler(scope, receive)
+            except RequestError as e:
+                status, body, content_type = 400, encode({'error': str(e)}), JSON
+            except Overloaded:
+                status, body, content_type = 503, encode({'error': 'Server busy, retry later'}), JSON
+                headers.append((b'retry-after', str(RETRY_AFTER_SECONDS).encode()))
+            except Exception as e:
+                status, body, content_type = 500, encode({'error': str(e)}), JSON
+        elif method == 'OPTIONS':
+            # CORS preflight, as flask_cors answers it
+            status, body, content_type = 204, b'', JSON
+            headers.append((b'access-control-allow-methods', b'GET, POST, OPTIONS'))
+            headers.append((b'access-control-allow-headers', b'content-type'))
+        elif any(route_path == path for _, route_path in self.routes):
+            status, body, content_type = 405, encode({'error': 'Method not allowed'}), JSON
+        else:
+            status, body, content_type = 404, encode({'error': 'Not found'}), JSON
+        
+        headers += [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        
+        if search_app.METRICS_ENABLED:
+            # Label by route rather than raw path to bound the series
+            endpoint = path if handler is not None else 'unmatched'
+            search_app.REQUEST_COUNT.inc(endpoint, method, str(status))
+            search_app.REQUEST_SECONDS.observe(time.perf_counter() - start_time, endpoint)
+    
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.readers.shutdown()
+                self.writer.shutdown()
+                search_app.db_pool.close_all()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def read_json(self, receive):
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        try:
+            return json.loads(b''.join(chunks) or b'null')
+        except ValueError:
+            raise RequestError('Request body must be JSON')
+    
+    async def search(self, scope, receive):
+        """POST /api/search, sharing the execution of identical searches in flight"""
+        debug = parse_qs(scope['query_string'].decode()).get('debug', [None])[0]
+        params = parse_search_request(await self.read_json(receive), debug)
+        
+        # Profiled searches time their own execution, so they never share one
+        key = None if params['profile'] else tuple(sorted(params.items()))
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self.readers.run(lambda: encode(execute_search(params))))
+            if key is not None:
+                self.in_flight[key] = task
+                task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # A client that disconnects must not cancel the search for the others
+        return 200, await asyncio.shield(task), JSON
+    
+    async def suggest(self, scope, receive):
+        """GET /api/suggest"""
+        args = {name: values[0] for name, values in parse_qs(scope['query_string'].decode()).items()}
+        params = parse_suggest_request(args)
+        return 200, encode(await self.readers.run(lambda: suggest_terms(**params))), JSON
+    
+    async def index(self, scope, receive):
+        """POST /api/index"""
+        data = await self.read_json(receive)
+        doc_id = await self.writer.run(index_document, data)
+        return 200, encode({
+            'message': 'Document added successfully',
+            'id': doc_id
+        }), JSON
+    
+    async def stats(self, scope, receive):
+        """GET /api/stats, with the server's queue figures"""
+        stats = await self.readers.run(index_stats)
+        stats['server'] = {
+            'readers': self.readers.stats(),
+            'writer': self.writer.stats(),
+            'in_flight': len(self.in_flight),
+            'coalesced': self.coalesced
+        }
+        return 200, encode(stats), JSON
+    
+    async def metrics(self, scope, receive):
+        """GET /api/metrics in the Prometheus text format"""
+        return 200, search_app.metrics.render().encode(), b'text/plain; version=0.0.4'
+
+
+app = SearchServer()
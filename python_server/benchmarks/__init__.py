@@ -0,0 +1,6 @@
+"""
+Benchmarks for the search engine
+corpus generates deterministic Zipfian corpora, queries generates query logs
+over the same vocabulary, and runner indexes a corpus, replays a query log
+and reports the results as JSON.
+"""
@@ -0,0 +1,146 @@
+"""
+Synthetic corpus generator
+Writes NDJSON documents whose words follow a Zipfian distribution over a
+synthetic vocabulary. Output depends only on the parameters and the seed,
+so the same corpus can be rebuilt on any machine.
+
+Words are drawn once into a pool and every document is a random slice of
+it, which keeps generation fast enough for 10M-document corpora while the
+corpus as a whole stays Zipfian.
+
+Usage:
+    python python_server/benchmarks/corpus.py --docs 100000 -o corpus.ndjson
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from itertools import accumulate
+
+# Consonant-vowel syllables; every word has at least three, which keeps the
+# vocabulary clear of stop words and single letters
+CONSONANTS = 'bcdfghjklmnprstvwxyz'
+VOWELS = 'aeiou'
+SYLLABLES = [c + v for c in CONSONANTS for v in VOWELS]
+
+CATEGORIES = [
+    'Programming', 'Data Science', 'Web Development', 'Databases', 'DevOps',
+    'Security', 'Networking', 'Mobile', 'Cloud', 'Hardware', 'Design', 'General'
+]
+
+MAX_POOL_SIZE = 4000000
+
+
+def make_word(rank):
+    """The vocabulary word for a rank; distinct ranks give distinct words"""
+    syllables = []
+    while rank or len(syllables) < 3:
+        rank, digit = divmod(rank, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+    return ''.join(syllables)
+
+
+def zipf_cum_weights(size, exponent):
+    """Cumulative weights of ranks 1..size under Zipf's law"""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+class ZipfCorpus:
+    """Deterministic generator of synthetic documents"""
+    
+    def __init__(self, docs, vocab_size=100000, exponent=1.0, mean_length=150, seed=1):
+        self.docs = docs
+        self.vocab_size = vocab_size
+        self.exponent = exponent
+        self.mean_length = mean_length
+        self.seed = seed
+        self.vocabulary = [make_word(rank) for rank in range(vocab_size)]
+        self.cum_weights = zipf_cum_weights(vocab_size, exponent)
+        
+        rng = random.Random(seed)
+        pool_size = min(MAX_POOL_SIZE, max(docs * mean_length, mean_length * 20))
+        self.pool = rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=pool_size)
+        self.category_weights = list(accumulate(1 / (rank + 1) for rank in range(len(CATEGORIES))))
+    
+    def params(self):
+        return {
+            'docs': self.docs,
+            'vocab_size': self.vocab_size,
+            'exponent': self.exponent,
+            'mean_length': self.mean_length,
+            'seed': self.seed
+        }
+    
+    def _slice(self, rng, length):
+        start = rng.randrange(len(self.pool) - length)
+        return self.pool[start:start + length]
+    
+    def documents(self):
+        """Yield every document in order"""
+        rng = random.Random(self.seed + 1)
+        # Log-normal lengths with the requested mean
+        sigma = 0.6
+        mu = math.log(self.mean_length) - sigma * sigma / 2
+        max_length = len(self.pool) // 2
+        for i in range(self.docs):
+            length = min(max_length, max(5, int(rng.lognormvariate(mu, sigma))))
+            title = ' '.join(self._slice(rng, rng.randint(3, 8))).title()
+            yield {
+                'title': title,
+                'content': ' '.join(self._slice(rng, length)) + '.',
+                'url': f'https://example.com/doc/{i + 1}',
+                'category': rng.choices(CATEGORIES, cum_weights=self.category_weights)[0]
+            }
+    
+    def phrase(self, rng, length=2):
+        """Words that appear consecutively somewhere in the corpus"""
+        return self._slice(rng, length)
+
+
+def write_ndjson(documents, output):
+    count = 0
+    for doc in documents:
+        output.write(json.dumps(doc) + '\n')
+        count += 1
+    return count
+
+
+def add_corpus_args(parser):
+    """Corpus parameters shared by the generators and the runner"""
+    parser.add_argument('--docs', type=int, default=10000, help='Documents to generate')
+    parser.add_argument('--vocab', type=int, default=100000, help='Vocabulary size')
+    parser.add_argument('--exponent', type=float, default=1.0, help='Zipf exponent of word frequencies')
+    parser.add_argument('--mean-length', type=int, default=150, help='Mean document length in words')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def corpus_from_args(args):
+    return ZipfCorpus(args.docs, args.vocab, args.exponent, args.mean_length, args.seed)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate a synthetic Zipfian corpus as NDJSON')
+    add_corpus_args(parser)
+    parser.add_argument('-o', '--output', default='-', help='Output file, or - for stdout')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    corpus = corpus_from_args(args)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        count = write_ndjson(corpus.documents(), output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if output is not sys.stdout:
+        print(f'Wrote {count} documents to {args.output} ({os.path.getsize(args.output)} bytes)')
+
+
+if __name__ == '__main__':
+    main()
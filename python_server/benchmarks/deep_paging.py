@@ -0,0 +1,88 @@
+"""
+Deep pagination benchmark
+Walks the result pages of the most common words of an index, once by page
+number and once by following next_cursor, and reports the latency of each
+page depth. Page numbers rank every page again; cursors read the pages
+after the first from the search's snapshot.
+
+Usage:
+    python python_server/benchmarks/deep_paging.py [--db PATH] [--queries 20] [--pages 50] [--limit 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Compare page number and cursor pagination latency by depth')
+    parser.add_argument('--db', help='SQLite database path (defaults to data/search_index.db)')
+    parser.add_argument('--queries', type=int, default=20, help='Most common words to page through')
+    parser.add_argument('--pages', type=int, default=50, help='Pages per query')
+    parser.add_argument('--limit', type=int, default=10, help='Results per page')
+    parser.add_argument('--scorer', default='bm25')
+    parser.add_argument('--mode', default='exhaustive')
+    return parser.parse_args()
+
+
+def common_words(app_module, count):
+    conn = app_module.get_db_connection()
+    words = [row[0] for row in conn.execute('SELECT word FROM term_stats ORDER BY doc_freq DESC LIMIT ?', (count,))]
+    conn.close()
+    return words
+
+
+def walk(app_module, query, args, use_cursor):
+    """Latency in milliseconds of each page, and the ids seen"""
+    latencies = []
+    ids = []
+    after = None
+    fingerprint = app_module.search_fingerprint(*app_module.parse_query(query), args.scorer, args.mode, False)
+    for page in range(1, args.pages + 1):
+        start_time = time.perf_counter()
+        results = app_module.perform_search(query, page, args.limit, scorer=args.scorer, mode=args.mode, after=after)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        ids += [result['id'] for result in results['results']]
+        if use_cursor:
+            if not results['next_cursor']:
+                break
+            after = app_module.decode_cursor(results['next_cursor'], fingerprint)
+    return latencies, ids
+
+
+def main():
+    args = parse_args()
+    
+    # The app reads its configuration at import time
+    if args.db:
+        os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    import app as app_module
+    
+    words = common_words(app_module, args.queries)
+    by_depth = {'page': {}, 'cursor': {}}
+    mismatched = 0
+    for word in words:
+        _, page_ids = walk(app_module, word, args, use_cursor=False)
+        for name in ('page', 'cursor'):
+            latencies, ids = walk(app_module, word, args, use_cursor=name == 'cursor')
+            for depth, latency in enumerate(latencies, 1):
+                by_depth[name].setdefault(depth, []).append(latency)
+        mismatched += ids != page_ids
+    
+    print(f'{len(words)} queries ({args.scorer}, {args.mode}), {args.pages} pages of {args.limit}')
+    depths = sorted({1, 2, 10, args.pages} & set(by_depth['page']))
+    for name, latencies in by_depth.items():
+        row = '   '.join(f'page {depth:>3} {sum(latencies[depth]) / len(latencies[depth]):8.2f} ms' for depth in depths)
+        walk_ms = sum(sum(values) for values in latencies.values()) / len(words)
+        print(f'  {name:<7} {row}   walk {walk_ms:9.1f} ms')
+    if mismatched:
+        print(f'  {mismatched} queries paged differently with cursors')
+
+
+if __name__ == '__main__':
+    main()
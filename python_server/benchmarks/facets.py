@@ -0,0 +1,111 @@
+"""
+Category filter and facet benchmark
+Runs words spread over the frequency ranks of an index as plain searches,
+with facet counts, filtered to its most and least common categories, and
+as the client-side alternative: a larger unfiltered page whose results
+are filtered by category afterwards. Reports the mean and p95 latency of
+each variant and how many of its searches filled a page.
+
+Usage:
+    python python_server/benchmarks/facets.py [--db PATH] [--engine sqlite] [--queries 20] [--scorer bm25]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.runner import percentile
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Compare filtered and faceted search latency with plain searches')
+    parser.add_argument('--db', help='SQLite database path (defaults to data/search_index.db)')
+    parser.add_argument('--engine', default='sqlite', help='INDEX_ENGINE to search with')
+    parser.add_argument('--queries', type=int, default=20, help='Words to search for')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every search')
+    parser.add_argument('--limit', type=int, default=10, help='Results per page')
+    parser.add_argument('--overfetch', type=int, default=10, help='Pages fetched by the client-side filter')
+    parser.add_argument('--scorer', default='bm25')
+    parser.add_argument('--mode', default='exhaustive')
+    return parser.parse_args()
+
+
+def spread_words(app_module, count):
+    """count words from the most common one down the frequency ranks"""
+    conn = app_module.get_db_connection()
+    words = [row[0] for row in conn.execute('SELECT word FROM term_stats ORDER BY doc_freq DESC LIMIT ?', (count * count,))]
+    conn.close()
+    return [words[i * i] for i in range(count) if i * i < len(words)]
+
+
+def category_sizes(app_module):
+    """{category: documents} over the whole index"""
+    if app_module.shard_set is None:
+        conns = [app_module.get_db_connection()]
+    else:
+        conns = [app_module.shard_set.connect(shard) for shard in range(app_module.shard_set.count)]
+    sizes = Counter()
+    for conn in conns:
+        sizes.update(dict(conn.execute('SELECT category, COUNT(*) FROM documents GROUP BY category').fetchall()))
+        conn.close()
+    return sizes
+
+
+def overfetch_search(app_module, query, args, category):
+    """A page of category results filtered out of a larger unfiltered page"""
+    results = app_module.perform_search(query, 1, args.limit * args.overfetch, scorer=args.scorer, mode=args.mode)
+    return {'results': [result for result in results['results'] if result['category'] == category][:args.limit]}
+
+
+def main():
+    args = parse_args()
+    
+    # The app reads its configuration at import time
+    if args.db:
+        os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    os.environ['INDEX_ENGINE'] = args.engine
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    import app as app_module
+    
+    words = spread_words(app_module, args.queries)
+    sizes = category_sizes(app_module)
+    common = max(sizes, key=sizes.get)
+    # Leaves out the handful of sample documents' categories
+    rare = min((category for category in sizes if sizes[category] * 100 >= sum(sizes.values())), key=sizes.get)
+    
+    def search(**options):
+        return lambda query: app_module.perform_search(query, 1, args.limit, scorer=args.scorer, mode=args.mode, **options)
+    
+    variants = [
+        ('unfiltered', search()),
+        (f'category {common}', search(categories=(common,))),
+        (f'category {rare}', search(categories=(rare,))),
+        (f'over-fetch {rare}', lambda query: overfetch_search(app_module, query, args, rare)),
+    ]
+    # Top-k rankings never see every match, so they cannot count facets
+    if args.mode != 'topk':
+        variants[1:1] = [('facets', search(facets=True)), (f'category {rare} + facets', search(categories=(rare,), facets=True))]
+    
+    total = sum(sizes.values())
+    print(f'{len(words)} words ({args.scorer}, {args.mode}, {args.engine}), {total} documents; '
+          f'{common} holds {sizes[common] * 100 / total:.1f}%, {rare} {sizes[rare] * 100 / total:.1f}%')
+    for name, function in variants:
+        latencies = []
+        full_pages = 0
+        for word in words:
+            for run in range(args.repeat):
+                start_time = time.perf_counter()
+                results = function(word)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+            full_pages += len(results['results']) == args.limit
+        print(f'  {name:<32} mean {sum(latencies) / len(latencies):8.2f} ms   '
+              f'p95 {percentile(latencies, 0.95):8.2f} ms   full pages {full_pages}/{len(words)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Mixed read/write load test
+Drives /api/search and /api/index concurrently through the Flask test
+client and reports throughput and latency percentiles. By default it runs
+twice on copies of the database, once with the old per-request connections
+and rollback journal (baseline) and once with the connection pool and WAL
+pragmas (tuned), and prints both.
+
+Usage:
+    python python_server/benchmarks/load_test.py --db PATH [--readers 8] [--writers 1] [--duration 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.runner import percentile
+
+# Environment for each configuration; the result cache is off so every
+# search reaches the database
+CONFIGS = {
+    'baseline': {
+        'DB_POOL_SIZE': '0',
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_CACHE_SIZE': '-2000',
+        'SQLITE_MMAP_SIZE': '0',
+        'RESULT_CACHE_SIZE': '0'
+    },
+    'tuned': {
+        'RESULT_CACHE_SIZE': '0'
+    }
+}
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Mixed search/index load test')
+    parser.add_argument('--db', required=True, help='SQLite database to copy for each run')
+    parser.add_argument('--config', choices=sorted(CONFIGS), help='Run a single configuration in this process')
+    parser.add_argument('--readers', type=int, default=8, help='Threads issuing searches')
+    parser.add_argument('--writers', type=int, default=1, help='Threads indexing documents')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of traffic per run')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def summarize(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+
+def sample_queries(app_module, rng, count=500):
+    """Skewed query mix: common words are drawn far more often"""
+    conn = app_module.get_db_connection()
+    words = [row[0] for row in conn.execute('SELECT word FROM term_stats ORDER BY doc_freq DESC LIMIT 2000')]
+    conn.close()
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return [' '.join(rng.choices(words, weights, k=rng.randint(1, 3))) for _ in range(count)]
+
+
+def run_load(app_module, args):
+    """Run readers and writers until the duration is up"""
+    rng = random.Random(args.seed)
+    queries = sample_queries(app_module, rng)
+    vocabulary = [word for query in queries for word in query.split()]
+    stop = threading.Event()
+    read_latencies = []
+    write_latencies = []
+    errors = []
+    
+    def reader(seed):
+        client = app_module.app.test_client()
+        local_rng = random.Random(seed)
+        while not stop.is_set():
+            start_time = time.perf_counter()
+            response = client.post('/api/search', json={'query': local_rng.choice(queries)})
+            read_latencies.append(time.perf_counter() - start_time)
+            if response.status_code != 200:
+                errors.append(response.get_json().get('error'))
+    
+    def writer(seed):
+        client = app_module.app.test_client()
+        local_rng = random.Random(seed)
+        while not stop.is_set():
+            doc = {
+                'title': ' '.join(local_rng.choices(vocabulary, k=5)),
+                'content': ' '.join(local_rng.choices(vocabulary, k=150))
+            }
+            start_time = time.perf_counter()
+            response = client.post('/api/index', json=doc)
+            write_latencies.append(time.perf_counter() - start_time)
+            if response.status_code != 200:
+                errors.append(response.get_json().get('error'))
+    
+    threads = [threading.Thread(target=reader, args=(args.seed + i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(-args.seed - i,)) for i in range(args.writers)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    
+    return {
+        'reads': summarize(read_latencies, elapsed),
+        'writes': summarize(write_latencies, elapsed),
+        'errors': len(errors),
+        'error_samples': sorted(set(str(error) for error in errors))[:5]
+    }
+
+
+def run_config(args):
+    """Load the app with the configuration already in the environment and report JSON"""
+    os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    import app as app_module
+    print(json.dumps(run_load(app_module, args)))
+
+
+def main():
+    args = parse_args()
+    if args.config:
+        run_config(args)
+        return
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, env in CONFIGS.items():
+            db_path = os.path.join(tmp, f'{name}.db')
+            shutil.copy(args.db, db_path)
+            command = [
+                sys.executable, os.path.abspath(__file__), '--db', db_path, '--config', name,
+                '--readers', str(args.readers), '--writers', str(args.writers),
+                '--duration', str(args.duration), '--seed', str(args.seed)
+            ]
+            output = subprocess.run(command, env=dict(os.environ, **env), capture_output=True, text=True, check=True)
+            results[name] = json.loads(output.stdout.strip().splitlines()[-1])
+    
+    print(f'{args.readers} readers, {args.writers} writers, {args.duration:.0f}s per run')
+    for name, result in results.items():
+        for kind in ('reads', 'writes'):
+            row = result[kind]
+            print(f"  {name:<9} {kind:<6} {row['per_sec']:8.1f} req/s   p50 {row['p50_ms']:8.2f} ms   p99 {row['p99_ms']:8.2f} ms")
+        if result['errors']:
+            print(f"  {name:<9} {result['errors']} errors: {result['error_samples']}")
+
+
+if __name__ == '__main__':
+    main()
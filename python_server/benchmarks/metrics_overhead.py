@@ -0,0 +1,68 @@
+"""
+Instrumentation overhead benchmark
+Runs the same searches through the Flask test client with the stage timers
+and request metrics switched off and on, interleaving the two so drift in
+the machine affects both equally, and reports the difference.
+
+Usage:
+    python python_server/benchmarks/metrics_overhead.py [--db PATH] [--rounds 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Measure the cost of per-stage timers and request metrics')
+    parser.add_argument('--db', help='SQLite database path (defaults to data/search_index.db)')
+    parser.add_argument('--rounds', type=int, default=20, help='Passes over the query set per setting')
+    parser.add_argument('--queries', type=int, default=50, help='Distinct queries, drawn from the commonest words')
+    return parser.parse_args()
+
+
+def run_round(client, queries):
+    start_time = time.perf_counter()
+    for query in queries:
+        client.post('/api/search', json={'query': query})
+    return time.perf_counter() - start_time
+
+
+def main():
+    args = parse_args()
+    
+    # The app reads its configuration at import time; the result cache
+    # would otherwise answer every repeated query
+    if args.db:
+        os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    import app as app_module
+    
+    conn = app_module.get_db_connection()
+    words = [row[0] for row in conn.execute('SELECT word FROM term_stats ORDER BY doc_freq DESC LIMIT ?', (args.queries * 2,))]
+    conn.close()
+    queries = [f'{words[i]} {words[-1 - i]}' for i in range(len(words) // 2)]
+    client = app_module.app.test_client()
+    run_round(client, queries)
+    
+    totals = {False: 0.0, True: 0.0}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            app_module.METRICS_ENABLED = enabled
+            totals[enabled] += run_round(client, queries)
+    
+    searches = args.rounds * len(queries)
+    disabled = totals[False] / searches * 1000
+    enabled = totals[True] / searches * 1000
+    print(f'{searches} searches per setting')
+    print(f'  metrics off  {disabled:.3f} ms/search')
+    print(f'  metrics on   {enabled:.3f} ms/search')
+    print(f'  overhead     {enabled - disabled:+.3f} ms ({(enabled - disabled) / disabled * 100:+.1f}%)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Phrase query benchmark
+Times quoted phrase queries and proximity-boosted queries against the same
+words searched as plain terms. Word pairs are sampled from adjacent tokens
+of indexed documents, so every phrase has at least one match.
+
+Usage:
+    python python_server/benchmarks/phrase_queries.py [--db PATH] [--queries N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.runner import percentile
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Compare phrase and plain term query latency')
+    parser.add_argument('--db', help='SQLite database path (defaults to data/search_index.db)')
+    parser.add_argument('--queries', type=int, default=200, help='Word pairs to sample')
+    parser.add_argument('--scorer', default='bm25', help='Scorer used for every query')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def sample_pairs(app_module, count, seed):
+    """Adjacent word pairs taken from random documents"""
+    conn = app_module.get_db_connection()
+    doc_ids = [row[0] for row in conn.execute('SELECT id FROM documents')]
+    rng = random.Random(seed)
+    pairs = []
+    for doc_id in rng.sample(doc_ids, min(count, len(doc_ids))):
+        row = conn.execute('SELECT content FROM documents WHERE id = ?', (doc_id,)).fetchone()
+        words = app_module.tokenize(row['content'])
+        if len(words) > 1:
+            i = rng.randrange(len(words) - 1)
+            pairs.append((words[i], words[i + 1]))
+    conn.close()
+    return pairs
+
+
+def time_queries(app_module, queries, **options):
+    """Run each query once and return per-query latencies in milliseconds"""
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        app_module.perform_search(query, **options)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    return {
+        'mean_ms': sum(latencies) / len(latencies),
+        'p50_ms': percentile(latencies, 0.5),
+        'p95_ms': percentile(latencies, 0.95)
+    }
+
+
+def main():
+    args = parse_args()
+    
+    # The app reads its database path at import time
+    if args.db:
+        os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    import app as app_module
+    
+    pairs = sample_pairs(app_module, args.queries, args.seed)
+    if not pairs:
+        print('No documents to sample phrases from')
+        return
+    
+    terms = [f'{a} {b}' for a, b in pairs]
+    phrases = [f'"{a} {b}"' for a, b in pairs]
+    runs = [
+        ('terms', terms, {}),
+        ('phrase', phrases, {}),
+        ('proximity', terms, {'proximity': True})
+    ]
+    
+    # Warm the page cache and any in-memory engine before timing
+    time_queries(app_module, terms, scorer=args.scorer)
+    
+    print(f'{len(pairs)} queries, scorer={args.scorer}, engine={app_module.INDEX_ENGINE}')
+    for name, queries, options in runs:
+        result = summarize(time_queries(app_module, queries, scorer=args.scorer, **options))
+        print(f"  {name:<10} mean {result['mean_ms']:7.2f} ms   p50 {result['p50_ms']:7.2f} ms   p95 {result['p95_ms']:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Query log generator
+Writes NDJSON search requests over the vocabulary of a synthetic corpus.
+A pool of distinct queries is drawn first and the log then repeats them
+with Zipfian popularity, so a few queries dominate as in real traffic.
+Phrase queries are taken from word sequences that occur in the corpus.
+
+Usage:
+    python python_server/benchmarks/queries.py --docs 100000 --count 10000 -o queries.ndjson
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import add_corpus_args, corpus_from_args, zipf_cum_weights
+
+# Share of one-, two- and three-word queries
+TERM_COUNT_WEIGHTS = (0.35, 0.45, 0.2)
+
+
+def generate_queries(corpus, count, distinct=None, phrase_fraction=0.1, seed=1):
+    """Yield count query strings for a ZipfCorpus"""
+    rng = random.Random(seed)
+    distinct = distinct or max(1, count // 5)
+    
+    pool = []
+    for _ in range(distinct):
+        if rng.random() < phrase_fraction:
+            pool.append('"' + ' '.join(corpus.phrase(rng)) + '"')
+        else:
+            terms = rng.choices((1, 2, 3), TERM_COUNT_WEIGHTS)[0]
+            pool.append(' '.join(rng.choices(corpus.vocabulary, cum_weights=corpus.cum_weights, k=terms)))
+    
+    popularity = zipf_cum_weights(len(pool), 1.0)
+    for query in rng.choices(pool, cum_weights=popularity, k=count):
+        yield query
+
+
+def add_query_args(parser):
+    """Query log parameters shared with the runner"""
+    parser.add_argument('--count', type=int, default=2000, help='Queries in the log')
+    parser.add_argument('--distinct', type=int, help='Distinct queries (defaults to a fifth of count)')
+    parser.add_argument('--phrase-fraction', type=float, default=0.1, help='Share of quoted phrase queries')
+    parser.add_argument('--query-seed', type=int, default=1)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate a query log for a synthetic corpus as NDJSON')
+    add_corpus_args(parser)
+    add_query_args(parser)
+    parser.add_argument('-o', '--output', default='-', help='Output file, or - for stdout')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    corpus = corpus_from_args(args)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for query in generate_queries(corpus, args.count, args.distinct, args.phrase_fraction, args.query_seed):
+            output.write(json.dumps({'query': query}) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark runner
+Builds an index from a synthetic (or given) corpus in a fresh database and
+measures tokenize, the single-document /api/index path, bulk loading,
+search_database over a query log and /api/stats. Reports throughput,
+latency percentiles, index size on disk and peak RSS as JSON, and with
+--baseline fails when a metric regresses past the threshold.
+
+Usage:
+    python python_server/benchmarks/runner.py --docs 100000 -o results.json
+    python python_server/benchmarks/runner.py --docs 100000 --baseline results.json --threshold 0.1
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import add_corpus_args, corpus_from_args, write_ndjson
+from benchmarks.queries import add_query_args, generate_queries
+
+# Metric name suffixes and whether a larger value is better
+HIGHER_IS_BETTER = ('_per_sec',)
+LOWER_IS_BETTER = ('_ms', '_bytes')
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Index a corpus, replay a query log and report JSON results')
+    add_corpus_args(parser)
+    add_query_args(parser)
+    parser.add_argument('--corpus', help='NDJSON corpus to load instead of generating one')
+    parser.add_argument('--queries', help='NDJSON query log to replay instead of generating one')
+    parser.add_argument('--db', help='Database path (defaults to a temporary file)')
+    parser.add_argument('--tokenize-docs', type=int, default=10000, help='Documents tokenized in the tokenize benchmark')
+    parser.add_argument('--index-docs', type=int, default=500, help='Documents added one at a time through /api/index')
+    parser.add_argument('--workers', type=int, help='Bulk load tokenizer processes')
+    parser.add_argument('--scorer', default='bm25')
+    parser.add_argument('--mode', default='exhaustive')
+    parser.add_argument('--stats-requests', type=int, default=20, help='/api/stats requests to time')
+    parser.add_argument('--cache', action='store_true', help='Keep the result cache on while replaying queries')
+    parser.add_argument('-o', '--output', help='Write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative regression per metric')
+    return parser.parse_args()
+
+
+def percentile(latencies, fraction):
+    """The latency at fraction of the way through latencies, in their unit; 0 without any"""
+    if not latencies:
+        return 0
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def latency_summary(latencies, elapsed=None):
+    """Throughput and percentiles of per-operation latencies in seconds"""
+    count = len(latencies)
+    elapsed = sum(latencies) if elapsed is None else elapsed
+    return {
+        'count': count,
+        'ops_per_sec': count / elapsed if elapsed else 0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+
+def read_lines(path, skip=0, limit=None):
+    with open(path, 'rb') as f:
+        yield from islice(f, skip, None if limit is None else skip + limit)
+
+
+def bench_tokenize(app_module, corpus_path, count):
+    docs = [json.loads(line) for line in read_lines(corpus_path, limit=count)]
+    texts = [doc['title'] + ' ' + doc['content'] for doc in docs]
+    start_time = time.perf_counter()
+    tokens = sum(len(app_module.tokenize(text)) for text in texts)
+    elapsed = time.perf_counter() - start_time
+    return {
+        'docs': len(texts),
+        'docs_per_sec': len(texts) / elapsed if elapsed else 0,
+        'tokens_per_sec': tokens / elapsed if elapsed else 0
+    }
+
+
+def bench_add_document(client, corpus_path, count):
+    latencies = []
+    for line in read_lines(corpus_path, limit=count):
+        start_time = time.perf_counter()
+        response = client.post('/api/index', data=line, content_type='application/json')
+        latencies.append(time.perf_counter() - start_time)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/index failed: {response.get_json()}")
+    return latency_summary(latencies)
+
+
+def bench_bulk(app_module, corpus_path, skip, workers):
+    report = app_module.bulk_index_documents(read_lines(corpus_path, skip=skip), workers=workers)
+    return {
+        'docs': report['documents'],
+        'elapsed': report['elapsed'],
+        'docs_per_sec': report['docs_per_sec'],
+        'postings_per_sec': report['postings_per_sec']
+    }
+
+
+def bench_search(app_module, queries, scorer, mode):
+    latencies = []
+    start_time = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        app_module.search_database(query, scorer=scorer, mode=mode)
+        latencies.append(time.perf_counter() - query_start)
+    return latency_summary(latencies, time.perf_counter() - start_time)
+
+
+def bench_stats(client, count):
+    latencies = []
+    for _ in range(count):
+        start_time = time.perf_counter()
+        client.get('/api/stats')
+        latencies.append(time.perf_counter() - start_time)
+    return latency_summary(latencies)
+
+
+def index_size(app_module):
+    """Bytes on disk of the database, its WAL and any segment file"""
+    paths = [app_module.DATABASE_PATH, app_module.DATABASE_PATH + '-wal', app_module.SEGMENT_PATH]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(report, prefix=''):
+    """Numeric metrics as {dotted.name: value}"""
+    metrics = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[prefix + key] = value
+    return metrics
+
+
+def find_regressions(report, baseline, threshold):
+    """Metrics that got worse than the baseline by more than threshold"""
+    current = flatten(report['results'])
+    regressions = []
+    for name, old in flatten(baseline['results']).items():
+        new = current.get(name)
+        if new is None or not old:
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = (old - new) / old
+        elif name.endswith(LOWER_IS_BETTER):
+            change = (new - old) / old
+        else:
+            continue
+        if change > threshold:
+            regressions.append({'metric': name, 'baseline': old, 'current': new, 'regression': change})
+    return regressions
+
+
+def run(args, work_dir):
+    corpus = None
+    corpus_path = args.corpus
+    if corpus_path is None:
+        corpus = corpus_from_args(args)
+        corpus_path = os.path.join(work_dir, 'corpus.ndjson')
+        with open(corpus_path, 'w') as f:
+            write_ndjson(corpus.documents(), f)
+    
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [json.loads(line)['query'] for line in f if line.strip()]
+    else:
+        corpus = corpus or corpus_from_args(args)
+        queries = list(generate_queries(corpus, args.count, args.distinct, args.phrase_fraction, args.query_seed))
+    
+    # The app reads its configuration at import time
+    os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db or os.path.join(work_dir, 'bench.db'))
+    if not args.cache:
+        os.environ['RESULT_CACHE_SIZE'] = '0'
+    # Keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as app_module
+    client = app_module.app.test_client()
+    
+    results = {'tokenize': bench_tokenize(app_module, corpus_path, args.tokenize_docs)}
+    results['add_document'] = bench_add_document(client, corpus_path, args.index_docs)
+    results['bulk'] = bench_bulk(app_module, corpus_path, args.index_docs, args.workers)
+    results['search'] = bench_search(app_module, queries, args.scorer, args.mode)
+    results['stats'] = bench_stats(client, args.stats_requests)
+    results['index_size_bytes'] = index_size(app_module)
+    # ru_maxrss is in KiB on Linux; the bulk tokenizer pool is counted separately
+    results['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    results['peak_child_rss_bytes'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'engine': app_module.INDEX_ENGINE,
+            'corpus': args.corpus or corpus.params(),
+            'queries': args.queries or len(queries),
+            'scorer': args.scorer,
+            'mode': args.mode
+        },
+        'results': results
+    }
+
+
+def main():
+    args = parse_args()
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run(args, work_dir)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['regressions'] = find_regressions(report, baseline, args.threshold)
+    
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    
+    if report.get('regressions'):
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']:.4g} -> "
+                  f"{regression['current']:.4g} ({regression['regression']:+.0%})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Server throughput benchmark
+Starts the Flask app under gunicorn sync workers and the ASGI app under
+uvicorn with the same number of worker processes, each on its own copy of
+the database, drives /api/search over HTTP from concurrent keep-alive
+connections and reports requests per second, requests per second per core
+and latency percentiles. The query mix is skewed like real traffic, so
+some identical searches arrive together and the ASGI server coalesces them.
+
+Usage:
+    python python_server/benchmarks/server_throughput.py --db PATH [--workers 2] [--connections 32] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.runner import percentile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'flask': lambda workers, port: [
+        sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+        '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'
+    ],
+    'asgi': lambda workers, port: [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', str(workers),
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'
+    ]
+}
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Compare search throughput of the Flask and ASGI servers')
+    parser.add_argument('--db', required=True, help='SQLite database to copy for each server')
+    parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=['flask', 'asgi'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Server worker processes')
+    parser.add_argument('--connections', type=int, default=32, help='Concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of traffic per server')
+    parser.add_argument('--cache', action='store_true', help='Keep the result cache on')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def sample_queries(db_path, rng, count=1000):
+    """Skewed query mix: common words are drawn far more often"""
+    conn = sqlite3.connect(db_path)
+    words = [row[0] for row in conn.execute('SELECT word FROM term_stats ORDER BY doc_freq DESC LIMIT 2000')]
+    conn.close()
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return [' '.join(rng.choices(words, weights, k=rng.randint(1, 3))) for _ in range(count)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, process, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stats', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+async def read_response(reader):
+    """Status and whether the server keeps the connection open"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(':', 1) for line in lines[1:] if ':' in line)
+    headers = {name.strip().lower(): value.strip() for name, value in headers.items()}
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(port, queries, rng, deadline, latencies, statuses):
+    connection = None
+    while time.perf_counter() < deadline:
+        if connection is None:
+            connection = await asyncio.open_connection('127.0.0.1', port)
+        reader, writer = connection
+        body = json.dumps({'query': rng.choice(queries)}).encode()
+        start_time = time.perf_counter()
+        writer.write(
+            b'POST /api/search HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n'
+            b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+        )
+        try:
+            status, keep_alive = await read_response(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start_time)
+        statuses[status] = statuses.get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def drive(port, queries, args):
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + args.duration
+    start_time = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, queries, random.Random(args.seed + i), deadline, latencies, statuses)
+        for i in range(args.connections)
+    ))
+    return latencies, statuses, time.perf_counter() - start_time
+
+
+def run_server(name, args, queries, work_dir):
+    db_path = os.path.join(work_dir, f'{name}.db')
+    shutil.copy(args.db, db_path)
+    port = free_port()
+    env = dict(os.environ, SEARCH_DB_PATH=db_path)
+    if not args.cache:
+        env['RESULT_CACHE_SIZE'] = '0'
+    process = subprocess.Popen(SERVERS[name](args.workers, port), cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_up(port, process)
+        latencies, statuses, elapsed = asyncio.run(drive(port, queries, args))
+        stats = json.loads(urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stats').read())
+    finally:
+        process.terminate()
+        process.wait()
+    
+    ok = statuses.get(200, 0)
+    # The client shares the machine, so cores is what the server may use
+    cores = min(args.workers, os.cpu_count())
+    return {
+        'requests': len(latencies),
+        'per_sec': ok / elapsed,
+        'per_sec_per_core': ok / elapsed / cores,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'statuses': statuses,
+        'server': stats.get('server')
+    }
+
+
+def main():
+    args = parse_args()
+    queries = sample_queries(args.db, random.Random(args.seed))
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.servers:
+            results[name] = run_server(name, args, queries, work_dir)
+    
+    print(f'{args.workers} workers, {args.connections} connections, {args.duration:.0f}s per server, '
+          f'result cache {"on" if args.cache else "off"}, {os.cpu_count()} cores')
+    for name, result in results.items():
+        print(f"  {name:<6} {result['per_sec']:8.1f} req/s   {result['per_sec_per_core']:8.1f} req/s/core   "
+              f"p50 {result['p50_ms']:8.2f} ms   p99 {result['p99_ms']:8.2f} ms   statuses {result['statuses']}")
+        if result['server']:
+            print(f"  {'':<6} coalesced {result['server']['coalesced']} searches (worker that answered /api/stats)")
+
+
+if __name__ == '__main__':
+    main()
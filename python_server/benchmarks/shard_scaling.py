@@ -0,0 +1,114 @@
+"""
+Shard scaling benchmark
+Bulk loads the same synthetic corpus into a fresh index for each shard
+count, then replays a query log against it, and reports ingest throughput
+and query latency per shard count. One shard is the plain single-database
+index; the others use SHARD_COUNT shard databases searched by as many
+worker processes. Each shard count runs in its own process because the
+app reads its configuration at import time.
+
+Usage:
+    python python_server/benchmarks/shard_scaling.py --docs 100000 --shards 1 2 4 8
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import add_corpus_args, corpus_from_args, write_ndjson
+from benchmarks.queries import add_query_args, generate_queries
+from benchmarks.runner import percentile
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Measure ingest and query scaling with the shard count')
+    add_corpus_args(parser)
+    add_query_args(parser)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4], help='Shard counts to compare')
+    parser.add_argument('--scorer', default='bm25')
+    parser.add_argument('--mode', default='exhaustive')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Documents per bulk batch')
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_shards(args):
+    """Load and query an index with args.run shards, printing a JSON result"""
+    os.environ['SEARCH_DB_PATH'] = os.path.join(args.work_dir, f'shards{args.run}', 'index.db')
+    os.environ['SHARD_COUNT'] = str(args.run)
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    # Keep stdout for the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as app_module
+    
+    with open(os.path.join(args.work_dir, 'corpus.ndjson'), 'rb') as f:
+        report = app_module.bulk_index_documents(f, batch_size=args.batch_size)
+    with open(os.path.join(args.work_dir, 'queries.ndjson')) as f:
+        queries = [json.loads(line)['query'] for line in f]
+    
+    # One pass to start the shard workers and warm the page cache
+    for query in queries[:50]:
+        app_module.search_database(query, scorer=args.scorer, mode=args.mode)
+    latencies = []
+    start_time = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        app_module.search_database(query, scorer=args.scorer, mode=args.mode)
+        latencies.append(time.perf_counter() - query_start)
+    elapsed = time.perf_counter() - start_time
+    
+    print(json.dumps({
+        'shards': args.run,
+        'ingest_docs_per_sec': report['docs_per_sec'],
+        'ingest_postings_per_sec': report['postings_per_sec'],
+        'queries_per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }))
+
+
+def main():
+    args = parse_args()
+    if args.run:
+        run_shards(args)
+        return
+    
+    corpus = corpus_from_args(args)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(os.path.join(work_dir, 'corpus.ndjson'), 'w') as f:
+            write_ndjson(corpus.documents(), f)
+        with open(os.path.join(work_dir, 'queries.ndjson'), 'w') as f:
+            for query in generate_queries(corpus, args.count, args.distinct, args.phrase_fraction, args.query_seed):
+                f.write(json.dumps({'query': query}) + '\n')
+        
+        for shards in args.shards:
+            os.makedirs(os.path.join(work_dir, f'shards{shards}'))
+            command = [
+                sys.executable, os.path.abspath(__file__), '--run', str(shards), '--work-dir', work_dir,
+                '--scorer', args.scorer, '--mode', args.mode, '--batch-size', str(args.batch_size)
+            ]
+            output = subprocess.run(command, capture_output=True, text=True, check=True)
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    
+    print(f'{args.docs} documents, {args.count} queries ({args.scorer}, {args.mode}), {os.cpu_count()} cores')
+    baseline = results[0]
+    for result in results:
+        print(f"  {result['shards']:>2} shards   ingest {result['ingest_docs_per_sec']:8.0f} docs/s "
+              f"({result['ingest_docs_per_sec'] / baseline['ingest_docs_per_sec']:4.2f}x)   "
+              f"search {result['queries_per_sec']:7.1f} q/s ({result['queries_per_sec'] / baseline['queries_per_sec']:4.2f}x)   "
+              f"p50 {result['p50_ms']:7.2f} ms   p95 {result['p95_ms']:7.2f} ms   p99 {result['p99_ms']:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Startup benchmark
+Bulk loads synthetic corpora of increasing size and starts fresh worker
+processes on each, timing how long a worker takes from being spawned to
+answering its first search, its first suggestion and its first category
+filter. Workers start the way the app always has, initializing the
+database when they import it; after `manage.py init`, attaching on first
+use; and after `manage.py snapshot` as well, restoring the state file.
+Each worker is its own process because the app reads its configuration at
+import time; the page cache is warm, as it is when a server adds workers.
+
+Usage:
+    python python_server/benchmarks/startup.py --sizes 2000 20000 100000 [--engine sqlite]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CATEGORIES, ZipfCorpus, make_word, write_ndjson
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, environment of the worker, whether it restores the state file)
+VARIANTS = [
+    ('init on import', {'INIT_ON_STARTUP': '1', 'LAZY_ATTACH': '0'}, False),
+    ('manage.py init', {'INIT_ON_STARTUP': '0', 'LAZY_ATTACH': '1'}, False),
+    ('manage.py init + snapshot', {'INIT_ON_STARTUP': '0', 'LAZY_ATTACH': '1'}, True),
+]
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Measure worker time-to-first-query as the corpus grows')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 20000, 100000], help='Corpus sizes in documents')
+    parser.add_argument('--engine', default='sqlite', help='INDEX_ENGINE of the workers')
+    parser.add_argument('--repeat', type=int, default=3, help='Workers started per variant; the median is reported')
+    parser.add_argument('--run', type=float, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_worker(spawned_at):
+    """Import the app and answer one of each request, printing seconds since spawned_at"""
+    # Keep stdout for the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as app_module
+        imported = time.time()
+        app_module.search_database(make_word(1), scorer='bm25')
+        searched = time.time()
+        app_module.suggest_terms(make_word(0)[:2], 8, fuzzy=True)
+        suggested = time.time()
+        app_module.search_database(make_word(1), scorer='bm25', categories=(CATEGORIES[-1],), facets=True)
+        filtered = time.time()
+    
+    print(json.dumps({
+        'import': imported - spawned_at,
+        'first_search': searched - spawned_at,
+        'first_suggest': suggested - spawned_at,
+        'first_filter': filtered - spawned_at,
+        'state': app_module.startup_times.state
+    }))
+
+
+def run(command, env):
+    """Run a command with env added to the environment, returning its output"""
+    return subprocess.run(command, env=dict(os.environ, **env), capture_output=True, text=True, check=True).stdout
+
+
+def start_workers(env, repeat):
+    """Median timings of repeat workers started with env"""
+    results = []
+    for _ in range(repeat):
+        output = run([sys.executable, os.path.abspath(__file__), '--run', repr(time.time())], env)
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    median = {}
+    for key in ('import', 'first_search', 'first_suggest', 'first_filter'):
+        median[key] = sorted(result[key] for result in results)[len(results) // 2]
+    median['state'] = results[0]['state']
+    return median
+
+
+def main():
+    args = parse_args()
+    if args.run:
+        run_worker(args.run)
+        return
+    
+    print(f'Worker startup ({args.engine}), milliseconds from spawning a worker; median of {args.repeat}')
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            db_path = os.path.join(work_dir, 'index.db')
+            state_path = os.path.join(work_dir, 'index.state')
+            env = {'SEARCH_DB_PATH': db_path, 'INDEX_ENGINE': args.engine, 'RESULT_CACHE_SIZE': '0'}
+            corpus_path = os.path.join(work_dir, 'corpus.ndjson')
+            with open(corpus_path, 'w') as f:
+                write_ndjson(ZipfCorpus(size).documents(), f)
+            run([sys.executable, os.path.join(SERVER_DIR, 'bulk_load.py'), corpus_path], env)
+            
+            start_time = time.time()
+            run([sys.executable, os.path.join(SERVER_DIR, 'manage.py'), 'snapshot', '--state', state_path], env)
+            snapshot_seconds = time.time() - start_time
+            
+            print(f'  {size} documents (manage.py snapshot {snapshot_seconds:.2f}s, '
+                  f'{os.path.getsize(state_path) / 1048576:.1f} MB state file)')
+            for name, variant_env, restore in VARIANTS:
+                state = {'STATE_PATH': state_path if restore else os.path.join(work_dir, 'missing.state')}
+                timings = start_workers(dict(env, **variant_env, **state), args.repeat)
+                print(f"    {name:<26} import {timings['import'] * 1000:7.0f}   "
+                      f"first search {timings['first_search'] * 1000:7.0f}   "
+                      f"+ suggest {timings['first_suggest'] * 1000:7.0f}   "
+                      f"+ filter {timings['first_filter'] * 1000:7.0f}   state file {timings['state']}")
+
+
+if __name__ == '__main__':
+    main()
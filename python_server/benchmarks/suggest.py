@@ -0,0 +1,137 @@
+"""
+Suggestion and fuzzy lookup benchmark
+Builds a term dictionary over a synthetic vocabulary with Zipfian document
+frequencies, then times prefix completions for prefixes of popular words
+and fuzzy lookups for words with one or two random typos, and reports
+build time, memory and latency percentiles. The corpus vocabulary is
+every syllable combination up to its size, far denser than a natural
+one, so fuzzy lookups visit more of it; --sparse draws words of random
+letters instead.
+
+Usage:
+    python python_server/benchmarks/suggest.py [--terms 1000000] [--lookups 2000] [--sparse]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import make_word, zipf_cum_weights
+from benchmarks.runner import percentile
+from terms import TermDictionary, auto_edits
+
+TARGET_MS = 5
+
+# The app's defaults for suggestions and fuzzy search
+SUGGEST_FUZZY_EDITS = 1
+SUGGEST_FUZZY_PREFIX_LENGTH = 2
+FUZZY_EXPANSIONS = 3
+FUZZY_PREFIX_LENGTH = 1
+
+# English letter frequencies, for --sparse words
+LETTER_WEIGHTS = {
+    'e': 12.7, 't': 9.1, 'a': 8.2, 'o': 7.5, 'i': 7.0, 'n': 6.7, 's': 6.3, 'h': 6.1, 'r': 6.0,
+    'd': 4.3, 'l': 4.0, 'c': 2.8, 'u': 2.8, 'm': 2.4, 'w': 2.4, 'f': 2.2, 'g': 2.0, 'y': 2.0,
+    'p': 1.9, 'b': 1.5, 'v': 1.0, 'k': 0.8, 'j': 0.2, 'x': 0.2, 'q': 0.1, 'z': 0.1
+}
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Measure suggestion and fuzzy lookup latency')
+    parser.add_argument('--terms', type=int, default=1000000, help='Vocabulary size')
+    parser.add_argument('--lookups', type=int, default=2000, help='Lookups per variant')
+    parser.add_argument('--limit', type=int, default=10, help='Suggestions per lookup')
+    parser.add_argument('--sparse', action='store_true', help='Random-letter words instead of the corpus vocabulary')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def sparse_words(count, rng):
+    """count distinct words of 4 to 12 random letters"""
+    letters = list(LETTER_WEIGHTS)
+    weights = list(LETTER_WEIGHTS.values())
+    words = {}
+    while len(words) < count:
+        words.setdefault(''.join(rng.choices(letters, weights, k=rng.randint(4, 12))), None)
+    return list(words)
+
+
+def typo(word, rng, edits):
+    """word with edits random insertions, deletions, substitutions or transpositions"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    for _ in range(edits):
+        i = rng.randrange(1, len(word))
+        kind = rng.randrange(4)
+        if kind == 0:
+            word = word[:i] + rng.choice(letters) + word[i:]
+        elif kind == 1 and len(word) > 3:
+            word = word[:i] + word[i + 1:]
+        elif kind == 2 and i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        else:
+            word = word[:i] + rng.choice(letters) + word[i + 1:]
+    return word
+
+
+def time_lookups(function, inputs):
+    """Latencies of function(input) in milliseconds"""
+    latencies = []
+    for value in inputs:
+        start_time = time.perf_counter()
+        function(value)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    words = sparse_words(args.terms, rng) if args.sparse else [make_word(rank) for rank in range(args.terms)]
+    # Zipfian document frequencies by rank, over a million documents
+    vocabulary = sorted((word, max(1, 1000000 // (rank + 1))) for rank, word in enumerate(words))
+    
+    start_time = time.perf_counter()
+    terms = TermDictionary(vocabulary)
+    build_seconds = time.perf_counter() - start_time
+    stats = terms.stats()
+    print(f"{len(terms)} {'sparse' if args.sparse else 'corpus'} terms, built in {build_seconds:.2f}s, {stats['memory_bytes'] / 1e6:.1f} MB, "
+          f"{stats['ranked_prefixes']} ranked prefixes")
+    
+    # Lookups favour popular words, as typed queries do
+    popular = rng.choices(words, cum_weights=zipf_cum_weights(len(words), 1.0), k=args.lookups)
+    variants = []
+    for length in (1, 2, 3, 5):
+        prefixes = [word[:length] for word in popular]
+        variants.append((f'complete, {length}-char prefix', lambda prefix: terms.complete(prefix, args.limit), prefixes))
+    # Fuzzy lookups as /api/suggest and fuzzy searches make them
+    for typos in (1, 2):
+        typed = [typo(word, rng, typos) for word in popular]
+        variants.append((
+            f'suggest fuzzy, {typos} typo(s)',
+            lambda word: terms.fuzzy(word, SUGGEST_FUZZY_EDITS, args.limit, SUGGEST_FUZZY_PREFIX_LENGTH),
+            typed
+        ))
+        variants.append((
+            f'search fuzzy, {typos} typo(s)',
+            lambda word: terms.fuzzy(word, limit=FUZZY_EXPANSIONS, prefix_length=FUZZY_PREFIX_LENGTH),
+            typed
+        ))
+    
+    for name, function, inputs in variants:
+        latencies = time_lookups(function, inputs)
+        p99 = percentile(latencies, 0.99)
+        # The latency target is for what runs on every keystroke
+        target = '' if name.startswith('search') else f'{"ok" if p99 < TARGET_MS else "over"} {TARGET_MS} ms'
+        print(f'  {name:<30} p50 {percentile(latencies, 0.5):7.3f} ms   p99 {p99:7.3f} ms   '
+              f'max {max(latencies):7.3f} ms   {target}')
+    fuzzy_edits = sum(auto_edits(word) for word in popular) / len(popular)
+    print(f'  fuzzy searches allow {fuzzy_edits:.2f} edits on average (1 up to 5 characters, 2 beyond)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Tokenizer microbenchmark
+Tokenizes a synthetic corpus with the tokenizer the app used to have and
+with the Analyzer in its default, folding and stemming configurations, as
+a list, as a stream and in a process pool, and reports tokens per second.
+Each variant keeps its best of several rounds.
+
+Usage:
+    python python_server/benchmarks/tokenizer.py [--docs 20000] [--rounds 3] [--workers 4]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import Analyzer
+from benchmarks.corpus import ZipfCorpus
+
+# Accented, numeric and non-Latin text mixed into some documents
+MIXED_TEXT = 'Café São Paulo naïve résumé 2024 COVID-19 Zürich Ελληνικά 東京 python3 '
+
+
+def legacy_tokenize(text):
+    """The app's tokenizer before the Analyzer, kept as the reference"""
+    words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
+    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+                  'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been',
+                  'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+                  'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
+                  'those', 'it', 'its', 'as', 'if', 'then', 'than', 'so', 'such'}
+    return [w for w in words if w not in stop_words and len(w) > 1]
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Compare tokenizer throughput')
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic documents to tokenize')
+    parser.add_argument('--rounds', type=int, default=3, help='Rounds per variant; the best is reported')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes for the batch variant')
+    parser.add_argument('--mixed', type=float, default=0.1, help='Fraction of documents with non-ASCII text')
+    return parser.parse_args()
+
+
+def best_rate(function, texts, rounds):
+    """Best (tokens per second, tokens) over rounds of function(texts)"""
+    best = 0.0
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        tokens = function(texts)
+        elapsed = time.perf_counter() - start_time
+        best = max(best, tokens / elapsed if elapsed else 0)
+    return best, tokens
+
+
+def main():
+    args = parse_args()
+    corpus = ZipfCorpus(args.docs)
+    mixed_every = int(1 / args.mixed) if args.mixed else 0
+    texts = [
+        doc['title'] + ' ' + doc['content'] + (' ' + MIXED_TEXT if mixed_every and i % mixed_every == 0 else '')
+        for i, doc in enumerate(corpus.documents())
+    ]
+    
+    default = Analyzer()
+    folding = Analyzer(fold=True)
+    stemming = Analyzer(fold=True, stem=True)
+    variants = [
+        ('legacy', lambda texts: sum(len(legacy_tokenize(text)) for text in texts)),
+        ('analyzer', lambda texts: sum(len(default.tokenize(text)) for text in texts)),
+        ('analyzer stream', lambda texts: sum(1 for _ in default.stream(texts))),
+        ('analyzer fold', lambda texts: sum(len(folding.tokenize(text)) for text in texts)),
+        ('analyzer fold+stem', lambda texts: sum(len(stemming.tokenize(text)) for text in texts)),
+        (f'analyzer batch x{args.workers}', lambda texts: sum(len(tokens) for tokens in default.tokenize_batch(texts, args.workers)))
+    ]
+    
+    print(f'{len(texts)} documents, {sum(map(len, texts)) / 1e6:.1f} MB of text, best of {args.rounds}')
+    baseline = None
+    for name, function in variants:
+        rate, tokens = best_rate(function, texts, args.rounds)
+        baseline = baseline or rate
+        print(f'  {name:<22} {rate / 1e6:6.2f} M tokens/s  {rate / baseline:5.2f}x  ({tokens} tokens)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Bulk loader for the search engine
+Streams NDJSON documents (one {"title", "content", "url", "category"} object
+per line) into the index using the batched ingest path.
+
+For comparison, --per-document loads through /api/index one request at a
+time, and with --baseline as it originally ran: a new connection and a
+synchronous rollback-journal commit per document.
+
+Usage:
+    python python_server/bulk_load.py corpus.ndjson [--db PATH] [--workers N]
+    python python_server/bulk_load.py corpus.ndjson --db PATH --per-document [--baseline]
+    cat corpus.ndjson | python python_server/bulk_load.py -
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# The original per-request connections and journal settings
+BASELINE_ENV = {
+    'DB_POOL_SIZE': '0',
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_CACHE_SIZE': '-2000',
+    'SQLITE_MMAP_SIZE': '0'
+}
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Bulk load NDJSON documents into the search index')
+    parser.add_argument('input', help='NDJSON file to load, or - for stdin')
+    parser.add_argument('--db', help='SQLite database path (defaults to data/search_index.db)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Documents per transaction')
+    parser.add_argument('--workers', type=int, default=None, help='Tokenizer processes (defaults to CPU count)')
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help='Drop idx_word/idx_document during the load and rebuild them afterwards')
+    parser.add_argument('--per-document', action='store_true',
+                        help='Load through the one-document-per-request /api/index path instead, for comparison')
+    parser.add_argument('--baseline', action='store_true',
+                        help='With --per-document, connect and commit as /api/index originally did')
+    return parser.parse_args()
+
+
+def load_per_document(app_module, lines):
+    """Load documents one request at a time through /api/index"""
+    client = app_module.app.test_client()
+    errors = []
+    doc_count = 0
+    start_time = time.time()
+    
+    for doc in app_module.read_ndjson_documents(lines, errors):
+        response = client.post('/api/index', json=doc)
+        if response.status_code != 200:
+            errors.append({'document': doc_count, 'error': response.get_json().get('error')})
+        doc_count += 1
+    
+    elapsed = time.time() - start_time
+    
+    return {
+        'documents': doc_count,
+        'errors': errors,
+        'elapsed': elapsed,
+        'docs_per_sec': doc_count / elapsed if elapsed else 0
+    }
+
+
+def main():
+    args = parse_args()
+    
+    # The app reads its database path at import time
+    if args.db:
+        os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    if args.baseline:
+        os.environ.update(BASELINE_ENV)
+    import app as app_module
+    
+    lines = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    
+    try:
+        if args.per_document:
+            report = load_per_document(app_module, lines)
+        else:
+            report = app_module.bulk_index_documents(
+                lines,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                rebuild_indexes=args.rebuild_indexes
+            )
+    finally:
+        if lines is not sys.stdin.buffer:
+            lines.close()
+    
+    print(f"Indexed {report['documents']} documents in {report['elapsed']:.2f}s")
+    print(f"  {report['docs_per_sec']:.1f} docs/sec")
+    if 'postings_per_sec' in report:
+        print(f"  {report['postings_per_sec']:.1f} postings/sec")
+    if report['errors']:
+        print(f"  {len(report['errors'])} lines skipped:")
+        print(json.dumps(report['errors'][:10], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Search result cache
+Holds recent search responses in LRU order, bounded by entry count and
+approximate memory. Entries expire after a TTL and the whole cache is
+dropped whenever the index generation changes, so a cached page is never
+older than the last indexed document.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def approximate_size(value):
+    """Rough resident size of a response made of dicts, lists and scalars"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + approximate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += approximate_size(item)
+    return size
+
+
+class ResultCache:
+    """LRU cache of search responses tied to an index generation"""
+    
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires at, size, value), least recently used first
+        self.entries = OrderedDict()
+        self.generation = None
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+    
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.memory_bytes = 0
+            self.generation = generation
+    
+    def get(self, key, generation):
+        """Return the cached value for key, or None"""
+        with self.lock:
+            self._check_generation(generation)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+    
+    def put(self, key, generation, value):
+        """Store value for key if it was computed at the current generation"""
+        size = approximate_size(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self.lock:
+            # A result computed before a concurrent write is already stale
+            if self.generation is not None and generation < self.generation:
+                return
+            self._check_generation(generation)
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.memory_bytes += size
+            while len(self.entries) > self.max_entries or self.memory_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def _remove(self, key):
+        self.memory_bytes -= self.entries.pop(key)[1]
+    
+    def stats(self):
+        """Hit rates and memory figures for /api/stats"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'memory_bytes': self.memory_bytes,
+                'generation': self.generation
+            }
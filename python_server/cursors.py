@@ -0,0 +1,180 @@
+"""
+Cursor pagination for search results
+A search that has more results hands out an opaque cursor naming the last
+result of the page (its score and document id), its position in the
+ranking and a server-side snapshot of that ranking. Following pages are
+sliced out of the snapshot without scoring anything again; when the
+snapshot has expired, was evicted or lives in another worker, the search
+is ranked again and resumes after the cursor's document.
+"""
+
+import base64
+import binascii
+import json
+import secrets
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, namedtuple
+
+# The last result of a page: where the next page starts
+Cursor = namedtuple('Cursor', ['snapshot', 'position', 'score', 'doc_id'])
+
+
+class CursorError(ValueError):
+    """A cursor that cannot be decoded or belongs to another search"""
+
+
+def search_fingerprint(words, phrases, scorer, mode, proximity, fuzzy=False, categories=()):
+    """Checksum of the options that decide a ranking, carried by its cursors
+    
+    The query is given as its words and phrases, so queries differing only
+    in case or punctuation share their cursors, as they share cache entries.
+    """
+    return zlib.crc32(json.dumps([
+        list(words), [list(phrase) for phrase in phrases], scorer, mode, bool(proximity), bool(fuzzy), list(categories)
+    ]).encode())
+
+
+def encode_cursor(cursor, fingerprint):
+    """URL-safe token for cursor"""
+    payload = json.dumps([fingerprint, *cursor], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode()
+
+
+def decode_cursor(token, fingerprint):
+    """Cursor of a token made by encode_cursor for the same search"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        token_fingerprint, snapshot, position, score, doc_id = values
+        cursor = Cursor(str(snapshot), int(position), float(score), int(doc_id))
+    except (ValueError, TypeError, binascii.Error):
+        raise CursorError('Invalid cursor')
+    if token_fingerprint != fingerprint:
+        raise CursorError('Cursor belongs to a different search')
+    if cursor.position < 1:
+        raise CursorError('Invalid cursor')
+    return cursor
+
+
+class Snapshot:
+    """Ranked document ids and scores of one search, as it ranked them
+    
+    complete is False when the ranking stopped after its best rows, so
+    pages past its end must be ranked again more deeply. facets holds the
+    category counts of the matches when the search asked for them.
+    """
+    
+    __slots__ = ('ids', 'scores', 'total', 'complete', 'facets')
+    
+    def __init__(self, rows, total, complete, facets=None):
+        self.ids = array('q', [row['document_id'] for row in rows])
+        self.scores = array('d', [row['score'] for row in rows])
+        self.total = total
+        self.complete = complete
+        self.facets = facets
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self.ids) + sys.getsizeof(self.scores)
+    
+    def covers(self, stop):
+        """Whether rows up to stop are all in the snapshot, or there are none"""
+        return self.complete or stop <= len(self.ids)
+    
+    def resume(self, cursor):
+        """Position of the first row after the cursor's document"""
+        position = cursor.position
+        if position <= len(self.ids) and self.ids[position - 1] == cursor.doc_id:
+            return position
+        # Ranked again since the cursor was made: continue after its document
+        # if it is still ranked, otherwise after the first lower score
+        try:
+            return self.ids.index(cursor.doc_id) + 1
+        except ValueError:
+            pass
+        for i, (score, doc_id) in enumerate(zip(self.scores, self.ids)):
+            if score < cursor.score or (score == cursor.score and doc_id > cursor.doc_id):
+                return i
+        return len(self.ids)
+    
+    def rows(self, start, stop):
+        return [
+            {'document_id': doc_id, 'score': score}
+            for doc_id, score in zip(self.ids[start:stop], self.scores[start:stop])
+        ]
+
+
+class SnapshotStore:
+    """LRU of snapshots by id, bounded by count and memory
+    
+    A snapshot expires ttl seconds after it was last read. Index writes do
+    not invalidate snapshots: pages of one cursor come from the ranking as
+    it was when the search first ran, so none are repeated or skipped.
+    """
+    
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # id -> (expires at, snapshot), least recently used first
+        self.entries = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+    
+    def put(self, snapshot):
+        """Store snapshot, returning its id (None when it is not kept)"""
+        if not self.enabled or snapshot.nbytes > self.max_bytes:
+            return None
+        snapshot_id = secrets.token_urlsafe(9)
+        with self.lock:
+            self.entries[snapshot_id] = (time.monotonic() + self.ttl, snapshot)
+            self.memory_bytes += snapshot.nbytes
+            while len(self.entries) > self.max_entries or self.memory_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return snapshot_id
+    
+    def get(self, snapshot_id):
+        """Return the snapshot with the id, or None"""
+        with self.lock:
+            entry = self.entries.get(snapshot_id)
+            now = time.monotonic()
+            if entry is not None and entry[0] < now:
+                self._remove(snapshot_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries[snapshot_id] = (now + self.ttl, entry[1])
+            self.entries.move_to_end(snapshot_id)
+            self.hits += 1
+            return entry[1]
+    
+    def _remove(self, snapshot_id):
+        self.memory_bytes -= self.entries.pop(snapshot_id)[1].nbytes
+    
+    def stats(self):
+        """Snapshot figures for /api/stats"""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'memory_bytes': self.memory_bytes
+            }
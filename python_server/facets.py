@@ -0,0 +1,157 @@
+"""
+Category facets for the search engine
+Every category keeps a bitset of its documents: bit i is set when document
+i has the category. Bitsets are updated in place as documents are
+indexed, a category filter is the union of the selected bitsets, tested
+while candidates are generated, and facet counts are population counts of
+the matches intersected with each category's bitset.
+"""
+
+import threading
+from itertools import compress
+
+# Turns the '0' and '1' digits of a binary string into zero and nonzero bytes
+_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+class Bitset:
+    """Set of document ids as a bit array, growing with the largest id
+    
+    Membership tests and adds are O(1); unions, intersections and counts
+    run over whole machine words through Python's integers.
+    """
+    
+    __slots__ = ('bits', 'count')
+    
+    def __init__(self, bits=None, count=0):
+        self.bits = bits if bits is not None else bytearray()
+        self.count = count
+    
+    @classmethod
+    def from_ids(cls, doc_ids):
+        bitset = cls()
+        for doc_id in doc_ids:
+            bitset.add(doc_id)
+        return bitset
+    
+    @classmethod
+    def from_int(cls, value):
+        return cls(bytearray(value.to_bytes((value.bit_length() + 7) // 8, 'little')), value.bit_count())
+    
+    def to_int(self):
+        return int.from_bytes(self.bits, 'little')
+    
+    def add(self, doc_id):
+        i = doc_id >> 3
+        if i >= len(self.bits):
+            # Doubling keeps appends in id order amortized O(1)
+            self.bits.extend(bytes(max(i + 1, 2 * len(self.bits)) - len(self.bits)))
+        mask = 1 << (doc_id & 7)
+        if not self.bits[i] & mask:
+            self.bits[i] |= mask
+            self.count += 1
+    
+    def __contains__(self, doc_id):
+        i = doc_id >> 3
+        return i < len(self.bits) and (self.bits[i] >> (doc_id & 7)) & 1 == 1
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        """Document ids in increasing order"""
+        flags = bin(self.to_int())[:1:-1].encode().translate(_FLAGS)
+        return compress(range(len(flags)), flags)
+    
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class CategoryIndex:
+    """Bitsets of the documents of every category in one database
+    
+    refresh() adds the documents indexed since the last refresh, whichever
+    worker indexed them, and reads everything again when documents were
+    committed out of id order and the incremental read missed some.
+    """
+    
+    def __init__(self):
+        # category -> Bitset of its document ids
+        self.bitsets = {}
+        self.last_doc_id = 0
+        self.doc_count = 0
+        self.generation = None
+        self.reloads = 0
+        self.lock = threading.Lock()
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+    
+    def add(self, doc_id, category):
+        bitset = self.bitsets.get(category)
+        if bitset is None:
+            bitset = self.bitsets[category] = Bitset()
+        bitset.add(doc_id)
+        self.doc_count += 1
+        if doc_id > self.last_doc_id:
+            self.last_doc_id = doc_id
+    
+    def refresh(self, conn):
+        """Add documents indexed since the last refresh"""
+        meta = dict(conn.execute(
+            "SELECT key, value FROM index_meta WHERE key IN ('generation', 'doc_count')"
+        ).fetchall())
+        if meta.get('generation', 0) == self.generation:
+            return
+        with self.lock:
+            if meta.get('generation', 0) == self.generation:
+                return
+            self._read(conn, self.last_doc_id)
+            if self.doc_count != meta.get('doc_count', 0):
+                self.bitsets = {}
+                self.last_doc_id = 0
+                self.doc_count = 0
+                self.reloads += 1
+                self._read(conn, 0)
+            self.generation = meta.get('generation', 0)
+    
+    def _read(self, conn, after_id):
+        for doc_id, category in conn.execute('SELECT id, category FROM documents WHERE id > ?', (after_id,)):
+            self.add(doc_id, category)
+    
+    def select(self, categories):
+        """Bitset of the documents in any of categories"""
+        bitsets = [self.bitsets[category] for category in categories if category in self.bitsets]
+        if len(bitsets) == 1:
+            return bitsets[0]
+        union = 0
+        for bitset in bitsets:
+            union |= bitset.to_int()
+        return Bitset.from_int(union)
+    
+    def counts(self, doc_ids):
+        """{category: number of doc_ids in it} for every category holding any"""
+        matches = Bitset.from_ids(doc_ids).to_int()
+        counts = {}
+        for category, bitset in self.bitsets.items():
+            count = (matches & bitset.to_int()).bit_count()
+            if count:
+                counts[category] = count
+        return counts
+    
+    def stats(self):
+        """Category figures for /api/stats"""
+        return {
+            'categories': len(self.bitsets),
+            'documents': self.doc_count,
+            'generation': self.generation,
+            'reloads': self.reloads,
+            'memory_bytes': sum(bitset.nbytes for bitset in self.bitsets.values())
+        }
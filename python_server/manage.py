@@ -0,0 +1,67 @@
+"""
+Deploy-time setup for the search engine
+init creates the schema (of every shard) and seeds an empty database with
+the sample documents; snapshot writes the state file workers restore the
+term dictionary and category bitsets from, with INDEX_ENGINE=memory the
+posting index too, and with INDEX_ENGINE=segment the segment file. Run
+them once per deploy, then start the server with INIT_ON_STARTUP=0 so its
+workers skip that work.
+
+Usage:
+    python python_server/manage.py init [--db PATH]
+    python python_server/manage.py snapshot [--db PATH] [--state PATH]
+"""
+
+import argparse
+import os
+import time
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Prepare the search index ahead of starting the server')
+    parser.add_argument('command', choices=['init', 'snapshot'])
+    parser.add_argument('--db', help='SQLite database path (defaults to data/search_index.db)')
+    parser.add_argument('--state', help='State file path (defaults to the database path with .state)')
+    return parser.parse_args()
+
+
+def snapshot(app_module, path):
+    """Write the state file, and the segment for the segment engine"""
+    start_time = time.time()
+    state = app_module.write_state_file(path)
+    categories = sum(len(index.bitsets) for index in state['categories'].values())
+    postings = f"{state['postings'].posting_count} postings, " if state['postings'] is not None else ''
+    print(f"Wrote {path} in {time.time() - start_time:.2f}s: {len(state['terms'])} terms, "
+          f"{categories} category bitsets, {postings}generation {state['generation']}, "
+          f"{os.path.getsize(path) / 1048576:.1f} MB")
+    
+    if app_module.INDEX_ENGINE == 'segment' and app_module.shard_set is None:
+        start_time = time.time()
+        conn = app_module.get_db_connection()
+        app_module.SegmentIndex(app_module.SEGMENT_PATH, 0).merge(conn)
+        conn.close()
+        print(f"Wrote {app_module.SEGMENT_PATH} in {time.time() - start_time:.2f}s")
+
+
+def main():
+    args = parse_args()
+    
+    # The app reads its configuration at import time; importing it here
+    # must not do the work this command is for
+    if args.db:
+        os.environ['SEARCH_DB_PATH'] = os.path.abspath(args.db)
+    os.environ['INIT_ON_STARTUP'] = '0'
+    os.environ['LAZY_ATTACH'] = '1'
+    import app as app_module
+    
+    if args.command == 'init':
+        start_time = time.time()
+        app_module.init_database()
+        print(f"Initialized {app_module.DATABASE_PATH} in {time.time() - start_time:.2f}s")
+    else:
+        snapshot(app_module, args.state or app_module.STATE_PATH)
+
+
+if __name__ == '__main__':
+    main()
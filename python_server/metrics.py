@@ -0,0 +1,162 @@
+"""
+Request metrics for the search engine
+Counters and latency histograms kept per worker and rendered in the
+Prometheus text exposition format, plus a lap timer for breaking a request
+down into stages.
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from half a millisecond to ten seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield self.name + _format_labels(self.labels, labels), value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts with a final +Inf slot, sum, count]
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def samples(self):
+        with self.lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self.series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                yield self.name + '_bucket' + _format_labels(self.labels, labels, [('le', bound)]), cumulative
+            yield self.name + '_sum' + _format_labels(self.labels, labels), total
+            yield self.name + '_count' + _format_labels(self.labels, labels), count
+
+
+class Registry:
+    """The metrics exported by one worker"""
+    
+    def __init__(self):
+        self.metrics = []
+    
+    def counter(self, name, description, labels=()):
+        metric = Counter(name, description, labels)
+        self.metrics.append(metric)
+        return metric
+    
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, description, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample, value in metric.samples():
+                lines.append(f'{sample} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Lap timer: mark(stage) charges the time since the previous mark to stage"""
+    
+    def __init__(self):
+        self.stages = {}
+        self.last = time.perf_counter()
+    
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+    
+    def observe(self, histogram):
+        """Record every stage in a histogram labelled by stage"""
+        for stage, seconds in self.stages.items():
+            histogram.observe(seconds, stage)
+    
+    def breakdown(self):
+        """Stage durations in milliseconds"""
+        return {stage: seconds * 1000 for stage, seconds in self.stages.items()}
+
+
+class NullTimer:
+    """Stand-in for StageTimer when metrics are disabled"""
+    
+    stages = {}
+    
+    def mark(self, stage):
+        pass
+    
+    def observe(self, histogram):
+        pass
+    
+    def breakdown(self):
+        return {}
+
+
+NULL_TIMER = NullTimer()
+
+
+def profile_call(function, *args, lines=30, **kwargs):
+    """Run function under cProfile, returning (result, top functions by cumulative time)"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(lines)
+    return result, output.getvalue()
@@ -0,0 +1,118 @@
+"""
+SQLite connection pool for the search engine
+Connections are opened once per worker, configured with the tuning pragmas
+and handed back to the pool by close(), so the sqlite3 statement cache of
+each connection keeps the hot queries prepared across requests.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection whose close() returns it to its pool"""
+    
+    pool = None
+    # Process that opened the connection
+    pid = None
+    
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    """Keeps up to size idle connections for reuse
+    
+    Connections are created on demand, so callers never wait; only the
+    number kept idle between requests is bounded. SQLite connections must
+    not be used across fork(): a child keeps the ones it inherited
+    referenced but never uses or closes them, since closing one could drop
+    POSIX locks its own connections hold on the same file.
+    """
+    
+    def __init__(self, path, size=8, pragmas=(), statement_cache=256):
+        self.path = path
+        self.size = size
+        self.pragmas = list(pragmas)
+        self.statement_cache = statement_cache
+        self.idle = []
+        # Connections opened by a parent process, kept so they are never closed here
+        self.inherited = []
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.created = 0
+        self.reused = 0
+    
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=self.statement_cache
+        )
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}').fetchall()
+        conn.row_factory = sqlite3.Row
+        conn.pid = os.getpid()
+        if self.size > 0:
+            conn.pool = self
+        self.created += 1
+        return conn
+    
+    def acquire(self):
+        """Take an idle connection, or open a new one"""
+        with self.lock:
+            self._after_fork()
+            if self.idle:
+                self.reused += 1
+                return self.idle.pop()
+        return self._connect()
+    
+    def _after_fork(self):
+        """Set aside the idle connections of the parent in a forked child"""
+        if self.pid != os.getpid():
+            self.inherited.extend(self.idle)
+            self.idle = []
+            self.pid = os.getpid()
+    
+    def release(self, conn):
+        """Return a connection, closing it if the pool is full"""
+        if conn.pid != os.getpid():
+            with self.lock:
+                self.inherited.append(conn)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        # Undo per-request changes such as autocommit for bulk loads
+        conn.isolation_level = ''
+        conn.row_factory = sqlite3.Row
+        with self.lock:
+            self._after_fork()
+            if len(self.idle) < self.size and conn not in self.idle:
+                self.idle.append(conn)
+                return
+        conn.pool = None
+        conn.close()
+    
+    def close_all(self):
+        """Close every idle connection opened by this process"""
+        with self.lock:
+            self._after_fork()
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+    
+    def stats(self):
+        """Pool figures for /api/stats"""
+        return {
+            'size': self.size,
+            'idle': len(self.idle),
+            'created': self.created,
+            'reused': self.reused,
+            'inherited': len(self.inherited)
+        }
@@ -0,0 +1,112 @@
+"""
+Token positions for phrase and proximity queries
+Positions are stored in inverted_index.positions as packed little-endian
+unsigned integers behind a one-byte width marker, so decoding is a single
+array copy. Rows written before the packed format still hold JSON text and
+are decoded transparently.
+"""
+
+import json
+import sys
+from array import array
+from bisect import bisect_left
+
+# Width marker byte -> array typecode
+_WIDTHS = {2: 'H', 4: 'I'}
+
+
+def encode_positions(positions):
+    """Pack a sorted list of token positions"""
+    width = 2 if not positions or positions[-1] < 65536 else 4
+    packed = array(_WIDTHS[width], positions)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return bytes([width]) + packed.tobytes()
+
+
+def decode_positions(value):
+    """Unpack positions written by encode_positions (or legacy JSON text)"""
+    if isinstance(value, str):
+        return json.loads(value)
+    packed = array(_WIDTHS[value[0]])
+    packed.frombytes(value[1:])
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed
+
+
+def intersect_sorted(a, b):
+    """Intersect two sorted sequences of document ids
+
+    Walks the shorter sequence and gallops through the longer one, so the
+    cost grows with the smaller list rather than the larger.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = []
+    lo = 0
+    n = len(b)
+    for value in a:
+        # Exponential search for the first position >= value, then bisect
+        step = 1
+        hi = lo
+        while hi < n and b[hi] < value:
+            lo = hi
+            hi += step
+            step *= 2
+        lo = bisect_left(b, value, lo, min(hi, n))
+        if lo >= n:
+            break
+        if b[lo] == value:
+            result.append(value)
+    return result
+
+
+def intersect_all(lists):
+    """Intersect several sorted sequences, smallest first"""
+    if not lists:
+        return []
+    lists = sorted(lists, key=len)
+    result = list(lists[0])
+    for other in lists[1:]:
+        if not result:
+            break
+        result = intersect_sorted(result, other)
+    return result
+
+
+def contains_phrase(word_positions):
+    """Check whether the words occur consecutively, in order
+
+    word_positions holds one position list per phrase word.
+    """
+    starts = set(word_positions[0])
+    for offset, positions in enumerate(word_positions[1:], 1):
+        starts &= {p - offset for p in positions}
+        if not starts:
+            return False
+    return True
+
+
+def min_window(word_positions):
+    """Length of the shortest span of tokens containing every word once"""
+    events = sorted((p, i) for i, positions in enumerate(word_positions) for p in positions)
+    needed = len(word_positions)
+    counts = [0] * needed
+    covered = 0
+    best = None
+    left = 0
+    for right, (position, word) in enumerate(events):
+        if counts[word] == 0:
+            covered += 1
+        counts[word] += 1
+        while covered == needed:
+            span = position - events[left][0] + 1
+            if best is None or span < best:
+                best = span
+            left_word = events[left][1]
+            counts[left_word] -= 1
+            if counts[left_word] == 0:
+                covered -= 1
+            left += 1
+    return best
@@ -0,0 +1,289 @@
+"""
+In-memory posting lists for the search engine
+Postings are loaded once from the inverted_index table and held as compact
+arrays: sorted document ids in array('I') with frequencies in a parallel
+array, plus a dense array of document lengths indexed by document id.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+
+from positions import intersect_all
+from scoring import bm25_idf, bm25_term_score, bm25_upper_bound, wand_top_k
+
+
+class ArrayPostingCursor:
+    """Walks one term's in-memory postings, with binary-search seeking"""
+    
+    def __init__(self, docs, freqs, doc_lengths, idf, upper_bound):
+        self.docs = docs
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.idf = idf
+        self.upper_bound = upper_bound
+        self.index = 0
+        self._update()
+    
+    def _update(self):
+        if self.index < len(self.docs):
+            self.doc = self.docs[self.index]
+            self.freq = self.freqs[self.index]
+            self.length = self.doc_lengths[self.doc]
+        else:
+            self.doc = None
+    
+    def next(self):
+        """Move to the next posting"""
+        self.index += 1
+        self._update()
+    
+    def advance(self, target):
+        """Move to the first posting with document_id >= target"""
+        if self.doc is None or self.doc >= target:
+            return
+        self.index = bisect_left(self.docs, target, self.index)
+        self._update()
+
+
+class PostingReader:
+    """Ranks documents over one or more layers of postings
+    
+    A layer provides entry(word) -> (doc ids, frequencies, max frequency,
+    min document length) and a doc_lengths lookup. Layers hold disjoint
+    document id ranges and share the corpus statistics of the reader.
+    """
+    
+    layers = ()
+    doc_count = 0
+    total_length = 0
+    
+    @property
+    def avg_length(self):
+        return self.total_length / self.doc_count if self.doc_count else 0
+    
+    def _entries(self, word):
+        """(layer, entry) pairs for every layer holding the word"""
+        found = []
+        for layer in self.layers:
+            entry = layer.entry(word)
+            if entry is not None:
+                found.append((layer, entry))
+        return found
+    
+    def doc_freq(self, word):
+        return sum(len(entry[0]) for _, entry in self._entries(word))
+    
+    def count_allowed(self, word, allowed):
+        """Number of documents in allowed holding word"""
+        return sum(1 for _, entry in self._entries(word) for doc_id in entry[0] if doc_id in allowed)
+    
+    def docs_with_all(self, words):
+        """Sorted ids of documents containing every word"""
+        result = []
+        for layer in self.layers:
+            lists = []
+            for word in words:
+                entry = layer.entry(word)
+                if entry is None:
+                    break
+                lists.append(entry[0])
+            else:
+                # Layers hold disjoint, increasing id ranges
+                result.extend(intersect_all(lists))
+        return result
+    
+    def rank_frequency(self, words, allowed=None):
+        """Rank documents by matched words, then total frequency"""
+        matched = {}
+        total_freq = {}
+        for word in words:
+            for _, entry in self._entries(word):
+                for doc_id, frequency in zip(entry[0], entry[1]):
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+                    total_freq[doc_id] = total_freq.get(doc_id, 0) + frequency
+        
+        ranked = sorted(matched, key=lambda d: (-matched[d], -total_freq[d], d))
+        return [
+            {'document_id': d, 'matched_words': matched[d], 'total_freq': total_freq[d],
+             'score': matched[d] * 10 + total_freq[d]}
+            for d in ranked
+        ]
+    
+    def rank_bm25(self, words, allowed=None):
+        """Rank documents by BM25"""
+        scores = {}
+        matched = {}
+        total_freq = {}
+        avg_length = self.avg_length
+        for word in words:
+            entries = self._entries(word)
+            idf = bm25_idf(self.doc_count, sum(len(entry[0]) for _, entry in entries))
+            for layer, entry in entries:
+                doc_lengths = layer.doc_lengths
+                for doc_id, frequency in zip(entry[0], entry[1]):
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    scores[doc_id] = scores.get(doc_id, 0.0) + bm25_term_score(idf, frequency, doc_lengths[doc_id], avg_length)
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+                    total_freq[doc_id] = total_freq.get(doc_id, 0) + frequency
+        
+        ranked = sorted(scores, key=lambda d: (-scores[d], d))
+        return [
+            {'document_id': d, 'matched_words': matched[d], 'total_freq': total_freq[d], 'score': scores[d]}
+            for d in ranked
+        ]
+    
+    def top_k(self, words, k, allowed=None):
+        """Find the k best BM25 documents with WAND, one pass per layer"""
+        avg_length = self.avg_length
+        layer_cursors = {id(layer): [] for layer in self.layers}
+        for word in words:
+            entries = self._entries(word)
+            if not entries:
+                continue
+            # Bounds use the term's statistics across all layers
+            idf = bm25_idf(self.doc_count, sum(len(entry[0]) for _, entry in entries))
+            max_frequency = max(entry[2] for _, entry in entries)
+            min_length = min(entry[3] for _, entry in entries)
+            upper_bound = bm25_upper_bound(idf, max_frequency, min_length, avg_length)
+            for layer, entry in entries:
+                layer_cursors[id(layer)].append(
+                    ArrayPostingCursor(entry[0], entry[1], layer.doc_lengths, idf, upper_bound)
+                )
+        
+        ranked = []
+        for cursors in layer_cursors.values():
+            ranked.extend(wand_top_k(cursors, k, avg_length, allowed))
+        return sorted(ranked, key=lambda row: (-row[1], row[0]))[:k]
+
+
+class PostingIndex(PostingReader):
+    """Inverted index held in process memory
+    
+    With a first_doc_id the index only holds documents above it, as the
+    write layer on top of an on-disk segment.
+    """
+    
+    def __init__(self, first_doc_id=0):
+        # word -> [doc ids, frequencies, max frequency, min document length]
+        self.terms = {}
+        # Dense array for a full index, dict for a small write layer
+        self.doc_lengths = {} if first_doc_id else array('I')
+        self.doc_count = 0
+        self.total_length = 0
+        self.posting_count = 0
+        self.first_doc_id = first_doc_id
+        self.last_doc_id = first_doc_id
+        self.layers = (self,)
+    
+    def load(self, conn):
+        """Load every posting from the database"""
+        self.refresh(conn)
+    
+    def refresh(self, conn):
+        """Load documents indexed since the last load or refresh
+        
+        Document ids are assigned inside the write transaction, so documents
+        become visible in id order and everything above last_doc_id is new,
+        whichever worker indexed it.
+        """
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(id) FROM documents')
+        max_id = cursor.fetchone()[0] or 0
+        if max_id <= self.last_doc_id:
+            return 0
+        
+        self._grow(max_id)
+        if self.last_doc_id:
+            cursor.execute('''
+                SELECT document_id, length FROM doc_stats
+                WHERE document_id > ? AND document_id <= ?
+            ''', (self.last_doc_id, max_id))
+        else:
+            cursor.execute('SELECT document_id, length FROM doc_stats WHERE +document_id <= ?', (max_id,))
+        for doc_id, length in cursor:
+            self.doc_lengths[doc_id] = length
+        
+        # The first load scans the table instead of walking idx_document
+        if self.last_doc_id:
+            cursor.execute('''
+                SELECT word, document_id, frequency FROM inverted_index
+                WHERE document_id > ? AND document_id <= ?
+            ''', (self.last_doc_id, max_id))
+        else:
+            cursor.execute('SELECT word, document_id, frequency FROM inverted_index WHERE +document_id <= ?', (max_id,))
+        for word, doc_id, frequency in cursor:
+            self._add_posting(word, doc_id, frequency)
+        
+        cursor.execute("SELECT key, value FROM index_meta WHERE key IN ('doc_count', 'total_length')")
+        meta = dict(cursor.fetchall())
+        self.doc_count = meta.get('doc_count', 0)
+        self.total_length = meta.get('total_length', 0)
+        
+        loaded = max_id - self.last_doc_id
+        self.last_doc_id = max_id
+        return loaded
+    
+    def _grow(self, max_id):
+        if isinstance(self.doc_lengths, array) and len(self.doc_lengths) <= max_id:
+            self.doc_lengths.extend([0] * (max_id + 1 - len(self.doc_lengths)))
+    
+    def _add_posting(self, word, doc_id, frequency):
+        entry = self.terms.get(word)
+        if entry is None:
+            entry = self.terms[word] = [array('I'), array('I'), 0, sys.maxsize]
+        docs, freqs = entry[0], entry[1]
+        if docs and docs[-1] > doc_id:
+            i = bisect_left(docs, doc_id)
+            docs.insert(i, doc_id)
+            freqs.insert(i, frequency)
+        else:
+            docs.append(doc_id)
+            freqs.append(frequency)
+        if frequency > entry[2]:
+            entry[2] = frequency
+        length = self.doc_lengths.get(doc_id, 0) if isinstance(self.doc_lengths, dict) else self.doc_lengths[doc_id]
+        if length < entry[3]:
+            entry[3] = length
+        self.posting_count += 1
+    
+    def entry(self, word):
+        return self.terms.get(word)
+    
+    def postings(self, word):
+        """Return (doc ids, frequencies) for a word, or None"""
+        entry = self.terms.get(word)
+        return (entry[0], entry[1]) if entry else None
+    
+    def maybe_merge(self, conn):
+        """Fold recent writes into longer-lived storage (nothing to do in memory)"""
+    
+    def document(self, doc_id):
+        """Documents are only stored in the database"""
+        return None
+    
+    def sorted_terms(self):
+        """Words in the byte order used by segment files"""
+        return sorted(self.terms, key=lambda word: word.encode('utf-8'))
+    
+    def memory_usage(self):
+        """Approximate resident bytes of the index structures"""
+        total = sys.getsizeof(self.terms) + sys.getsizeof(self.doc_lengths)
+        for word, entry in self.terms.items():
+            total += sys.getsizeof(word) + sys.getsizeof(entry)
+            total += sys.getsizeof(entry[0]) + sys.getsizeof(entry[1])
+        return total
+    
+    def stats(self):
+        """Size and memory figures for /api/stats"""
+        memory = self.memory_usage()
+        return {
+            'type': 'memory',
+            'terms': len(self.terms),
+            'postings': self.posting_count,
+            'memory_bytes': memory,
+            'bytes_per_million_postings': memory * 1000000 // self.posting_count if self.posting_count else 0
+        }
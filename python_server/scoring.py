@@ -0,0 +1,228 @@
+"""
+Ranking functions for the search engine
+Each scorer is a single aggregation over the postings of the query terms;
+BM25 reads its corpus statistics from tables maintained at index time.
+wand_top_k evaluates BM25 top-k queries by streaming postings instead.
+"""
+
+import heapq
+import math
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SCORERS = ('frequency', 'bm25')
+MODES = ('exhaustive', 'topk')
+
+
+def bm25_idf(doc_count, doc_freq):
+    """Inverse document frequency (BM25 variant, never negative)"""
+    return math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+# Candidate documents, bound as a JSON array of ids ahead of the other
+# parameters; their postings are looked up one (word, document) at a time
+CANDIDATES = 'candidates(document_id) AS (SELECT value FROM json_each(?))'
+
+
+def frequency_query(term_count, candidates=False):
+    """SQL ranking documents by matched terms, then total term frequency
+    
+    With candidates only the listed documents are ranked.
+    """
+    placeholders = ','.join('?' * term_count)
+    if candidates:
+        source = f'''
+        FROM candidates c
+        CROSS JOIN inverted_index ii
+        WHERE ii.word IN ({placeholders}) AND ii.document_id = c.document_id'''
+    else:
+        source = f'''
+        FROM inverted_index ii
+        WHERE ii.word IN ({placeholders})'''
+    return f'''
+        {'WITH ' + CANDIDATES if candidates else ''}
+        SELECT ii.document_id,
+               SUM(ii.frequency) as total_freq,
+               COUNT(DISTINCT ii.word) as matched_words,
+               COUNT(DISTINCT ii.word) * 10 + SUM(ii.frequency) as score{source}
+        GROUP BY ii.document_id
+        ORDER BY matched_words DESC, total_freq DESC
+    '''
+
+
+def bm25_query(term_count, candidates=False):
+    """SQL ranking documents by BM25
+    
+    Parameters are (word, idf) pairs for each term followed by the average
+    document length. With candidates only the listed documents are ranked.
+    """
+    values = ','.join(['(?, ?)'] * term_count)
+    if candidates:
+        source = '''
+        FROM candidates c
+        CROSS JOIN query_terms q
+        JOIN inverted_index ii ON ii.word = q.word AND ii.document_id = c.document_id'''
+    else:
+        source = '''
+        FROM query_terms q
+        JOIN inverted_index ii ON ii.word = q.word'''
+    return f'''
+        WITH {CANDIDATES + ',' if candidates else ''} query_terms(word, idf) AS (VALUES {values})
+        SELECT ii.document_id,
+               SUM(ii.frequency) as total_freq,
+               COUNT(*) as matched_words,
+               SUM(q.idf * ii.frequency * {BM25_K1 + 1}
+                   / (ii.frequency + {BM25_K1} * ({1 - BM25_B} + {BM25_B} * ds.length / ?))) as score{source}
+        JOIN doc_stats ds ON ds.document_id = ii.document_id
+        GROUP BY ii.document_id
+        ORDER BY score DESC, ii.document_id
+    '''
+
+
+def bm25_params(words, doc_freqs, doc_count, avg_length):
+    """Build the bind parameters for bm25_query"""
+    params = []
+    for word in words:
+        params.append(word)
+        params.append(bm25_idf(doc_count, doc_freqs.get(word, 0)))
+    params.append(avg_length or 1.0)
+    return params
+
+
+def bm25_term_score(idf, frequency, length, avg_length):
+    """BM25 contribution of one term to one document"""
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1.0))
+    return idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+
+def bm25_upper_bound(idf, max_frequency, min_length, avg_length):
+    """Largest score a term can contribute to any document
+    
+    The score grows with frequency and shrinks with document length, so the
+    term's highest frequency scored against its shortest document bounds
+    every one of its postings.
+    """
+    return bm25_term_score(idf, max_frequency, min_length, avg_length)
+
+
+class PostingCursor:
+    """Streams one term's postings in document id order, with seeking"""
+    
+    BLOCK_SIZE = 128
+    
+    def __init__(self, conn, word, idf, upper_bound):
+        self.word = word
+        self.idf = idf
+        self.upper_bound = upper_bound
+        self.cursor = conn.cursor()
+        self.block = []
+        self.index = 0
+        self.doc = None
+        self.freq = 0
+        self.length = 0
+        self._seek(0)
+    
+    def _seek(self, target):
+        """Restart the scan at the first posting with document_id >= target"""
+        self.cursor.execute('''
+            SELECT ii.document_id, ii.frequency, ds.length
+            FROM inverted_index ii
+            JOIN doc_stats ds ON ds.document_id = ii.document_id
+            WHERE ii.word = ? AND ii.document_id >= ?
+            ORDER BY ii.document_id
+        ''', (self.word, target))
+        self._load_block()
+    
+    def _load_block(self):
+        self.block = self.cursor.fetchmany(self.BLOCK_SIZE)
+        self.index = 0
+        self._update()
+    
+    def _update(self):
+        if self.index < len(self.block):
+            self.doc, self.freq, self.length = self.block[self.index]
+        else:
+            self.doc = None
+    
+    def next(self):
+        """Move to the next posting"""
+        self.index += 1
+        if self.index >= len(self.block):
+            self._load_block()
+        else:
+            self._update()
+    
+    def advance(self, target):
+        """Move to the first posting with document_id >= target"""
+        if self.doc is None or self.doc >= target:
+            return
+        if self.block[-1][0] >= target:
+            # Target is inside the current block
+            while self.block[self.index][0] < target:
+                self.index += 1
+            self._update()
+        else:
+            # Skip ahead through the index instead of reading every posting
+            self._seek(target)
+
+
+def wand_top_k(cursors, k, avg_length, allowed=None):
+    """Find the k best BM25 documents with WAND pruning
+    
+    Returns (document_id, score, matched_words, total_freq) tuples ordered by
+    score, then document id. Documents whose summed term upper bounds cannot
+    beat the current k-th score are skipped without being scored, as are
+    documents missing from allowed when it is given.
+    """
+    heap = []
+    threshold = 0.0
+    cursors = [c for c in cursors if c.doc is not None]
+    
+    while cursors:
+        cursors.sort(key=lambda c: c.doc)
+        
+        # Find the pivot: the first document that could enter the top k
+        bound = 0.0
+        pivot = None
+        for i, c in enumerate(cursors):
+            bound += c.upper_bound
+            if bound > threshold:
+                pivot = i
+                break
+        if pivot is None:
+            break
+        
+        pivot_doc = cursors[pivot].doc
+        if allowed is not None and pivot_doc not in allowed:
+            for c in cursors:
+                if c.doc <= pivot_doc:
+                    c.advance(pivot_doc + 1)
+        elif cursors[0].doc == pivot_doc:
+            score = 0.0
+            matched = 0
+            total_freq = 0
+            for c in cursors:
+                if c.doc != pivot_doc:
+                    break
+                score += bm25_term_score(c.idf, c.freq, c.length, avg_length)
+                matched += 1
+                total_freq += c.freq
+                c.next()
+            
+            entry = (score, -pivot_doc, matched, total_freq)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            if len(heap) == k:
+                threshold = heap[0][0]
+        else:
+            for c in cursors[:pivot]:
+                c.advance(pivot_doc)
+        
+        cursors = [c for c in cursors if c.doc is not None]
+    
+    ranked = sorted(heap, reverse=True)
+    return [(-neg_doc, score, matched, total_freq) for score, neg_doc, matched, total_freq in ranked]
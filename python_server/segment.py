@@ -0,0 +1,465 @@
+"""
+Memory-mapped index segments for the search engine
+A segment is an immutable file holding a sorted term dictionary, the
+postings of every term and a document store. Workers open it with mmap, so
+all processes share one copy through the page cache and postings are read
+in place without copying. Documents indexed after the segment was written
+live in an in-memory PostingIndex layer until the next merge.
+
+File layout (native byte order, sections aligned to 8 bytes):
+    
+    header        magic, format version, counts and section offsets
+    term_blob     UTF-8 terms, concatenated in byte order
+    term_offsets  Q[term_count + 1]   start of each term in term_blob
+    term_starts   Q[term_count + 1]   start of each term's postings
+    max_freqs     I[term_count]       highest frequency of each term
+    min_lengths   I[term_count]       shortest document holding each term
+    docs          I[posting_count]    document ids, sorted per term
+    freqs         I[posting_count]    frequencies, parallel to docs
+    doc_lengths   I[max_doc_id + 1]   token count of each document
+    doc_offsets   Q[max_doc_id + 2]   start of each document in doc_store
+    doc_store     JSON [title, content, url, category] per document
+
+Usage:
+    python python_server/segment.py [--db PATH] [--segment PATH]
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from postings import PostingIndex, PostingReader
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGIC = b'SEGM'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<4sI16Q')
+HEADER_FIELDS = (
+    'term_count', 'posting_count', 'max_doc_id', 'doc_count', 'total_length',
+    'term_blob', 'term_blob_size', 'term_offsets', 'term_starts', 'max_freqs',
+    'min_lengths', 'docs', 'freqs', 'doc_lengths', 'doc_offsets', 'doc_store'
+)
+
+
+def _pad(f):
+    """Align the file position to 8 bytes"""
+    padding = -f.tell() % 8
+    if padding:
+        f.write(b'\0' * padding)
+    return f.tell()
+
+
+def write_segment(path, terms, documents, doc_lengths, doc_count, total_length):
+    """Write a segment file atomically
+    
+    terms yields (word, doc ids, frequencies, max frequency, min length) in
+    UTF-8 byte order; documents yields (doc_id, encoded record) in id order;
+    doc_lengths is indexable by document id up to the largest one.
+    """
+    tmp_path = path + '.tmp'
+    header = dict.fromkeys(HEADER_FIELDS, 0)
+    term_blob = bytearray()
+    term_offsets = array('Q', [0])
+    term_starts = array('Q', [0])
+    max_freqs = array('I')
+    min_lengths = array('I')
+    
+    with open(tmp_path + '.freqs', 'w+b') as freqs_file, open(tmp_path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        
+        # Doc ids go straight to the segment, frequencies to a side file
+        header['docs'] = _pad(f)
+        for word, docs, freqs, max_frequency, min_length in terms:
+            f.write(bytes(docs))
+            freqs_file.write(bytes(freqs))
+            term_blob += word.encode('utf-8')
+            term_offsets.append(len(term_blob))
+            term_starts.append(term_starts[-1] + len(docs))
+            max_freqs.append(max_frequency)
+            min_lengths.append(min_length)
+        header['term_count'] = len(max_freqs)
+        header['posting_count'] = term_starts[-1]
+        
+        header['freqs'] = _pad(f)
+        freqs_file.seek(0)
+        while True:
+            chunk = freqs_file.read(1 << 20)
+            if not chunk:
+                break
+            f.write(chunk)
+        
+        header['term_blob'] = _pad(f)
+        header['term_blob_size'] = len(term_blob)
+        f.write(term_blob)
+        for name, values in (('term_offsets', term_offsets), ('term_starts', term_starts),
+                             ('max_freqs', max_freqs), ('min_lengths', min_lengths)):
+            header[name] = _pad(f)
+            values.tofile(f)
+        
+        # Document store, with an offset table indexed by document id
+        header['doc_store'] = _pad(f)
+        doc_offsets = array('Q')
+        position = 0
+        for doc_id, record in documents:
+            while len(doc_offsets) <= doc_id:
+                doc_offsets.append(position)
+            f.write(record)
+            position += len(record)
+        if not doc_offsets:
+            doc_offsets.append(0)
+        max_doc_id = len(doc_offsets) - 1
+        doc_offsets.append(position)
+        
+        header['doc_offsets'] = _pad(f)
+        doc_offsets.tofile(f)
+        header['doc_lengths'] = _pad(f)
+        array('I', (doc_lengths[i] if i < len(doc_lengths) else 0 for i in range(max_doc_id + 1))).tofile(f)
+        
+        header['max_doc_id'] = max_doc_id
+        header['doc_count'] = doc_count
+        header['total_length'] = total_length
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, *(header[name] for name in HEADER_FIELDS)))
+        f.flush()
+        os.fsync(f.fileno())
+    
+    os.remove(tmp_path + '.freqs')
+    os.replace(tmp_path, path)
+
+
+def encode_document(title, content, url, category):
+    """Encode a document record for the segment doc store"""
+    return json.dumps([title, content, url, category]).encode('utf-8')
+
+
+class Segment:
+    """Read-only view of a segment file"""
+    
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, *values = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a segment file')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'{path} has segment format {version}, expected {FORMAT_VERSION}')
+        header = dict(zip(HEADER_FIELDS, values))
+        
+        self.term_count = header['term_count']
+        self.posting_count = header['posting_count']
+        self.max_doc_id = header['max_doc_id']
+        self.doc_count = header['doc_count']
+        self.total_length = header['total_length']
+        
+        view = memoryview(self.mm)
+        self.term_blob = view[header['term_blob']:header['term_blob'] + header['term_blob_size']]
+        self.term_offsets = self._array(view, header['term_offsets'], 'Q', self.term_count + 1)
+        self.term_starts = self._array(view, header['term_starts'], 'Q', self.term_count + 1)
+        self.max_freqs = self._array(view, header['max_freqs'], 'I', self.term_count)
+        self.min_lengths = self._array(view, header['min_lengths'], 'I', self.term_count)
+        self.docs = self._array(view, header['docs'], 'I', self.posting_count)
+        self.freqs = self._array(view, header['freqs'], 'I', self.posting_count)
+        self.doc_lengths = self._array(view, header['doc_lengths'], 'I', self.max_doc_id + 1)
+        self.doc_offsets = self._array(view, header['doc_offsets'], 'Q', self.max_doc_id + 2)
+        self.doc_store = view[header['doc_store']:]
+    
+    @staticmethod
+    def _array(view, offset, typecode, count):
+        itemsize = array(typecode).itemsize
+        return view[offset:offset + itemsize * count].cast(typecode)
+    
+    def term(self, i):
+        return bytes(self.term_blob[self.term_offsets[i]:self.term_offsets[i + 1]])
+    
+    def find(self, word):
+        """Binary search the term dictionary, returning the term number or -1"""
+        key = word.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.term_count and self.term(lo) == key else -1
+    
+    def entry(self, word):
+        """Postings and bounds of a word, as views into the mapped file"""
+        i = self.find(word)
+        if i < 0:
+            return None
+        start, end = self.term_starts[i], self.term_starts[i + 1]
+        return (self.docs[start:end], self.freqs[start:end], self.max_freqs[i], self.min_lengths[i])
+    
+    def terms(self):
+        """Iterate (word, doc ids, frequencies, max frequency, min length) in order"""
+        for i in range(self.term_count):
+            start, end = self.term_starts[i], self.term_starts[i + 1]
+            yield (self.term(i).decode('utf-8'), self.docs[start:end], self.freqs[start:end],
+                   self.max_freqs[i], self.min_lengths[i])
+    
+    def document_record(self, doc_id):
+        """Raw encoded record of a document, or None"""
+        if doc_id > self.max_doc_id:
+            return None
+        start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        return self.doc_store[start:end] if end > start else None
+    
+    def document(self, doc_id):
+        """Decode a document from the doc store, or None"""
+        record = self.document_record(doc_id)
+        if record is None:
+            return None
+        title, content, url, category = json.loads(bytes(record))
+        return {'id': doc_id, 'title': title, 'content': content, 'url': url, 'category': category}
+    
+    def documents(self):
+        """Iterate (doc_id, encoded record) for every stored document"""
+        for doc_id in range(self.max_doc_id + 1):
+            record = self.document_record(doc_id)
+            if record is not None:
+                yield doc_id, record
+
+
+def _merge_terms(segment, delta):
+    """Merge segment and write-layer terms into one sorted stream"""
+    base = segment.terms() if segment else iter(())
+    added = iter(delta.sorted_terms())
+    current = next(base, None)
+    word = next(added, None)
+    
+    while current is not None or word is not None:
+        if word is None or (current is not None and current[0].encode('utf-8') < word.encode('utf-8')):
+            yield current
+            current = next(base, None)
+            continue
+        
+        docs, freqs, max_frequency, min_length = delta.terms[word]
+        if current is not None and current[0] == word:
+            # Delta documents all sort after the segment's
+            merged_docs = array('I')
+            merged_docs.frombytes(current[1].cast('B'))
+            merged_freqs = array('I')
+            merged_freqs.frombytes(current[2].cast('B'))
+            docs = merged_docs + docs
+            freqs = merged_freqs + freqs
+            max_frequency = max(max_frequency, current[3])
+            min_length = min(min_length, current[4])
+            current = next(base, None)
+        yield word, docs, freqs, max_frequency, min_length
+        word = next(added, None)
+
+
+def _delta_documents(conn, after_id, through_id):
+    """Read documents in an id range from the database, in id order"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, title, content, url, category FROM documents
+        WHERE id > ? AND id <= ? ORDER BY id
+    ''', (after_id, through_id))
+    for doc_id, title, content, url, category in cursor:
+        yield doc_id, encode_document(title, content, url, category)
+
+
+class SegmentIndex(PostingReader):
+    """A mapped segment plus an in-memory layer for newer documents
+    
+    connect opens a database connection for merges run in the background.
+    """
+    
+    def __init__(self, path, merge_docs, connect=None):
+        self.path = path
+        self.merge_docs = merge_docs
+        self.connect = connect
+        self.segment = None
+        self.delta = None
+        self.merging = False
+        self.merges = 0
+    
+    def open(self, conn):
+        """Map the segment file (writing it first if missing) and load newer documents"""
+        while not os.path.exists(self.path):
+            if not self.merge(conn):
+                # Another process is writing the first segment
+                self._wait_for_writer()
+        self._attach(Segment(self.path))
+        self.delta.refresh(conn)
+    
+    def _attach(self, segment):
+        self.segment = segment
+        self.delta = PostingIndex(first_doc_id=segment.max_doc_id)
+        self.delta.doc_count = segment.doc_count
+        self.delta.total_length = segment.total_length
+        self.layers = (segment, self.delta)
+    
+    @property
+    def doc_count(self):
+        return self.delta.doc_count
+    
+    @property
+    def total_length(self):
+        return self.delta.total_length
+    
+    def refresh(self, conn):
+        """Pick up a newer segment written by another worker, then newer documents"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = self.segment.inode
+        if inode != self.segment.inode:
+            self._attach(Segment(self.path))
+        return self.delta.refresh(conn)
+    
+    def maybe_merge(self, conn):
+        """Start merging the write layer into a new segment once it grows large
+        
+        The merge rewrites every posting and document, so it runs in a
+        background thread; searches and writes carry on with the current
+        segment and switch over on the refresh after it is written.
+        """
+        if self.merging or self.delta.last_doc_id - self.delta.first_doc_id < self.merge_docs:
+            return None
+        self.merging = True
+        thread = threading.Thread(target=self._merge_in_background)
+        thread.start()
+        return thread
+    
+    def _merge_in_background(self):
+        try:
+            conn = self.connect()
+            try:
+                self._write(conn)
+            finally:
+                conn.close()
+        finally:
+            self.merging = False
+    
+    def merge(self, conn):
+        """Write a new segment holding every indexed document and switch to it"""
+        if not self._write(conn):
+            return False
+        if self.segment is not None:
+            self.refresh(conn)
+        return True
+    
+    def _write(self, conn):
+        """Write a new segment from the current one and the newer documents
+        
+        Only one process merges at a time; the others keep serving from their
+        current segment and switch over on their next refresh.
+        """
+        lock_file = open(self.path + '.lock', 'w')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            
+            if self.segment is None:
+                segment = Segment(self.path) if os.path.exists(self.path) else None
+            else:
+                segment = self.segment
+            delta = PostingIndex(first_doc_id=segment.max_doc_id if segment else 0)
+            delta.refresh(conn)
+            
+            documents = segment.documents() if segment else iter(())
+            doc_lengths = _LayeredLengths(segment, delta)
+            write_segment(
+                self.path,
+                _merge_terms(segment, delta),
+                _chain(documents, _delta_documents(conn, delta.first_doc_id, delta.last_doc_id)),
+                doc_lengths,
+                delta.doc_count,
+                delta.total_length
+            )
+        finally:
+            lock_file.close()
+        self.merges += 1
+        return True
+    
+    def _wait_for_writer(self):
+        """Block until the process holding the merge lock has released it"""
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+    
+    def document(self, doc_id):
+        """Read a document from the segment doc store, or None if it is newer"""
+        return self.segment.document(doc_id)
+    
+    def stats(self):
+        """Size figures for /api/stats"""
+        return {
+            'type': 'segment',
+            'path': self.path,
+            'format_version': FORMAT_VERSION,
+            'segment_terms': self.segment.term_count,
+            'segment_postings': self.segment.posting_count,
+            'segment_bytes': len(self.segment.mm),
+            'delta_documents': self.delta.last_doc_id - self.delta.first_doc_id,
+            'delta_postings': self.delta.posting_count,
+            'delta_memory_bytes': self.delta.memory_usage(),
+            'merging': self.merging,
+            'merges': self.merges
+        }
+
+
+class _LayeredLengths:
+    """Document lengths across a segment and its write layer"""
+    
+    def __init__(self, segment, delta):
+        self.segment = segment
+        self.delta = delta
+    
+    def __len__(self):
+        return self.delta.last_doc_id + 1
+    
+    def __getitem__(self, doc_id):
+        if self.segment is not None and doc_id <= self.segment.max_doc_id:
+            return self.segment.doc_lengths[doc_id]
+        if isinstance(self.delta.doc_lengths, dict):
+            return self.delta.doc_lengths.get(doc_id, 0)
+        return self.delta.doc_lengths[doc_id]
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+def main():
+    import argparse
+    import sqlite3
+    
+    parser = argparse.ArgumentParser(description='Write an index segment from the search database')
+    parser.add_argument('--db', default=os.environ.get('SEARCH_DB_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'search_index.db')))
+    parser.add_argument('--segment', help='Segment path (defaults to the database path with .seg)')
+    args = parser.parse_args()
+    
+    path = args.segment or os.path.splitext(args.db)[0] + '.seg'
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(args.db)
+    index = SegmentIndex(path, merge_docs=0)
+    index.merge(conn)
+    conn.close()
+    
+    segment = Segment(path)
+    print(f"Wrote {path}: {segment.term_count} terms, {segment.posting_count} postings, "
+          f"{segment.max_doc_id} max doc id, {len(segment.mm) / 1048576:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
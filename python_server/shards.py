@@ -0,0 +1,133 @@
+"""
+Sharded storage for the search engine
+Documents and their postings are partitioned across N SQLite databases by
+document id (a document lives in shard id % N), while the main database
+becomes a catalog that hands out document ids. Work for every shard is
+scattered to a process pool whose workers keep their own connections to
+each shard, and the per-shard results are gathered back in shard order.
+"""
+
+import heapq
+import multiprocessing
+import os
+import threading
+from itertools import islice
+
+from pool import ConnectionPool
+
+
+def shard_paths(path, count):
+    """Database file of each shard, next to the catalog database"""
+    base, ext = os.path.splitext(path)
+    return [f'{base}.shard{shard}{ext or ".db"}' for shard in range(count)]
+
+
+def merge_top_k(shard_rows, k, key):
+    """The k best rows of per-shard lists already sorted by key"""
+    return list(islice(heapq.merge(*shard_rows, key=key), k))
+
+
+class ShardSet:
+    """Connections to every shard and the process pool searching them
+    
+    With workers > 1 scatter() runs one task per shard in a process pool,
+    started on first use and again after a fork; otherwise the tasks run
+    one after another in the calling process.
+    """
+    
+    def __init__(self, paths, workers=None, pool_size=8, pragmas=()):
+        self.paths = list(paths)
+        self.workers = len(self.paths) if workers is None else workers
+        self.pool_size = pool_size
+        self.pragmas = list(pragmas)
+        self.pools = [ConnectionPool(path, pool_size, pragmas) for path in self.paths]
+        self.process_pool = None
+        self.pid = None
+        self.lock = threading.Lock()
+    
+    @property
+    def count(self):
+        return len(self.paths)
+    
+    def shard_of(self, doc_id):
+        return doc_id % len(self.paths)
+    
+    def connect(self, shard):
+        """A pooled connection to one shard (close() returns it)"""
+        return self.pools[shard].acquire()
+    
+    def group(self, doc_ids):
+        """Split document ids into one list per shard"""
+        groups = [[] for _ in self.paths]
+        for doc_id in doc_ids:
+            groups[doc_id % len(self.paths)].append(doc_id)
+        return groups
+    
+    def _pool(self):
+        with self.lock:
+            if self.process_pool is None or self.pid != os.getpid():
+                self.process_pool = multiprocessing.Pool(
+                    self.workers, initializer=_init_worker, initargs=(self.paths, self.pool_size, self.pragmas)
+                )
+                self.pid = os.getpid()
+            return self.process_pool
+    
+    def scatter_async(self, function, shard_args):
+        """Start function(conn, *args) for each shard with args; .get() the results"""
+        tasks = [(function, shard, args) for shard, args in enumerate(shard_args) if args is not None]
+        if self.workers > 1:
+            return self._pool().starmap_async(_run_on_shard, tasks)
+        return _Done([self._run(function, shard, args) for function, shard, args in tasks])
+    
+    def scatter(self, function, shard_args):
+        """Run function(conn, *args) on every shard whose args are not None
+        
+        Results come back in shard order, skipping shards without args.
+        """
+        return self.scatter_async(function, shard_args).get()
+    
+    def _run(self, function, shard, args):
+        conn = self.connect(shard)
+        try:
+            return function(conn, *args)
+        finally:
+            conn.close()
+    
+    def close(self):
+        if self.process_pool is not None and self.pid == os.getpid():
+            self.process_pool.close()
+            self.process_pool.join()
+        self.process_pool = None
+        for pool in self.pools:
+            pool.close_all()
+    
+    def stats(self):
+        """Shard figures for /api/stats"""
+        return {
+            'count': len(self.paths),
+            'workers': self.workers,
+            'pools': [pool.stats() for pool in self.pools]
+        }
+
+
+class _Done:
+    """Already computed results with the AsyncResult interface"""
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def get(self):
+        return self.value
+
+
+# The shards of a pool worker process
+_worker_shards = None
+
+
+def _init_worker(paths, pool_size, pragmas):
+    global _worker_shards
+    _worker_shards = ShardSet(paths, workers=1, pool_size=pool_size, pragmas=pragmas)
+
+
+def _run_on_shard(function, shard, args):
+    return _worker_shards._run(function, shard, args)
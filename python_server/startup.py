@@ -0,0 +1,67 @@
+"""
+Fast worker startup for the search engine
+A state file holds what a worker would otherwise read from the database
+on first use, the term dictionary and the category bitsets, and with the
+memory engine every posting, as they were at one index generation.
+`python python_server/manage.py snapshot` writes it once; workers restore
+it and catch up on the documents indexed since. The structures are held
+in large arrays, so when a gunicorn --preload master restores it before
+forking, its workers share the pages copy-on-write. The file is pickled:
+like the database next to it, it must come from a trusted writer.
+"""
+
+import os
+import pickle
+import time
+
+FORMAT_VERSION = 1
+
+
+def write_state(path, state):
+    """Write state atomically, replacing any previous state file"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(dict(state, format_version=FORMAT_VERSION), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+def read_state(path):
+    """The state written at path, or None if there is none in this format"""
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    if state.get('format_version') != FORMAT_VERSION:
+        return None
+    return state
+
+
+class StartupTimes:
+    """Seconds from the start of a worker to each step of its startup
+    
+    first_query is the time to the first answered search, whatever the
+    steps before it cost and whenever they ran.
+    """
+    
+    def __init__(self, started_at):
+        self.started_at = started_at
+        self.steps = {}
+        self.state = None
+        self.first_query_seconds = None
+    
+    def mark(self, step, start_time):
+        """Record how long step took, having started at start_time"""
+        self.steps[step] = time.time() - start_time
+    
+    def first_query(self):
+        if self.first_query_seconds is None:
+            self.first_query_seconds = time.time() - self.started_at
+    
+    def stats(self):
+        """Startup figures for /api/stats"""
+        return {
+            'steps_seconds': dict(self.steps),
+            'state': self.state,
+            'first_query_seconds': self.first_query_seconds
+        }
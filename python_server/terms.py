@@ -0,0 +1,299 @@
+"""
+In-memory term dictionary for suggestions and fuzzy matching
+The distinct index terms are held in sorted order as one string with an
+array of offsets, next to an array of document frequencies. The sorted
+order makes the dictionary an implicit trie: the terms sharing a prefix
+are one contiguous range found by binary search. Prefix completions are
+ranked by document frequency, with the best completions of large ranges
+computed when the dictionary is built. Fuzzy lookup runs a Levenshtein
+automaton over that trie, skipping every range whose prefix is already
+too many edits away.
+"""
+
+import heapq
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+# Sorts after every character that can follow a prefix
+PREFIX_END = '\U0010ffff'
+
+
+def auto_edits(word):
+    """Edits allowed for a word of this length: none, one or two"""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+class TermDictionary:
+    """Sorted terms with their document frequencies
+    
+    terms is an iterable of (term, doc_freq) in term order, as read with
+    ORDER BY word. Ranges holding more than range_limit terms keep their
+    max_completions best completions, so no prefix scans more terms than
+    that when it is completed.
+    """
+    
+    def __init__(self, terms, max_completions=20, range_limit=2048):
+        pieces = []
+        self.offsets = array('I', [0])
+        self.doc_freqs = array('I')
+        end = 0
+        for term, doc_freq in terms:
+            pieces.append(term)
+            end += len(term)
+            self.offsets.append(end)
+            self.doc_freqs.append(doc_freq)
+        self.text = ''.join(pieces)
+        self.max_completions = max_completions
+        self.range_limit = range_limit
+        # prefix -> indexes of its best completions, for prefixes of large ranges
+        self.completions = {}
+        self._rank_ranges('', 0, len(self))
+    
+    def __len__(self):
+        return len(self.doc_freqs)
+    
+    def __getitem__(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+    
+    def _best(self, lo, hi, count):
+        return heapq.nlargest(count, range(lo, hi), key=self.doc_freqs.__getitem__)
+    
+    def _rank_ranges(self, prefix, lo, hi):
+        """Store the best completions of prefix and of its large sub-ranges"""
+        if hi - lo <= self.range_limit:
+            return
+        self.completions[prefix] = self._best(lo, hi, self.max_completions)
+        depth = len(prefix) + 1
+        i = lo
+        while i < hi:
+            term = self[i]
+            if len(term) < depth:
+                i += 1
+                continue
+            child = term[:depth]
+            end = bisect_left(self, child + PREFIX_END, i, hi)
+            self._rank_ranges(child, i, end)
+            i = end
+    
+    def prefix_range(self, prefix):
+        """Indexes [lo, hi) of the terms starting with prefix"""
+        lo = bisect_left(self, prefix)
+        return lo, bisect_left(self, prefix + PREFIX_END, lo)
+    
+    def doc_freq(self, term):
+        i = bisect_left(self, term)
+        return self.doc_freqs[i] if i < len(self) and self[i] == term else 0
+    
+    def complete(self, prefix, limit=10):
+        """Up to limit (term, doc_freq) starting with prefix, most frequent first"""
+        lo, hi = self.prefix_range(prefix)
+        if hi - lo > self.range_limit and limit <= self.max_completions:
+            best = self.completions[prefix][:limit]
+        else:
+            best = self._best(lo, hi, limit)
+        return [(self[i], self.doc_freqs[i]) for i in best]
+    
+    def fuzzy(self, word, max_edits=None, limit=10, prefix_length=0):
+        """Up to limit (term, doc_freq, edits) within max_edits of word
+        
+        Edits are insertions, deletions, substitutions and transpositions of
+        adjacent characters. Closer terms come first, then more frequent
+        ones. The first prefix_length characters must match exactly.
+        """
+        if max_edits is None:
+            max_edits = auto_edits(word)
+        lo, hi = self.prefix_range(word[:prefix_length])
+        # Closer terms always rank first, so a wider search, which visits
+        # far more of the dictionary, only runs when the narrower one
+        # found too few
+        for edits in range(min(max_edits, 1), max_edits + 1):
+            found = self._walk(LevenshteinAutomaton(word, edits), lo, hi)
+            if len(found) >= limit:
+                break
+        found.sort()
+        return [(self[i], -neg_freq, edits) for edits, neg_freq, i in found[:limit]]
+    
+    def _walk(self, automaton, lo, hi):
+        """(edits, -doc_freq, index) of the terms in [lo, hi) the automaton accepts"""
+        text = self.text
+        offsets = self.offsets
+        doc_freqs = self.doc_freqs
+        transitions = automaton.transitions
+        distances = automaton.distances
+        max_edits = automaton.max_edits
+        # states[d] is the automaton state after the first d characters of path
+        states = [0]
+        path = ''
+        found = []
+        i = lo
+        while i < hi:
+            term = text[offsets[i]:offsets[i + 1]]
+            # Terms share their prefix with the previous one; so do the states
+            shared = 0
+            for a, b in zip(path, term):
+                if a != b:
+                    break
+                shared += 1
+            del states[shared + 1:]
+            state = states[shared]
+            depth = shared
+            while depth < len(term):
+                char = term[depth]
+                state = transitions.get((state, char))
+                if state is None:
+                    state = automaton.add(states[depth], char)
+                if state < 0:
+                    break
+                states.append(state)
+                depth += 1
+            path = term[:depth]
+            if state >= 0:
+                if distances[state] <= max_edits:
+                    found.append((distances[state], -doc_freqs[i], i))
+                i += 1
+                continue
+            
+            # No term under this prefix can come back within max_edits.
+            # Galloping to the end of its range beats bisecting the whole
+            # rest, since most skipped ranges are small
+            key = term[:depth + 1] + PREFIX_END
+            step = 1
+            probe = i + 1
+            while probe < hi and text[offsets[probe]:offsets[probe + 1]] < key:
+                i = probe
+                step *= 2
+                probe = i + step
+            i = bisect_left(self, key, i + 1, min(probe, hi))
+        return found
+    
+    def memory_usage(self):
+        """Approximate bytes held by the dictionary"""
+        completions = sum(sys.getsizeof(best) + 28 * len(best) for best in self.completions.values())
+        return sys.getsizeof(self.text) + self.offsets.itemsize * len(self.offsets) + \
+            self.doc_freqs.itemsize * len(self.doc_freqs) + sys.getsizeof(self.completions) + completions
+    
+    def stats(self):
+        """Size and memory figures for /api/stats"""
+        return {
+            'terms': len(self),
+            'ranked_prefixes': len(self.completions),
+            'memory_bytes': self.memory_usage()
+        }
+
+
+class LevenshteinAutomaton:
+    """Deterministic automaton accepting the strings within max_edits of word
+    
+    A state is a row of the edit distance table between word's prefixes and
+    the input read so far, with values capped at max_edits + 1, plus the
+    previous row and character when a transposition could still use them.
+    States are numbered and their transitions, in transitions, are built
+    by add() as they are first taken, so a search only pays for the part of
+    the automaton it visits. -1 is the dead state, from which nothing is
+    accepted.
+    """
+    
+    def __init__(self, word, max_edits):
+        self.word = word
+        self.max_edits = max_edits
+        self.letters = frozenset(word)
+        start = tuple(min(j, max_edits + 1) for j in range(len(word) + 1))
+        self.states = [(start, None, None)]
+        self.numbers = {self.states[0]: 0}
+        # Edits between word and the input that led to each state
+        self.distances = [start[-1]]
+        self.transitions = {}
+    
+    def add(self, state, char):
+        """Build and record the transition from state on char"""
+        target = self.transitions[(state, char)] = self._next(state, char)
+        return target
+    
+    def _next(self, state, char):
+        word = self.word
+        cap = self.max_edits + 1
+        row, previous_row, previous_char = self.states[state]
+        new_row = [min(row[0] + 1, cap)]
+        for j in range(1, len(word) + 1):
+            cost = min(row[j - 1] + (word[j - 1] != char), row[j] + 1, new_row[j - 1] + 1)
+            if previous_char is not None and j > 1 and word[j - 1] == previous_char and word[j - 2] == char:
+                cost = min(cost, previous_row[j - 2] + 1)
+            new_row.append(min(cost, cap))
+        if min(new_row) == cap:
+            return -1
+        # Only a character of word can take part in a transposition
+        target = (tuple(new_row), row, char) if char in self.letters else (tuple(new_row), None, None)
+        number = self.numbers.get(target)
+        if number is None:
+            number = self.numbers[target] = len(self.states)
+            self.states.append(target)
+            self.distances.append(new_row[-1])
+        return number
+
+
+class LiveTermDictionary:
+    """A TermDictionary kept in step with a changing index
+    
+    load() reads a new dictionary. get(generation) builds the first one
+    when it is needed; after the index generation changes, the next get()
+    at least refresh_seconds after the last build starts a background
+    rebuild and keeps answering from the old dictionary meanwhile. New
+    terms show up about refresh_seconds late, but no request ever waits
+    for a large vocabulary to be read again.
+    """
+    
+    def __init__(self, load, refresh_seconds=30):
+        self.load = load
+        self.refresh_seconds = refresh_seconds
+        self.dictionary = None
+        self.generation = None
+        self.built_at = 0
+        self.builds = 0
+        self.build_seconds = 0
+        self.rebuilding = False
+        self.lock = threading.Lock()
+    
+    def get(self, generation):
+        with self.lock:
+            if self.dictionary is None:
+                self._build(generation)
+            elif generation != self.generation and not self.rebuilding and \
+                    time.monotonic() - self.built_at >= self.refresh_seconds:
+                self.rebuilding = True
+                threading.Thread(target=self._rebuild, args=(generation,), daemon=True).start()
+            return self.dictionary
+    
+    def restore(self, dictionary, generation):
+        """Start from a dictionary built elsewhere at generation
+        
+        The first get() at a later generation rebuilds it right away.
+        """
+        with self.lock:
+            self.dictionary, self.generation = dictionary, generation
+            self.built_at = float('-inf')
+    
+    def _build(self, generation):
+        """Load a dictionary and make it the current one"""
+        start_time = time.monotonic()
+        dictionary = self.load()
+        self.dictionary, self.generation = dictionary, generation
+        self.built_at = time.monotonic()
+        self.builds += 1
+        self.build_seconds = self.built_at - start_time
+    
+    def _rebuild(self, generation):
+        try:
+            self._build(generation)
+        finally:
+            self.rebuilding = False
+    
+    def stats(self):
+        """Dictionary figures for /api/stats"""
+        stats = self.dictionary.stats() if self.dictionary is not None else {'terms': None}
+        stats.update(generation=self.generation, builds=self.builds, build_seconds=self.build_seconds)
+        return stats
@@ -0,0 +1,9 @@
+"""
+Tests for the search engine
+support points the app at a temporary directory before it is imported
+and builds small random indexes through the app's own indexing path.
+
+Usage:
+    python -m pytest python_server/tests
+    python -m unittest discover -s python_server/tests -t python_server
+"""
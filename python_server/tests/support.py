@@ -0,0 +1,74 @@
+"""
+Shared setup for the tests
+The app reads its configuration when it is imported, so this module sets
+it first; every test module imports app from here.
+"""
+
+import atexit
+import functools
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+
+from benchmarks.corpus import CATEGORIES, make_word, zipf_cum_weights
+
+TEMP_DIR = tempfile.mkdtemp(prefix='search-tests-')
+atexit.register(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+
+os.environ.update(
+    SEARCH_DB_PATH=os.path.join(TEMP_DIR, 'search_index.db'),
+    INIT_ON_STARTUP='0',
+    LAZY_ATTACH='1',
+    INDEX_ENGINE='sqlite',
+    SHARD_COUNT='1',
+    RESULT_CACHE_SIZE='0',
+    METRICS_ENABLED='0'
+)
+import app  # noqa: E402
+
+# Non-ASCII words check that terms keep the byte order segments use
+VOCABULARY = [make_word(rank) for rank in range(60)] + ['café', 'naïve', 'zoë', 'über']
+
+
+def random_documents(seed, count):
+    """count documents of Zipfian words from VOCABULARY"""
+    rng = random.Random(seed)
+    cum_weights = zipf_cum_weights(len(VOCABULARY), 1.0)
+    for i in range(count):
+        words = rng.choices(VOCABULARY, cum_weights=cum_weights, k=rng.randint(1, 40))
+        yield {
+            'title': ' '.join(rng.choices(VOCABULARY, k=3)),
+            'content': ' '.join(words),
+            'url': f'https://example.com/{seed}/{i}',
+            'category': rng.choice(CATEGORIES)
+        }
+
+
+def connect(name):
+    """A connection to a database in the temporary directory, configured as the app's are"""
+    conn = sqlite3.connect(os.path.join(TEMP_DIR, name + '.db'), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma, value in app.SQLITE_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma} = {value}').fetchall()
+    return conn
+
+
+def make_database(name, documents):
+    """A new database holding documents, indexed by the app"""
+    conn = connect(name)
+    app.create_schema(conn)
+    add_documents(conn, documents)
+    return conn
+
+
+@functools.lru_cache(maxsize=None)
+def app_database():
+    """The database the app searches, filled with random documents on first use"""
+    return make_database('search_index', random_documents(0, 400))
+
+
+def add_documents(conn, documents):
+    for doc in documents:
+        app.store_document(conn, doc)
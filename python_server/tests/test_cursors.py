@@ -0,0 +1,137 @@
+"""
+Cursor tokens, snapshot resumption and cursor walks against page walks
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.support import VOCABULARY, app, app_database
+from cursors import Cursor, CursorError, Snapshot, SnapshotStore, decode_cursor, encode_cursor
+
+# Option sets of /api/search, each walked with several queries
+SEARCHES = [
+    {'scorer': 'bm25'},
+    {'scorer': 'bm25', 'mode': 'topk'},
+    {'scorer': 'bm25', 'proximity': True},
+    {'scorer': 'bm25', 'mode': 'topk', 'proximity': True},
+    {'scorer': 'bm25', 'category': 'Programming'},
+    {'scorer': 'bm25', 'mode': 'topk', 'category': ['Design', 'Mobile']},
+    {'scorer': 'frequency'},
+]
+QUERIES = [
+    f'{VOCABULARY[0]} {VOCABULARY[5]}',
+    f'{VOCABULARY[2]}',
+    f'"{VOCABULARY[0]} {VOCABULARY[1]}" {VOCABULARY[3]}',
+]
+
+
+class CursorTokenTest(unittest.TestCase):
+    
+    def test_round_trip(self):
+        cursor = Cursor('snapshot', 20, 3.25, 417)
+        self.assertEqual(decode_cursor(encode_cursor(cursor, 1234), 1234), cursor)
+    
+    def test_rejected(self):
+        token = encode_cursor(Cursor('snapshot', 20, 3.25, 417), 1234)
+        with self.assertRaises(CursorError):
+            decode_cursor(token, 4321)
+        with self.assertRaises(CursorError):
+            decode_cursor('garbage', 1234)
+        with self.assertRaises(CursorError):
+            decode_cursor(encode_cursor(Cursor('snapshot', 0, 3.25, 417), 1234), 1234)
+
+
+class SnapshotTest(unittest.TestCase):
+    
+    def setUp(self):
+        rows = [(1, 9.0), (2, 8.0), (3, 8.0), (4, 7.0), (5, 6.0)]
+        self.snapshot = Snapshot([{'document_id': doc, 'score': score} for doc, score in rows], 9, False)
+    
+    def test_resume(self):
+        # At its position
+        self.assertEqual(self.snapshot.resume(Cursor('', 2, 8.0, 2)), 2)
+        # Moved since the cursor was made
+        self.assertEqual(self.snapshot.resume(Cursor('', 4, 8.0, 2)), 2)
+        # Gone: after the first lower score, or the same score and a later id
+        self.assertEqual(self.snapshot.resume(Cursor('', 3, 7.5, 9)), 3)
+        self.assertEqual(self.snapshot.resume(Cursor('', 2, 8.0, 0)), 1)
+        self.assertEqual(self.snapshot.resume(Cursor('', 5, 1.0, 9)), 5)
+    
+    def test_rows(self):
+        self.assertTrue(self.snapshot.covers(5))
+        self.assertFalse(self.snapshot.covers(6))
+        self.assertEqual(self.snapshot.rows(3, 10), [{'document_id': 4, 'score': 7.0}, {'document_id': 5, 'score': 6.0}])
+
+
+class CursorWalkTest(unittest.TestCase):
+    """Every page of a search, read by cursor and by page number"""
+    
+    @classmethod
+    def setUpClass(cls):
+        app_database()
+        cls.client = app.app.test_client()
+    
+    def search(self, body):
+        response = self.client.post('/api/search', json=dict(body, ids_only=True))
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+    
+    def walk_pages(self, body, limit):
+        ids = []
+        page = 1
+        while True:
+            results = self.search(dict(body, page=page, limit=limit))['results']
+            if not results:
+                return ids
+            ids += [result['id'] for result in results]
+            page += 1
+    
+    def walk_cursor(self, body, limit):
+        ids = []
+        response = self.search(dict(body, limit=limit))
+        page = 1
+        while True:
+            self.assertEqual(response['page'], page)
+            ids += [result['id'] for result in response['results']]
+            if not response['next_cursor']:
+                return ids
+            response = self.search(dict(body, limit=limit, cursor=response['next_cursor']))
+            page += 1
+    
+    def assertWalksMatch(self):
+        for options in SEARCHES:
+            for query in QUERIES:
+                body = dict(options, query=query)
+                with self.subTest(**body):
+                    whole = self.search(dict(body, limit=1000))
+                    expected = [result['id'] for result in whole['results']]
+                    self.assertGreater(len(expected), 7)
+                    self.assertEqual(self.walk_pages(body, 7), expected)
+                    self.assertEqual(self.walk_cursor(body, 7), expected)
+    
+    def test_snapshots(self):
+        self.assertWalksMatch()
+    
+    def test_ranked_again(self):
+        # Without snapshots every page is ranked again, deeper each time
+        snapshots = app.snapshots
+        app.snapshots = SnapshotStore(max_entries=0)
+        try:
+            self.assertWalksMatch()
+        finally:
+            app.snapshots = snapshots
+    
+    def test_same_words_share_cursors(self):
+        body = {'query': f'{VOCABULARY[0]} {VOCABULARY[5]}', 'scorer': 'bm25', 'limit': 7}
+        token = self.search(body)['next_cursor']
+        respelled = dict(body, query=f'{VOCABULARY[0].upper()}, {VOCABULARY[5]}!', cursor=token)
+        self.assertEqual(self.search(respelled)['page'], 2)
+        response = self.client.post('/api/search', json=dict(body, scorer='frequency', cursor=token))
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
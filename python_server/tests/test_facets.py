@@ -0,0 +1,167 @@
+"""
+Category bitsets, facet counts and filtered searches against brute force
+"""
+
+import os
+import random
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.support import VOCABULARY, add_documents, app, app_database, make_database, random_documents
+from facets import Bitset, CategoryIndex
+from postings import PostingIndex
+
+QUERIES = [
+    f'{VOCABULARY[0]} {VOCABULARY[5]}',
+    f'{VOCABULARY[2]}',
+    f'{VOCABULARY[7]} {VOCABULARY[20]} {VOCABULARY[40]}',
+    f'"{VOCABULARY[0]} {VOCABULARY[1]}" {VOCABULARY[3]}',
+    'missing',
+]
+
+
+def document_categories(conn):
+    return dict(conn.execute('SELECT id, category FROM documents').fetchall())
+
+
+def brute_force_bitsets(conn):
+    categories = {}
+    for doc_id, category in document_categories(conn).items():
+        categories.setdefault(category, set()).add(doc_id)
+    return categories
+
+
+class BitsetTest(unittest.TestCase):
+    
+    def test_against_set(self):
+        rng = random.Random(1)
+        for size in (0, 1, 7, 8, 9, 100, 1000):
+            ids = set(rng.sample(range(1, 5000), size))
+            bitset = Bitset.from_ids(ids)
+            self.assertEqual(len(bitset), len(ids))
+            self.assertEqual(list(bitset), sorted(ids))
+            for doc_id in range(0, 5100, 13):
+                self.assertEqual(doc_id in bitset, doc_id in ids, doc_id)
+            copy = Bitset.from_int(bitset.to_int())
+            self.assertEqual(list(copy), sorted(ids))
+            self.assertEqual(len(copy), len(ids))
+    
+    def test_add_twice(self):
+        bitset = Bitset()
+        for doc_id in (3, 3, 64, 3):
+            bitset.add(doc_id)
+        self.assertEqual(len(bitset), 2)
+        self.assertEqual(list(bitset), [3, 64])
+
+
+class CategoryIndexTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.conn = make_database(f'categories_{self._testMethodName}', random_documents(11, 200))
+    
+    def tearDown(self):
+        self.conn.close()
+    
+    def assertMatchesDatabase(self, categories):
+        expected = brute_force_bitsets(self.conn)
+        self.assertEqual({category: set(bitset) for category, bitset in categories.bitsets.items()}, expected)
+        self.assertEqual(categories.doc_count, sum(map(len, expected.values())))
+    
+    def test_refresh(self):
+        categories = CategoryIndex()
+        categories.refresh(self.conn)
+        self.assertMatchesDatabase(categories)
+        add_documents(self.conn, random_documents(12, 50))
+        categories.refresh(self.conn)
+        self.assertMatchesDatabase(categories)
+        self.assertEqual(categories.reloads, 0)
+    
+    def test_reload(self):
+        categories = CategoryIndex()
+        categories.refresh(self.conn)
+        add_documents(self.conn, random_documents(13, 50))
+        # As if a document had been committed after one with a larger id
+        categories.last_doc_id += 25
+        categories.refresh(self.conn)
+        self.assertEqual(categories.reloads, 1)
+        self.assertMatchesDatabase(categories)
+    
+    def test_select_and_counts(self):
+        categories = CategoryIndex()
+        categories.refresh(self.conn)
+        expected = brute_force_bitsets(self.conn)
+        names = sorted(expected)
+        rng = random.Random(2)
+        for _ in range(20):
+            selected = rng.sample(names + ['missing'], rng.randint(1, 3))
+            union = set().union(*(expected.get(category, set()) for category in selected))
+            self.assertEqual(set(categories.select(selected)), union)
+            doc_ids = rng.sample(range(1, 260), rng.randint(0, 100))
+            counts = Counter(category for category, ids in expected.items() for doc_id in doc_ids if doc_id in ids)
+            self.assertEqual(categories.counts(doc_ids), dict(counts))
+
+
+class FilteredSearchTest(unittest.TestCase):
+    """Facets and category filters of /api/search against the unfiltered search"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.categories = document_categories(app_database())
+        cls.client = app.app.test_client()
+    
+    def search(self, body):
+        response = self.client.post('/api/search', json=dict(body, ids_only=True))
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+    
+    def assertFiltersMatch(self):
+        names = sorted(set(self.categories.values()))
+        for scorer in ('bm25', 'frequency'):
+            for query in QUERIES:
+                body = {'query': query, 'scorer': scorer, 'limit': 1000}
+                whole = self.search(dict(body, facets=True))
+                ids = [result['id'] for result in whole['results']]
+                facets = {facet['category']: facet['count'] for facet in whole['facets']}
+                self.assertEqual(facets, dict(Counter(self.categories[doc_id] for doc_id in ids)), query)
+                for selected in ([names[0]], names[1:4], ['missing']):
+                    with self.subTest(query=query, scorer=scorer, category=selected):
+                        expected = [doc_id for doc_id in ids if self.categories[doc_id] in selected]
+                        self.assertFilterMatches(body, selected, expected)
+    
+    def assertFilterMatches(self, body, selected, expected):
+        filtered = self.search(dict(body, category=selected, facets=True))
+        ids = [result['id'] for result in filtered['results']]
+        if body['scorer'] == 'bm25':
+            self.assertEqual(ids, expected)
+        else:
+            # Frequency ranks ties in no set order
+            self.assertCountEqual(ids, expected)
+        self.assertEqual(filtered['total'], len(expected))
+        facets = {facet['category']: facet['count'] for facet in filtered['facets']}
+        self.assertEqual(facets, dict(Counter(self.categories[doc_id] for doc_id in expected)))
+        if body['scorer'] == 'bm25':
+            for limit in (1, 10):
+                top = self.search(dict(body, category=selected, mode='topk', limit=limit))
+                self.assertEqual([result['id'] for result in top['results']], expected[:limit])
+                # The total is a lower bound of the matches, at least the rows shown
+                self.assertGreaterEqual(top['total'], min(limit, len(expected)))
+                self.assertLessEqual(top['total'], len(expected))
+    
+    def test_sqlite(self):
+        self.assertFiltersMatch()
+    
+    def test_memory(self):
+        index = PostingIndex()
+        index.load(app_database())
+        app.index_engine = index
+        try:
+            self.assertFiltersMatch()
+        finally:
+            app.index_engine = None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+WAND top-k against exhaustive BM25 ranking, over SQL and in-memory postings
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.support import TEMP_DIR, VOCABULARY, add_documents, app, make_database, random_documents
+from facets import Bitset
+from postings import PostingIndex
+from segment import SegmentIndex
+
+
+def random_queries(seed, count):
+    """(words, k) pairs; some words are in no document"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        words = rng.sample(VOCABULARY + ['missing'], rng.randint(1, 4))
+        yield words, rng.choice([1, 3, 10, 50, 1000])
+
+
+class TopKTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = make_database('scoring', random_documents(5, 300))
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+    
+    def assertTopK(self, top, ranked, k):
+        """top holds the k best of ranked, in its order up to ties in score"""
+        scores = {row['document_id']: row for row in ranked}
+        self.assertEqual(len(top), min(k, len(ranked)))
+        self.assertEqual(len({row['document_id'] for row in top}), len(top))
+        for row, expected in zip(top, ranked):
+            self.assertAlmostEqual(row['score'], expected['score'], places=9)
+            exhaustive = scores[row['document_id']]
+            self.assertAlmostEqual(row['score'], exhaustive['score'], places=9)
+            self.assertEqual(row['matched_words'], exhaustive['matched_words'])
+            self.assertEqual(row['total_freq'], exhaustive['total_freq'])
+    
+    def test_sql(self):
+        for words, k in random_queries(1, 200):
+            ranked, _ = app.rank_documents(self.conn, words, 'bm25', 'exhaustive', k)
+            stats = app.get_corpus_stats(self.conn.cursor(), words)
+            self.assertTopK(app.top_k_search(self.conn, words, stats, k), ranked, k)
+    
+    def test_sql_allowed(self):
+        rng = random.Random(2)
+        for words, k in random_queries(3, 100):
+            allowed = set(rng.sample(range(1, 301), rng.choice([5, 50, 250])))
+            ranked, _ = app.rank_documents(self.conn, words, 'bm25', 'exhaustive', k)
+            ranked = [row for row in ranked if row['document_id'] in allowed]
+            stats = app.get_corpus_stats(self.conn.cursor(), words)
+            self.assertTopK(app.top_k_search(self.conn, words, stats, k, allowed), ranked, k)
+            self.assertTopK(app.top_k_search(self.conn, words, stats, k, Bitset.from_ids(allowed)), ranked, k)
+    
+    def test_memory(self):
+        index = PostingIndex()
+        index.load(self.conn)
+        rng = random.Random(4)
+        for words, k in random_queries(5, 200):
+            ranked, _ = app.rank_documents(self.conn, words, 'bm25', 'exhaustive', k)
+            self.assertTopK(index.rank_bm25(words), ranked, len(ranked))
+            self.assertTopK(app._ranked_rows(index.top_k(words, k)), ranked, k)
+            
+            allowed = set(rng.sample(range(1, 301), 50))
+            ranked = [row for row in ranked if row['document_id'] in allowed]
+            self.assertTopK(app._ranked_rows(index.top_k(words, k, allowed)), ranked, k)
+    
+    def test_layers(self):
+        conn = make_database('scoring_layers', random_documents(6, 150))
+        index = SegmentIndex(os.path.join(TEMP_DIR, 'scoring_layers.seg'), merge_docs=0)
+        index.open(conn)
+        add_documents(conn, random_documents(7, 150))
+        index.refresh(conn)
+        self.assertEqual(len(index.layers), 2)
+        for words, k in random_queries(8, 200):
+            ranked, _ = app.rank_documents(conn, words, 'bm25', 'exhaustive', k)
+            self.assertTopK(index.rank_bm25(words), ranked, len(ranked))
+            self.assertTopK(app._ranked_rows(index.top_k(words, k)), ranked, k)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
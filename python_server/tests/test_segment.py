@@ -0,0 +1,141 @@
+"""
+Segment files: write, reopen and merge against the SQL tables they mirror
+"""
+
+import fcntl
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.support import TEMP_DIR, add_documents, connect, make_database, random_documents
+from segment import Segment, SegmentIndex
+
+
+def database_postings(conn):
+    """{word: ([doc ids], [frequencies])} in document id order"""
+    postings = {}
+    for word, doc_id, frequency in conn.execute(
+            'SELECT word, document_id, frequency FROM inverted_index ORDER BY word, document_id'):
+        docs, freqs = postings.setdefault(word, ([], []))
+        docs.append(doc_id)
+        freqs.append(frequency)
+    return postings
+
+
+class SegmentTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.conn = make_database(self.id().rsplit('.', 1)[-1], random_documents(1, 40))
+        self.path = os.path.join(TEMP_DIR, self.id().rsplit('.', 1)[-1] + '.seg')
+        self.index = SegmentIndex(self.path, merge_docs=0)
+        self.index.open(self.conn)
+    
+    def tearDown(self):
+        self.conn.close()
+    
+    def assertMatchesDatabase(self, index):
+        """Every layer together holds exactly the database's postings and documents"""
+        postings = database_postings(self.conn)
+        lengths = dict(self.conn.execute('SELECT document_id, length FROM doc_stats').fetchall())
+        for word, (docs, freqs) in postings.items():
+            entries = index._entries(word)
+            self.assertEqual([doc for _, entry in entries for doc in entry[0]], docs, word)
+            self.assertEqual([freq for _, entry in entries for freq in entry[1]], freqs, word)
+            self.assertEqual(index.doc_freq(word), len(docs))
+            for layer, entry in entries:
+                layer_docs = list(entry[0])
+                layer_freqs = list(entry[1])
+                self.assertEqual(entry[2], max(layer_freqs), word)
+                self.assertEqual(entry[3], min(lengths[doc] for doc in layer_docs), word)
+        self.assertIsNone(index.segment.entry('missing'))
+        
+        segment = index.segment
+        for doc_id, title, content, url, category in self.conn.execute(
+                'SELECT id, title, content, url, category FROM documents'):
+            if doc_id <= segment.max_doc_id:
+                self.assertEqual(segment.doc_lengths[doc_id], lengths[doc_id])
+                self.assertEqual(index.document(doc_id), {
+                    'id': doc_id, 'title': title, 'content': content, 'url': url, 'category': category
+                })
+            else:
+                self.assertEqual(index.delta.doc_lengths[doc_id], lengths[doc_id])
+                self.assertIsNone(index.document(doc_id))
+        
+        meta = dict(self.conn.execute('SELECT key, value FROM index_meta').fetchall())
+        self.assertEqual(index.doc_count, meta['doc_count'])
+        self.assertEqual(index.total_length, meta['total_length'])
+    
+    def test_round_trip(self):
+        self.assertMatchesDatabase(self.index)
+        self.assertEqual(self.index.delta.last_doc_id, self.index.segment.max_doc_id)
+        
+        reopened = SegmentIndex(self.path, merge_docs=0)
+        reopened.open(self.conn)
+        self.assertMatchesDatabase(reopened)
+        segment = Segment(self.path)
+        self.assertEqual(segment.term_count, len(database_postings(self.conn)))
+        words = [segment.term(i) for i in range(segment.term_count)]
+        self.assertEqual(words, sorted(words))
+    
+    def test_delta_layer_and_merge(self):
+        first_max = self.index.segment.max_doc_id
+        add_documents(self.conn, random_documents(2, 25))
+        self.index.refresh(self.conn)
+        self.assertEqual(self.index.segment.max_doc_id, first_max)
+        self.assertEqual(self.index.delta.last_doc_id - self.index.delta.first_doc_id, 25)
+        self.assertMatchesDatabase(self.index)
+        
+        self.assertTrue(self.index.merge(self.conn))
+        self.assertEqual(self.index.segment.max_doc_id, first_max + 25)
+        self.assertEqual(self.index.delta.last_doc_id, self.index.delta.first_doc_id)
+        self.assertMatchesDatabase(self.index)
+    
+    def test_background_merge(self):
+        name = self.id().rsplit('.', 1)[-1]
+        self.index.connect = lambda: connect(name)
+        self.index.merge_docs = 10
+        add_documents(self.conn, random_documents(3, 5))
+        self.index.refresh(self.conn)
+        self.assertIsNone(self.index.maybe_merge(self.conn))
+        
+        add_documents(self.conn, random_documents(4, 10))
+        self.index.refresh(self.conn)
+        segment = self.index.segment
+        self.index.maybe_merge(self.conn).join()
+        # Nothing switches until the next refresh
+        self.assertIs(self.index.segment, segment)
+        self.assertMatchesDatabase(self.index)
+        
+        self.index.refresh(self.conn)
+        self.assertIsNot(self.index.segment, segment)
+        self.assertEqual(self.index.delta.last_doc_id, self.index.delta.first_doc_id)
+        self.assertEqual(self.index.merges, 2)
+        self.assertMatchesDatabase(self.index)
+    
+    def test_open_while_another_process_writes(self):
+        # Set the segment aside as another process's, which holds the lock;
+        # separate opens of the lock file conflict even within one process
+        written = self.path + '.written'
+        os.replace(self.path, written)
+        lock_file = open(self.path + '.lock', 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        
+        def finish_writing():
+            os.replace(written, self.path)
+            lock_file.close()
+        
+        writer = threading.Timer(0.2, finish_writing)
+        writer.start()
+        index = SegmentIndex(self.path, merge_docs=0)
+        index.open(self.conn)
+        writer.join()
+        # It waited for the segment instead of writing its own
+        self.assertEqual(index.merges, 0)
+        self.assertMatchesDatabase(index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Levenshtein automaton and term dictionary lookups against brute force
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from terms import LevenshteinAutomaton, TermDictionary, auto_edits
+
+# A small alphabet makes near misses, shared prefixes and transpositions common
+ALPHABET = 'abcdé'
+
+
+def edit_distance(a, b):
+    """Optimal string alignment distance, counting the edits fuzzy() does"""
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        new_row = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(row[j - 1] + (a[i - 1] != b[j - 1]), row[j] + 1, new_row[j - 1] + 1)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, previous_row[j - 2] + 1)
+            new_row.append(cost)
+        previous_row, row = row, new_row
+    return row[-1]
+
+
+def random_word(rng, max_length):
+    return ''.join(rng.choices(ALPHABET, k=rng.randint(1, max_length)))
+
+
+def misspell(rng, word, edits):
+    """word with up to edits random insertions, deletions, substitutions or transpositions"""
+    chars = list(word)
+    for _ in range(edits):
+        i = rng.randint(0, len(chars))
+        edit = rng.choice(['insert', 'delete', 'substitute', 'transpose'])
+        if edit == 'insert' or not chars:
+            chars.insert(i, rng.choice(ALPHABET))
+        elif edit == 'transpose' and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        elif i < len(chars):
+            if edit == 'delete':
+                del chars[i]
+            else:
+                chars[i] = rng.choice(ALPHABET)
+    return ''.join(chars)
+
+
+class LevenshteinAutomatonTest(unittest.TestCase):
+    
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('abcd', 'acbd'), 1)
+        self.assertEqual(edit_distance('ca', 'abc'), 3)
+        self.assertEqual(edit_distance('', 'abc'), 3)
+        self.assertEqual(edit_distance('café', 'cafe'), 1)
+    
+    def test_states(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            word = random_word(rng, 8)
+            for max_edits in range(3):
+                automaton = LevenshteinAutomaton(word, max_edits)
+                for _ in range(30):
+                    if rng.random() < 0.5:
+                        text = misspell(rng, word, rng.randint(0, 3))
+                    else:
+                        text = random_word(rng, 10)
+                    self.assertState(automaton, text)
+    
+    def assertState(self, automaton, text):
+        """After text the automaton holds its capped distance from word, or is dead beyond reach"""
+        state = 0
+        for char in text:
+            next_state = automaton.transitions.get((state, char))
+            state = automaton.add(state, char) if next_state is None else next_state
+            if state < 0:
+                break
+        distance = edit_distance(automaton.word, text)
+        if state < 0:
+            self.assertGreater(distance, automaton.max_edits, (automaton.word, text))
+        else:
+            self.assertEqual(automaton.distances[state], min(distance, automaton.max_edits + 1),
+                             (automaton.word, text))
+
+
+class TermDictionaryTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(2)
+        words = {random_word(rng, 7) for _ in range(3000)}
+        cls.terms = sorted((word, rng.randint(1, 50)) for word in words)
+        # A small range_limit puts precomputed completions under short prefixes
+        cls.dictionary = TermDictionary(cls.terms, max_completions=8, range_limit=16)
+    
+    def test_lookup(self):
+        self.assertEqual(len(self.dictionary), len(self.terms))
+        self.assertEqual([self.dictionary[i] for i in range(len(self.terms))], [term for term, _ in self.terms])
+        for term, doc_freq in self.terms[::7]:
+            self.assertEqual(self.dictionary.doc_freq(term), doc_freq)
+        self.assertEqual(self.dictionary.doc_freq('z'), 0)
+        self.assertTrue(self.dictionary.completions)
+    
+    def test_complete(self):
+        rng = random.Random(3)
+        prefixes = [''] + [random_word(rng, 4) for _ in range(300)] + ['z']
+        for prefix in prefixes:
+            for limit in (1, 5, 8, 20):
+                matches = sorted((term for term in self.terms if term[0].startswith(prefix)),
+                                 key=lambda term: (-term[1], term[0]))
+                self.assertEqual(self.dictionary.complete(prefix, limit), matches[:limit], (prefix, limit))
+    
+    def test_fuzzy(self):
+        rng = random.Random(4)
+        for _ in range(100):
+            word = misspell(rng, rng.choice(self.terms)[0], rng.randint(0, 2)) or 'a'
+            distances = [edit_distance(word, term) for term, _ in self.terms]
+            for max_edits, prefix_length, limit in ((None, 0, 10), (1, 0, 5), (2, 1, 10), (2, 0, 1000)):
+                edits = auto_edits(word) if max_edits is None else max_edits
+                matches = [
+                    (term, doc_freq, distance) for (term, doc_freq), distance in zip(self.terms, distances)
+                    if distance <= edits and term.startswith(word[:prefix_length])
+                ]
+                matches.sort(key=lambda match: (match[2], -match[1], match[0]))
+                self.assertEqual(self.dictionary.fuzzy(word, max_edits, limit, prefix_length), matches[:limit],
+                                 (word, max_edits, prefix_length, limit))
+
+
+if __name__ == '__main__':
+    unittest.main()